@@ -20,12 +20,13 @@ import os
 import re
 import time
 import csv
+import glob
 import argparse
 from collections import defaultdict
 
 import pandas as pd
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import Alignment, Font
+
+from xlsx_writer import read_sheets, write_workbook
 
 # ---------------------- Defaults ----------------------
 DEFAULT_OUT_DIR = "timetable_tools/output_v5"
@@ -35,6 +36,7 @@ FALLBACK_SUBJECTS_CSV = "subjects.csv"
 DEFAULT_TEACHERS_CSV = "teachers.csv"
 DEFAULT_OUTPUT_XLSX = os.path.join(DEFAULT_OUT_DIR, "All_Timetables_with_Teachers_fixed_v2.xlsx")
 MISSING_LOG = "missing_mappings.csv"
+MAX_BACKUPS = 3                       # timestamped fallbacks kept by safe_save_workbook
 
 WEEKDAY_TOKENS = {
     "MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN",
@@ -43,8 +45,11 @@ WEEKDAY_TOKENS = {
 }
 
 # ---------------------- Utilities ----------------------
-def safe_save_workbook(wb, desired_path):
-    """Save workbook; if file exists and can't be overwritten, save a timestamped fallback."""
+def safe_save_workbook(sheets, desired_path):
+    """
+    Save sheets as a workbook; if file exists and can't be overwritten, save a timestamped fallback.
+    Only the newest MAX_BACKUPS fallbacks are kept.
+    """
     folder = os.path.dirname(desired_path) or "."
     os.makedirs(folder, exist_ok=True)
     if os.path.exists(desired_path):
@@ -54,10 +59,15 @@ def safe_save_workbook(wb, desired_path):
             ts = time.strftime("%Y%m%d_%H%M%S")
             base, ext = os.path.splitext(desired_path)
             fallback = f"{base}_backup_{ts}{ext}"
-            wb.save(fallback)
+            write_workbook(sheets, fallback)
             print(f"Could not overwrite existing file. Saved to: {fallback}")
+            for old in sorted(glob.glob(f"{glob.escape(base)}_backup_*{ext}"))[:-MAX_BACKUPS]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
             return fallback
-    wb.save(desired_path)
+    write_workbook(sheets, desired_path)
     return desired_path
 
 def normalize_code(tok: str) -> str:
@@ -168,60 +178,59 @@ def match_code_to_subject(code_norm, subject_rows):
     return best, best_tid, best_score
 
 # ---------------------- Update overall_schedule.csv ----------------------
-def update_overall_schedule_csv(code_match_info):
-    csv_path = os.path.join(DEFAULT_OUT_DIR, "overall_schedule.csv")
+def update_overall_schedule_csv(code_match_info, csv_path):
     if not os.path.exists(csv_path):
         print(f"overall_schedule.csv NOT found at: {csv_path}")
         return
 
     df = pd.read_csv(csv_path, dtype=str).fillna("")
 
-    # Add new empty columns
-    df["Teacher Name"] = ""
-    df["Teacher ID"] = ""
-
-    # Process each row
-    for i, row in df.iterrows():
-        text = row.get("Subject/Notes", "")
+    # Resolve each distinct Subject/Notes value once and map whole columns (no per-row df.at writes)
+    info_of = {}
+    for text in df["Subject/Notes"].unique() if "Subject/Notes" in df.columns else []:
         codes = extract_codes_from_cell(text)
-
-        if not codes:
-            continue
-
-        code = codes[0]
-        info = code_match_info.get(code, {})
-
-        df.at[i, "Teacher Name"] = info.get("teacher_name", "")
-        df.at[i, "Teacher ID"] = info.get("teacher_id", "")
+        info_of[text] = code_match_info.get(codes[0], {}) if codes else {}
+    notes = df["Subject/Notes"] if "Subject/Notes" in df.columns else pd.Series("", index=df.index)
+    df["Teacher Name"] = notes.map(lambda t: info_of.get(t, {}).get("teacher_name", "")).astype(str)
+    df["Teacher ID"] = notes.map(lambda t: info_of.get(t, {}).get("teacher_id", "")).astype(str)
 
     df.to_csv(csv_path, index=False, encoding="utf-8")
     print("Updated overall_schedule.csv with Teacher Name and Teacher ID")
 
 # ---------------------- Main processing ----------------------
-def process(input_xlsx, subjects_csv, teachers_csv, output_xlsx, missing_log):
-    chosen_subjects = subjects_csv if os.path.exists(subjects_csv) else (FALLBACK_SUBJECTS_CSV if os.path.exists(FALLBACK_SUBJECTS_CSV) else None)
+def annotate_sheets(sheets, subjects_csv, teachers_csv, missing_log, schedule_csv=None, assigned=None):
+    """
+    Replace subject codes in every sheet cell with "CODE — Teacher Name (ID)".
+    sheets: { sheet_name: [row, row, ...] } as produced by TimeTable.build_sheets (or read from an XLSX).
+    schedule_csv: the overall_schedule.csv to add teacher columns to (none when not given).
+    assigned: {code: teacher_id} the scheduler booked (TimeTable.assigned_teachers()); those codes get
+    exactly that teacher, only codes it doesn't know are matched to a subject name.
+    Returns (annotated_sheets, code_match_info).
+    """
+    # subjects.csv fallback is looked up next to the given subjects file, not in the cwd
+    fallback = os.path.join(os.path.dirname(subjects_csv), FALLBACK_SUBJECTS_CSV)
+    chosen_subjects = subjects_csv if os.path.exists(subjects_csv) else (fallback if os.path.exists(fallback) else None)
     if not chosen_subjects:
         raise FileNotFoundError("subjects_with_teachers.csv or subjects.csv not found.")
 
     subject_rows = read_subjects_map(chosen_subjects)
     teachers_map = read_teachers(teachers_csv) if os.path.exists(teachers_csv) else {}
 
-    if not os.path.exists(input_xlsx):
-        raise FileNotFoundError(f"Input Excel not found: {input_xlsx}")
-
-    wb_in = load_workbook(input_xlsx)
     all_codes = set()
-    for sheet in wb_in.sheetnames:
-        ws = wb_in[sheet]
-        for row in ws.iter_rows(values_only=True):
+    for rows in sheets.values():
+        for row in rows:
             for cell in row:
                 if isinstance(cell, str):
                     all_codes.update(extract_codes_from_cell(cell))
 
     # Build match info
+    assigned = {normalize_code(code): tid for code, tid in (assigned or {}).items()}
     code_match_info = {}
     for code in sorted(all_codes):
-        best_subj, tid, score = match_code_to_subject(code, subject_rows)
+        if code in assigned:
+            best_subj, tid, score = "", assigned[code], 1.0
+        else:
+            best_subj, tid, score = match_code_to_subject(code, subject_rows)
         teacher_name = teachers_map.get(tid, "") if tid else ""
         code_match_info[code] = {
             "matched_subject": best_subj or "",
@@ -230,19 +239,13 @@ def process(input_xlsx, subjects_csv, teachers_csv, output_xlsx, missing_log):
             "score": score
         }
 
-    # Build Excel output
-    wb_out = Workbook()
-    if wb_out.active: wb_out.remove(wb_out.active)
-
+    out_sheets = {}
     missing_codes = set()
-    for sheet in wb_in.sheetnames:
-        ws_in = wb_in[sheet]
-        ws_out = wb_out.create_sheet(sheet)
-
-        for r_idx, row in enumerate(ws_in.iter_rows(values_only=False), start=1):
-            for c_idx, cell in enumerate(row, start=1):
-                orig = cell.value if cell is not None else ""
-
+    for sheet, rows in sheets.items():
+        out_rows = []
+        for row in rows:
+            out_row = []
+            for c_idx, orig in enumerate(row, start=1):
                 if c_idx == 1 and isinstance(orig, str) and normalize_code(orig) in WEEKDAY_TOKENS:
                     out_val = orig
                 else:
@@ -263,27 +266,9 @@ def process(input_xlsx, subjects_csv, teachers_csv, output_xlsx, missing_log):
                                 lines.append(f"{code} — (no teacher)")
                                 missing_codes.add(code)
                         out_val = "\n".join(lines)
-
-                out_cell = ws_out.cell(row=r_idx, column=c_idx, value=out_val)
-                out_cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-                try:
-                    if cell.font and cell.font.bold:
-                        out_cell.font = Font(bold=True)
-                except Exception:
-                    pass
-
-        for col in ws_out.columns:
-            max_len = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    l = max(len(str(line)) for line in str(cell.value).split("\n"))
-                    max_len = max(max_len, l)
-            ws_out.column_dimensions[col_letter].width = min(max(12, max_len + 2), 50)
-
-    saved = safe_save_workbook(wb_out, output_xlsx)
-    print(f"Saved timetable with teachers to: {saved}")
+                out_row.append(out_val)
+            out_rows.append(out_row)
+        out_sheets[sheet] = out_rows
 
     if missing_codes:
         with open(missing_log, "w", newline="", encoding="utf-8") as f:
@@ -296,8 +281,22 @@ def process(input_xlsx, subjects_csv, teachers_csv, output_xlsx, missing_log):
         print("All codes matched to teachers.")
 
     # 🔥 Update CSV with new Teacher Columns
-    update_overall_schedule_csv(code_match_info)
-    
+    if schedule_csv:
+        update_overall_schedule_csv(code_match_info, schedule_csv)
+
+    return out_sheets, code_match_info
+
+
+def process(input_xlsx, subjects_csv, teachers_csv, output_xlsx, missing_log):
+    if not os.path.exists(input_xlsx):
+        raise FileNotFoundError(f"Input Excel not found: {input_xlsx}")
+
+    # the scheduler writes overall_schedule.csv next to the workbook
+    schedule_csv = os.path.join(os.path.dirname(input_xlsx), "overall_schedule.csv")
+    out_sheets, _ = annotate_sheets(read_sheets(input_xlsx), subjects_csv, teachers_csv, missing_log, schedule_csv)
+
+    saved = safe_save_workbook(out_sheets, output_xlsx)
+    print(f"Saved timetable with teachers to: {saved}")
     return saved
 
 # ---------------------- CLI ----------------------
@@ -0,0 +1,177 @@
+# auth.py
+"""
+Login + session tokens.
+
+- Passwords: "pbkdf2_sha256$<iterations>$<salt>$<hash>" (salted). Plain-text values still present in
+  admin.json / teachers.csv are accepted so existing accounts keep working; new users are stored hashed.
+- Credentials are indexed by email once per file change instead of scanning teachers.csv per login.
+- Tokens: "<session id>.<HMAC signature>". Forged tokens are rejected without a lookup; valid ones
+  resolve to the user through an in-memory TTL + LRU session store, so no disk access per request.
+- Sessions are shared by every tenant (see tenants.py); the user dict carries its "tenant" and the
+  per-user updates below only touch sessions of that tenant, since user ids repeat across tenants.
+"""
+import base64
+import csv
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from timetable_index import cached
+
+HASH_PREFIX = "pbkdf2_sha256"
+HASH_ITERATIONS = 100_000
+SESSION_TTL_SECONDS = int(os.environ.get("TIBL_SESSION_TTL", 12 * 3600))
+MAX_SESSIONS = int(os.environ.get("TIBL_MAX_SESSIONS", 10_000))
+# Set TIBL_SESSION_SECRET in production; otherwise tokens are only valid for this process.
+SECRET = os.environ.get("TIBL_SESSION_SECRET", "").encode() or secrets.token_bytes(32)
+
+
+# ---------- password hashing ----------
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def hash_password(password, salt=None, iterations=HASH_ITERATIONS):
+    salt = salt or _b64(secrets.token_bytes(16))
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations)
+    return f"{HASH_PREFIX}${iterations}${salt}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return str(stored).startswith(HASH_PREFIX + "$")
+
+
+def verify_password(password, stored):
+    stored = str(stored or "")
+    if not is_hashed(stored):
+        # legacy plain-text entry
+        return bool(stored) and hmac.compare_digest(stored.encode(), password.encode())
+    try:
+        _, iterations, salt, _ = stored.split("$")
+        expected = hash_password(password, salt=salt, iterations=int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected.encode(), stored.encode())
+
+
+# ---------- credential index ----------
+def _load_teacher_credentials(path):
+    creds = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            email = (row.get("email") or "").strip().lower()
+            if email and email not in creds:
+                creds[email] = (row.get("password", ""), {
+                    "id": row["id"],
+                    "name": row["name"],
+                    "role": "Teacher",
+                    "email": row.get("email", ""),
+                })
+    return creds
+
+
+def _load_admin_credentials(path):
+    admin = json.loads(path.read_text(encoding="utf-8"))
+    return {admin["email"].strip().lower(): (admin["password"], {
+        "id": admin["id"], "name": admin["name"], "role": "Admin", "email": admin["email"],
+    })}
+
+
+def find_user(email, admin_file, teachers_file):
+    """(stored_password, user) for an email, admins first; None if unknown."""
+    email = (email or "").strip().lower()
+    for path, loader, kind in ((admin_file, _load_admin_credentials, "admin_creds"),
+                               (teachers_file, _load_teacher_credentials, "teacher_creds")):
+        if not path.exists():
+            continue
+        try:
+            hit = cached(kind, path, loader).get(email)
+        except Exception as e:
+            print(f"Failed to read credentials from {path}: {e}")
+            continue
+        if hit:
+            return hit
+    return None
+
+
+# ---------- sessions ----------
+class SessionStore:
+    """session id -> (user dict, expiry). Bounded LRU; expired entries are dropped on access."""
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, user):
+        sid = secrets.token_urlsafe(24)
+        with self._lock:
+            self._sessions[sid] = (dict(user), time.monotonic() + self.ttl)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return sid
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if not entry:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return user
+
+    def revoke(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def revoke_user(self, user_id, tenant=None):
+        with self._lock:
+            for sid in [s for s, (u, _) in self._sessions.items()
+                        if u.get("id") == user_id and u.get("tenant") == tenant]:
+                del self._sessions[sid]
+
+    def update_user(self, user_id, tenant=None, **fields):
+        with self._lock:
+            for user, _ in self._sessions.values():
+                if user.get("id") == user_id and user.get("tenant") == tenant:
+                    user.update(fields)
+
+
+sessions = SessionStore()
+
+
+def _sign(sid):
+    return _b64(hmac.new(SECRET, sid.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user):
+    sid = sessions.create(user)
+    return f"{sid}.{_sign(sid)}"
+
+
+def _session_id(token):
+    sid, _, sig = (token or "").partition(".")
+    if not sid or not sig or not hmac.compare_digest(sig, _sign(sid)):
+        return None
+    return sid
+
+
+def resolve_token(token):
+    """User dict for a valid, unexpired token, else None."""
+    sid = _session_id(token)
+    return sessions.get(sid) if sid else None
+
+
+def revoke_token(token):
+    sid = _session_id(token)
+    if sid:
+        sessions.revoke(sid)
@@ -0,0 +1,191 @@
+# calendar_feeds.py
+"""
+iCalendar (ICS) feeds per teacher, section and room.
+
+Rendered once per generation from overall_schedule.csv into:
+    <out_dir>/teacher/<id>.ics   <out_dir>/section/<CSE-A>.ics   <out_dir>/room/<room>.ics
+    <out_dir>/manifest.json      { kind: { key: etag } }
+
+Each weekly session becomes one VEVENT with an RRULE running from the first matching weekday on or
+after the term start until the term end, so a feed stays small no matter how long the term is.
+Term dates come from TIBL_TERM_START / TIBL_TERM_END (YYYY-MM-DD); by default the term starts on
+the Monday of the current week and runs TERM_WEEKS weeks. Given a term_calendar.TermCalendar, its
+dates are used instead, holidays become EXDATEs and a substitute day (a date that follows another
+weekday's schedule) an EXDATE on its own weekday's sessions plus an RDATE on the followed weekday's.
+
+UIDs depend only on what the session is (section, batch, day, slot, subject), not on the generation,
+so a session that survives a regeneration keeps its UID and an unchanged feed keeps its ETag.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from timetable import DAYS, TIME_SLOTS
+
+KINDS = ("teacher", "section", "room")
+TERM_WEEKS = int(os.environ.get("TIBL_TERM_WEEKS", 16))
+PRODID = "-//Tibl.ai//Timetable//EN"
+WEEKDAY = {"MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4, "SAT": 5, "SUN": 6}
+BYDAY = {"MON": "MO", "TUE": "TU", "WED": "WE", "THU": "TH", "FRI": "FR", "SAT": "SA", "SUN": "SU"}
+SAFE_KEY_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def term_dates(start=None, end=None):
+    """(start, end) dates from arguments, then the environment, then the default term."""
+    start = start or os.environ.get("TIBL_TERM_START")
+    end = end or os.environ.get("TIBL_TERM_END")
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    end = date.fromisoformat(end) if isinstance(end, str) else end
+    if start is None:
+        today = date.today()
+        start = today - timedelta(days=today.weekday())
+    if end is None:
+        end = start + timedelta(weeks=TERM_WEEKS) - timedelta(days=1)
+    return start, end
+
+
+def safe_key(key):
+    return SAFE_KEY_RE.sub("_", str(key))
+
+
+# ---------- ics text ----------
+def _escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """RFC 5545: lines longer than 75 octets continue on the next line after a single space."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line
+    parts, chunk = [], b""
+    for ch in line:
+        b = ch.encode("utf-8")
+        if len(chunk) + len(b) > (75 if not parts else 74):
+            parts.append(chunk.decode("utf-8"))
+            chunk = b""
+        chunk += b
+    parts.append(chunk.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _slot_times(slot_index, length):
+    start = TIME_SLOTS[slot_index].split()[0].split("-")[0]
+    end = TIME_SLOTS[min(slot_index + length - 1, len(TIME_SLOTS) - 1)].split()[0].split("-")[1]
+    return start.replace(":", "") + "00", end.replace(":", "") + "00"
+
+
+def render_calendar(name, sessions, term_start, term_end, moved=None):
+    """
+    One VCALENDAR for `sessions` (dicts from sessions_from_schedule_csv).
+    moved: {date: weekday followed, or None for no classes} for dates that break the weekly pattern.
+    """
+    moved = moved or {}
+    moved_days = sorted(moved)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    until = term_end.strftime("%Y%m%d") + "T235959"
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for s in sessions:
+        first = term_start + timedelta(days=(WEEKDAY[s["day"]] - term_start.weekday()) % 7)
+        if first > term_end:
+            continue
+        start, end = _slot_times(s["slot"], s["length"])
+        day = first.strftime("%Y%m%d")
+        uid_src = "|".join([s["section"], s["batch"], s["day"], str(s["slot"]), s["subject"]])
+        summary = s["subject"] if s["activity"] != "Lab" else f"{s['subject']} (Lab)"
+        who = f"{s['teacher_name']} ({s['teacher_id']})" if s["teacher_name"] else s["teacher_id"]
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{hashlib.sha1(uid_src.encode()).hexdigest()}@tibl.ai",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{day}T{start}",
+            f"DTEND:{day}T{end}",
+            f"RRULE:FREQ=WEEKLY;BYDAY={BYDAY[s['day']]};UNTIL={until}",
+        ]
+        skipped = [d for d in moved_days if d >= first and WEEKDAY[s["day"]] == d.weekday()]
+        extra = [d for d in moved_days if moved[d] == s["day"]]
+        if skipped:
+            lines.append("EXDATE:" + ",".join(f"{d.strftime('%Y%m%d')}T{start}" for d in skipped))
+        if extra:
+            lines.append("RDATE:" + ",".join(f"{d.strftime('%Y%m%d')}T{start}" for d in extra))
+        lines += [
+            f"SUMMARY:{_escape(summary)}",
+            f"LOCATION:{_escape(s['room'])}",
+            f"DESCRIPTION:{_escape(' · '.join(x for x in (s['section'] + ' ' + s['batch'], who) if x.strip()))}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    # DTSTAMP changes every render; leave it out of the ETag so unchanged feeds keep theirs
+    body = "\r\n".join(_fold(line) for line in lines) + "\r\n"
+    etag = hashlib.sha1(re.sub(r"DTSTAMP:\S+", "", body).encode("utf-8")).hexdigest()
+    return body, etag
+
+
+# ---------- sessions ----------
+def sessions_from_schedule_csv(csv_path):
+    slot_of = {t: i for i, t in enumerate(TIME_SLOTS)}
+    sessions = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            slot = slot_of.get(row.get("Time", ""))
+            day = row.get("Day", "")
+            if slot is None or day not in WEEKDAY:
+                continue
+            is_lab = (row.get("Activity") or "").lower() == "lab"
+            sessions.append({
+                "day": day,
+                "slot": slot,
+                "length": 2 if is_lab else 1,    # labs are listed once, at their start period
+                "section": f"{row.get('Branch', '')}-{row.get('Section', '')}",
+                "batch": row.get("Batch", ""),
+                "activity": "Lab" if is_lab else row.get("Activity", ""),
+                "room": row.get("Room", ""),
+                "subject": row.get("Subject/Notes", ""),
+                "teacher_name": row.get("Teacher Name", ""),
+                "teacher_id": row.get("Teacher ID", ""),
+            })
+    day_order = {d: i for i, d in enumerate(DAYS)}
+    sessions.sort(key=lambda s: (day_order.get(s["day"], 99), s["slot"], s["section"], s["batch"]))
+    return sessions
+
+
+def render_feeds(csv_path, out_dir, term_start=None, term_end=None, term=None):
+    """
+    Write every teacher/section/room feed plus manifest.json under out_dir; returns the manifest.
+    term: optional TermCalendar (its dates, holidays and substitute days override term_start/term_end).
+    """
+    if term is not None:
+        term_start, term_end, moved = term.start, term.end, term.moved_dates()
+    else:
+        term_start, term_end = term_dates(term_start, term_end)
+        moved = {}
+    groups = {kind: defaultdict(list) for kind in KINDS}
+    for s in sessions_from_schedule_csv(csv_path):
+        if s["teacher_id"]:
+            groups["teacher"][s["teacher_id"]].append(s)
+        groups["section"][s["section"]].append(s)
+        if s["room"]:
+            groups["room"][s["room"]].append(s)
+
+    out_dir = Path(out_dir)
+    manifest = {"term": {"start": term_start.isoformat(), "end": term_end.isoformat()}}
+    for kind, by_key in groups.items():
+        (out_dir / kind).mkdir(parents=True, exist_ok=True)
+        manifest[kind] = {}
+        for key, sessions in by_key.items():
+            body, etag = render_calendar(f"{key} timetable", sessions, term_start, term_end, moved)
+            (out_dir / kind / f"{safe_key(key)}.ics").write_text(body, encoding="utf-8", newline="")
+            manifest[kind][safe_key(key)] = etag
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
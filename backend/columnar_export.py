@@ -0,0 +1,158 @@
+# columnar_export.py
+"""
+Typed, columnar copy of a generation's overall_schedule.csv for analytics jobs.
+
+Columns (SCHEMA_VERSION 1):
+    Day            category, ordered as timetable.DAYS
+    Branch, Section, Batch, Room, Activity, Teacher ID, Teacher Name
+                   category (categories sorted)
+    Time           category, ordered as timetable.TIME_SLOTS
+    Slot           int8, index of Time in TIME_SLOTS (-1 if unknown)
+    Periods        int8, 2 for a lab row (it covers two periods), else 1
+    Subject        string (subject code, or the raw note)
+
+Written as Parquet when pyarrow is installed (schema version in the file's key/value metadata) and as
+gzip-compressed CSV otherwise. Either way a <stem>.schema.json sidecar records
+{"schema_version", "format", "columns": {name: dtype}, "categories": {name: [...]}} so read_columnar()
+rebuilds the categorical frame without inferring anything - the CSV path parses straight into
+categoricals. Readers should check schema_version before relying on a column.
+"""
+import gzip
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from timetable import DAYS, TIME_SLOTS
+
+SCHEMA_VERSION = 1
+CATEGORICAL = ["Day", "Branch", "Section", "Batch", "Time", "Activity", "Room", "Teacher ID", "Teacher Name"]
+COLUMNS = ["Day", "Branch", "Section", "Batch", "Time", "Slot", "Periods", "Activity", "Room", "Subject",
+           "Teacher ID", "Teacher Name"]
+ORDERED = {"Day": DAYS, "Time": TIME_SLOTS}
+
+
+def _have_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def default_format():
+    return "parquet" if _have_pyarrow() else "csv.gz"
+
+
+# ---------- building the frame ----------
+def schedule_frame(csv_path):
+    """Typed frame (COLUMNS) from an overall_schedule.csv, with or without the teacher columns."""
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    for col in ("Teacher ID", "Teacher Name"):
+        if col not in df.columns:
+            df[col] = ""
+    slot_of = {t: i for i, t in enumerate(TIME_SLOTS)}
+    out = pd.DataFrame({
+        "Day": df["Day"],
+        "Branch": df["Branch"],
+        "Section": df["Section"],
+        "Batch": df["Batch"],
+        "Time": df["Time"],
+        "Slot": df["Time"].map(slot_of).fillna(-1).astype("int8"),
+        "Periods": df["Activity"].str.lower().eq("lab").map({True: 2, False: 1}).astype("int8"),
+        "Activity": df["Activity"],
+        "Room": df["Room"],
+        "Subject": df["Subject/Notes"].astype("string"),
+        "Teacher ID": df["Teacher ID"],
+        "Teacher Name": df["Teacher Name"],
+    }, columns=COLUMNS)
+    for col in CATEGORICAL:
+        out[col] = out[col].astype(_category(col, out[col]))
+    return out
+
+
+def _category(col, values):
+    if col in ORDERED:
+        known = list(ORDERED[col])
+        return pd.CategoricalDtype(known + sorted(set(values) - set(known)), ordered=True)
+    return pd.CategoricalDtype(sorted(set(values)))
+
+
+def schema_of(frame, fmt):
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "format": fmt,
+        "columns": {col: str(frame[col].dtype) for col in frame.columns},
+        "categories": {col: [str(c) for c in frame[col].cat.categories] for col in CATEGORICAL},
+        "ordered": sorted(ORDERED),
+        "rows": len(frame),
+    }
+
+
+# ---------- writing / reading ----------
+def _tmp(path):
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def write_columnar(frame, out_dir, stem, fmt=None):
+    """Write <stem>.parquet or <stem>.csv.gz plus <stem>.schema.json into out_dir (atomically); returns the data path."""
+    fmt = fmt or default_format()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    schema = schema_of(frame, fmt)
+    path = out_dir / f"{stem}.{fmt}"
+    tmp = _tmp(path)
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b"tibl_schema_version": str(SCHEMA_VERSION).encode()})
+        pq.write_table(table, tmp)
+    elif fmt == "csv.gz":
+        with gzip.open(tmp, "wt", encoding="utf-8", newline="") as f:
+            frame.to_csv(f, index=False)
+    else:
+        raise ValueError(f"Unknown columnar format {fmt!r}")
+    os.replace(tmp, path)
+
+    schema_path = out_dir / f"{stem}.schema.json"
+    tmp = _tmp(schema_path)
+    tmp.write_text(json.dumps(schema, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, schema_path)
+    return path
+
+
+def export_schedule(csv_path, out_dir, stem, fmt=None):
+    return write_columnar(schedule_frame(csv_path), out_dir, stem, fmt)
+
+
+def find_columnar(out_dir, stem):
+    """The data file written for `stem` in out_dir (whichever format), or None."""
+    for fmt in ("parquet", "csv.gz"):
+        path = Path(out_dir) / f"{stem}.{fmt}"
+        if path.exists():
+            return path
+    return None
+
+
+def read_columnar(path):
+    """Load a columnar export back into the typed frame; raises ValueError for an unknown schema version."""
+    path = Path(path)
+    stem = path.name.split(".", 1)[0]
+    schema = json.loads((path.parent / f"{stem}.schema.json").read_text(encoding="utf-8"))
+    if schema.get("schema_version") != SCHEMA_VERSION:
+        raise ValueError(f"{path.name}: schema version {schema.get('schema_version')}, expected {SCHEMA_VERSION}")
+    ordered = set(schema.get("ordered", []))
+    categories = {col: pd.CategoricalDtype(values, ordered=col in ordered)
+                  for col, values in schema["categories"].items()}
+    if schema["format"] == "parquet":
+        import pyarrow.parquet as pq
+
+        frame = pq.read_table(path).to_pandas()
+        return frame.astype(categories)
+    dtypes = {col: dtype for col, dtype in schema["columns"].items() if col not in categories}
+    return pd.read_csv(path, compression="gzip", keep_default_na=False, dtype={**dtypes, **categories})
@@ -0,0 +1,210 @@
+# compact_grid.py
+"""
+Interned, integer-encoded timetable grid.
+
+The generation JSON repeats the full "CODE — Teacher Name (ID)" string in every cell. Here every
+distinct subject, teacher and room string is stored once, every distinct cell once (as a list of
+(subject, teacher, room) indexes), and the timetable itself is one small-integer array laid out as
+section x day x slot:
+
+    b"TTG1" | u32 header length | header JSON | padding to 4 bytes | grid (uint16 or uint32, little-endian)
+
+    header = {"version", "typecode", "days", "slots", "sections", "subjects", "teachers", "rooms", "cells"}
+    grid[(section * n_days + day) * n_slots + slot] = cell id + 1   (0 = empty cell)
+
+load_grid() memory-maps the file, so only the small header is parsed; to_data() / records() expand
+back to the current JSON shape (exactly) only when asked.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+from timetable import TIME_SLOTS
+
+MAGIC = b"TTG1"
+VERSION = 1
+SEPARATOR = " — "
+
+
+# ---------- encoding ----------
+class _Interner:
+    def __init__(self):
+        self.items = []
+        self._ids = {}
+
+    def __call__(self, value):
+        if value not in self._ids:
+            self._ids[value] = len(self.items)
+            self.items.append(value)
+        return self._ids[value]
+
+
+def _split_entry(line):
+    """ "CODE — Name (ID)" -> ("CODE", "Name (ID)"); lines without the separator stay whole. """
+    code, sep, teacher = line.partition(SEPARATOR)
+    return (code, teacher) if sep else (line, None)
+
+
+def rooms_from_schedule_csv(csv_path):
+    """{(section, day, slot label, subject code): room} from overall_schedule.csv (labs cover both periods)."""
+    import csv
+
+    rooms = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            section = f"{row.get('Branch', '')}-{row.get('Section', '')}"
+            time_label = row.get("Time", "")
+            labels = [time_label]
+            if (row.get("Activity") or "").lower() == "lab" and time_label in TIME_SLOTS:
+                nxt = TIME_SLOTS.index(time_label) + 1
+                if nxt < len(TIME_SLOTS):
+                    labels.append(TIME_SLOTS[nxt])
+            for label in labels:
+                rooms.setdefault((section, row.get("Day", ""), label, row.get("Subject/Notes", "")), row.get("Room", ""))
+    return rooms
+
+
+def encode(data, rooms=None):
+    """Bytes of the compact form of `data` ({section: [ {"Day": ..., slot: cell} ]})."""
+    rooms = rooms or {}
+    sections = list(data)
+    days, slots = [], []
+    for rows in data.values():
+        for row in rows or []:
+            if row.get("Day") not in days:
+                days.append(row.get("Day"))
+            for key in row:
+                if key != "Day" and key not in slots:
+                    slots.append(key)
+
+    subjects, teachers, room_names = _Interner(), _Interner(), _Interner()
+    cell_ids, cells = {}, []
+    grid = [0] * (len(sections) * len(days) * len(slots))
+    for s_idx, section in enumerate(sections):
+        for row in data[section] or []:
+            d_idx = days.index(row.get("Day"))
+            for key, value in row.items():
+                if key == "Day" or value is None:
+                    continue
+                t_idx = slots.index(key)
+                entries = []
+                for line in str(value).split("\n"):
+                    code, teacher = _split_entry(line)
+                    room = rooms.get((section, row.get("Day"), key, code))
+                    entries.append((subjects(code), -1 if teacher is None else teachers(teacher),
+                                    -1 if not room else room_names(room)))
+                if _expand_cell(entries, subjects.items, teachers.items) != value:
+                    # not something we can rebuild from parts; keep it verbatim
+                    entries = [(subjects(value), -1, -1)]
+                entries = tuple(entries)
+                if entries not in cell_ids:
+                    cell_ids[entries] = len(cells)
+                    cells.append([list(e) for e in entries])
+                grid[(s_idx * len(days) + d_idx) * len(slots) + t_idx] = cell_ids[entries] + 1
+
+    typecode = "H" if len(cells) < 0xFFFF else "I"
+    header = json.dumps({
+        "version": VERSION,
+        "typecode": typecode,
+        "days": days,
+        "slots": slots,
+        "sections": sections,
+        "subjects": subjects.items,
+        "teachers": teachers.items,
+        "rooms": room_names.items,
+        "cells": cells,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    body = array(typecode, grid)
+    if sys.byteorder != "little":
+        body.byteswap()
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % 4)
+    return prefix + body.tobytes()
+
+
+def write_grid(data, path, rooms=None):
+    """Write the compact form atomically (temp file + rename) and return the path."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode(data, rooms))
+    os.replace(tmp, path)
+    return path
+
+
+# ---------- decoding ----------
+def _expand_cell(entries, subjects, teachers):
+    return "\n".join(subjects[s] if t < 0 else f"{subjects[s]}{SEPARATOR}{teachers[t]}" for s, t, _ in entries)
+
+
+class CompactGrid:
+    """Read-side view over an encoded grid (bytes or an mmap); cells are expanded lazily."""
+
+    def __init__(self, buf):
+        if bytes(buf[:4]) != MAGIC:
+            raise ValueError("Not a timetable grid file")
+        (length,) = struct.unpack_from("<I", buf, 4)
+        header = json.loads(bytes(buf[8:8 + length]).decode("utf-8"))
+        if header.get("version") != VERSION:
+            raise ValueError(f"Unsupported grid version: {header.get('version')}")
+        self._buf = buf
+        self.days = header["days"]
+        self.slots = header["slots"]
+        self.sections = header["sections"]
+        self.subjects = header["subjects"]
+        self.teachers = header["teachers"]
+        self.rooms = header["rooms"]
+        self.cells = header["cells"]
+        start = 8 + length + (-(8 + length) % 4)
+        grid = memoryview(buf)[start:].cast(header["typecode"])
+        if sys.byteorder != "little":
+            grid = array(header["typecode"], grid)
+            grid.byteswap()
+        self.grid = grid
+        self._text = {}
+
+    @property
+    def nbytes(self):
+        return len(self._buf)
+
+    def cell_id(self, section, day, slot):
+        """Interned cell id at a position (-1 if empty)."""
+        s, d, t = self.sections.index(section), self.days.index(day), self.slots.index(slot)
+        return self.grid[(s * len(self.days) + d) * len(self.slots) + t] - 1
+
+    def cell_text(self, cell_id):
+        if cell_id < 0:
+            return None
+        if cell_id not in self._text:
+            self._text[cell_id] = _expand_cell(self.cells[cell_id], self.subjects, self.teachers)
+        return self._text[cell_id]
+
+    def cell_rooms(self, cell_id):
+        return [self.rooms[r] for _, _, r in self.cells[cell_id] if r >= 0] if cell_id >= 0 else []
+
+    def records(self, section):
+        """One section in the JSON shape: [ {"Day": ..., slot: text or None} ]."""
+        s = self.sections.index(section)
+        width = len(self.slots)
+        rows = []
+        for d, day in enumerate(self.days):
+            base = (s * len(self.days) + d) * width
+            row = {"Day": day}
+            for t, slot in enumerate(self.slots):
+                row[slot] = self.cell_text(self.grid[base + t] - 1)
+            rows.append(row)
+        return rows
+
+    def to_data(self, sections=None):
+        names = [s for s in sections if s in self.sections] if sections else self.sections
+        return {name: self.records(name) for name in names}
+
+
+def load_grid(path):
+    """CompactGrid over a memory-mapped file; pages are only read when cells are touched."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return CompactGrid(mapped)
@@ -0,0 +1,100 @@
+# events.py
+"""
+Server-sent events broadcast for dashboards.
+
+Instead of every open dashboard polling /latest (a directory listing + stat per poll), the API
+publishes one small event when something changes and every subscriber gets it:
+
+    event: generation   data: {"id": "timetable_<ts>", "json": ..., "csv": ..., "sections": [...], "teachers": [...]}
+    event: user         data: {"action": "created" | "updated" | "deleted", "id": ...}
+
+publish() may be called from any thread (sync endpoints, the I/O pool); delivery happens on each
+subscriber's event loop. The last few events are kept so a reconnecting client that sends
+Last-Event-ID only receives what it missed.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import deque
+
+HEARTBEAT_SECONDS = int(os.environ.get("TIBL_SSE_HEARTBEAT", 15))
+QUEUE_SIZE = 64         # events buffered per subscriber before it is considered stuck and dropped
+REPLAY_SIZE = 100       # recent events kept for Last-Event-ID replay
+
+
+class EventBroker:
+    def __init__(self, queue_size=QUEUE_SIZE, replay_size=REPLAY_SIZE):
+        self.queue_size = queue_size
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=replay_size)
+        self._subscribers = {}          # queue -> loop
+        self._lock = threading.Lock()
+
+    def subscribe(self, last_event_id=None):
+        """Register the calling loop; returns a queue pre-filled with events after last_event_id."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+            if last_event_id is not None:
+                for event in self._recent:
+                    if event[0] > last_event_id and not queue.full():
+                        queue.put_nowait(event)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, kind, payload):
+        with self._lock:
+            event = (next(self._ids), kind, payload)
+            self._recent.append(event)
+            targets = list(self._subscribers.items())
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # loop already closed (server shutting down)
+                self.unsubscribe(queue)
+        return event[0]
+
+    def _offer(self, queue, event):
+        if queue.full():
+            # a client that stopped reading; drop it so it can't hold memory, it will reconnect
+            self.unsubscribe(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+            return
+        queue.put_nowait(event)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+def format_event(event):
+    event_id, kind, payload = event
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def stream(queue, broker, heartbeat=HEARTBEAT_SECONDS):
+    """SSE body: events as they arrive, a comment line every `heartbeat` seconds to keep proxies open."""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                break
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(queue)
+
+
+broker = EventBroker()
@@ -0,0 +1,126 @@
+# free_finder.py
+"""
+Free room / free slot finder over one generation.
+
+Every section, teacher and room gets an occupancy bitmask for the week: one Python int with bit
+(day index * len(TIME_SLOTS) + slot) set when the resource is busy (labs set both of their periods).
+The masks are built once per generation from overall_schedule.csv; a query is then a handful of
+integer operations:
+
+    free at (day, slot)       not (mask >> bit) & 1
+    free for A and B and T    ~(mask_A | mask_B | mask_T | BLOCKED_MASK)
+    n consecutive periods     free & (free >> 1) & ... & (free >> n-1), restricted to starts whose
+                              run stays inside the day
+    first fit                 the lowest set bit of that
+
+Rooms are every lab room in the lab pools (LAB_POOLS, or an institution's config.json) plus every
+room the generation uses. Teacher masks can be widened with the unavailability from
+teacher_availability.csv (see timetable.load_availability).
+"""
+import csv
+
+from timetable import BLOCKED, DAYS, LAB_POOLS, TIME_SLOTS
+
+N_SLOTS = len(TIME_SLOTS)
+FULL_MASK = (1 << (len(DAYS) * N_SLOTS)) - 1
+KINDS = ("section", "teacher", "room")
+
+
+def bit(day, slot):
+    return 1 << (DAYS.index(day) * N_SLOTS + slot)
+
+
+BLOCKED_MASK = sum(bit(d, s) for d in DAYS for s in BLOCKED)
+# starts from which `length` periods stay inside the day, per length
+_START_OK = {n: sum(bit(d, s) for d in DAYS for s in range(N_SLOTS - n + 1)) for n in range(1, N_SLOTS + 1)}
+
+
+def slot_index(value):
+    """A TIME_SLOTS label, its start time ("09:00") or an index -> slot index; ValueError otherwise."""
+    value = str(value).strip()
+    if value.isdigit() and int(value) < N_SLOTS:
+        return int(value)
+    for i, label in enumerate(TIME_SLOTS):
+        if value in (label, label.split("-")[0]):
+            return i
+    raise ValueError(f"Unknown slot {value!r}")
+
+
+def unavailability_masks(availability):
+    """{teacher id: mask} from a load_availability() result."""
+    return {tid: sum(bit(d, s) for d, s in prefs["unavailable"] if d in DAYS) for tid, prefs in availability.items()}
+
+
+class FreeIndex:
+    def __init__(self, rows, lab_pools=None):
+        self.lab_pools = LAB_POOLS if lab_pools is None else lab_pools
+        self.masks = {kind: {} for kind in KINDS}
+        for room in (r for pool in self.lab_pools.values() for r in pool):
+            self.masks["room"][room] = 0
+        slot_of = {t: i for i, t in enumerate(TIME_SLOTS)}
+        for row in rows:
+            slot, day = slot_of.get(row.get("Time", "")), row.get("Day", "")
+            if slot is None or day not in DAYS:
+                continue
+            span = 2 if (row.get("Activity") or "").lower() == "lab" else 1
+            mask = sum(bit(day, s) for s in range(slot, min(slot + span, N_SLOTS)))
+            for kind, key in (("section", f"{row.get('Branch', '')}-{row.get('Section', '')}"),
+                              ("teacher", row.get("Teacher ID", "")), ("room", row.get("Room", ""))):
+                if key:
+                    self.masks[kind][key] = self.masks[kind].get(key, 0) | mask
+
+    @classmethod
+    def from_csv(cls, path, lab_pools=None):
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(list(csv.DictReader(f)), lab_pools)
+
+    def mask(self, kind, key, unavailable=None):
+        if key not in self.masks[kind]:
+            raise KeyError(f"Unknown {kind} {key}")
+        extra = (unavailable or {}).get(key, 0) if kind == "teacher" else 0
+        return self.masks[kind][key] | extra
+
+    def rooms(self, pool=None):
+        return sorted(self.masks["room"]) if not pool else list(self.lab_pools.get(pool, []))
+
+    # ---------- queries ----------
+    def free_at(self, kind, day, slot, keys=None, unavailable=None):
+        """Resources of `kind` (all, or just `keys`) free at (day, slot); nothing is free in a BLOCKED slot."""
+        b = bit(day, slot)
+        if b & BLOCKED_MASK:
+            return []
+        keys = self.rooms() if keys is None and kind == "room" else (keys or sorted(self.masks[kind]))
+        return [k for k in keys if not self.mask(kind, k, unavailable) & b]
+
+    def free_starts(self, resources, length=1, day=None, unavailable=None):
+        """Mask of the start periods where every (kind, key) in `resources` is free for `length` periods."""
+        busy = BLOCKED_MASK
+        for kind, key in resources:
+            busy |= self.mask(kind, key, unavailable)
+        free = ~busy & FULL_MASK
+        starts = free
+        for n in range(1, length):
+            starts &= free >> n
+        starts &= _START_OK.get(length, 0)
+        if day:
+            starts &= sum(bit(day, s) for s in range(N_SLOTS))
+        return starts
+
+    def common_slots(self, resources, length=1, day=None, pool=None, unavailable=None):
+        """
+        Lazily yield {"day", "slot", "slots", "rooms"} for every start (earliest first) that fits, so the
+        first item is the first fit. With a room `pool` ("CSE", or "ANY" for every room) only starts
+        where one of its rooms is also free count, and "rooms" lists them.
+        """
+        starts = self.free_starts(resources, length, day, unavailable)
+        rooms = [(r, self.masks["room"].get(r, 0)) for r in (self.rooms(None if pool == "ANY" else pool) if pool else [])]
+        while starts:
+            low = starts & -starts
+            starts ^= low
+            pos = low.bit_length() - 1
+            d, s = DAYS[pos // N_SLOTS], pos % N_SLOTS
+            need = sum(low << n for n in range(length))
+            free_rooms = [r for r, m in rooms if not m & need]
+            if pool and not free_rooms:
+                continue
+            yield {"day": d, "slot": TIME_SLOTS[s], "slots": TIME_SLOTS[s:s + length], "rooms": free_rooms}
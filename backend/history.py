@@ -0,0 +1,295 @@
+# history.py
+"""
+Delta-compressed generation history.
+
+Every committed generation (timetable_<ts>.csv + .json) is recorded under generated/history/ as either
+    <stem>.snap.gz    full CSV and JSON text
+    <stem>.delta.gz   changes against the previously recorded generation:
+                        csv:  line opcodes [i1, i2, [new lines]] (difflib), applied back to front
+                        json: changed cells {section: [[row, {slot: value}], ...]}; sections whose
+                              shape changed are stored whole
+and log.json keeps {stem: {"kind", "base", "depth", "mtime"}}. A delta is only written when replaying
+it reproduces the new files byte for byte; otherwise, when the chain back to the last snapshot would
+exceed SNAPSHOT_EVERY, or when the delta isn't much smaller, a snapshot is written instead. So
+rebuilding any generation reads one snapshot plus at most SNAPSHOT_EVERY - 1 small deltas.
+
+The newest generation is only recorded once a newer one replaces it, because renames are still
+patched into it in place. Only the newest KEEP_FULL generations stay as plain files in generated/;
+older ones are deleted once recorded and rebuilt on demand by materialize() (with their original
+mtime, so /latest is unaffected), and pruned again MATERIALIZED_TTL seconds later.
+
+Pruning only ever deletes generations committed after the store was started (history/since, written
+by start() before the first commit that uses it): files that were already in generated/ - e.g. ones
+checked into the repository - are recorded but never removed.
+"""
+import difflib
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+SNAPSHOT_EVERY = int(os.environ.get("TIBL_HISTORY_SNAPSHOT_EVERY", 8))
+KEEP_FULL = int(os.environ.get("TIBL_HISTORY_KEEP_FULL", 10))
+MATERIALIZED_TTL = 600
+GENERATION_RE = re.compile(r"^timetable_(\d+)\.(csv|json)$")
+
+_lock = threading.RLock()
+
+
+def _timestamp(stem):
+    return int(stem.rsplit("_", 1)[-1])
+
+
+# ---------- storage ----------
+def _read_gz(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_gz(path, value):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _write_text(path, text, mtime=None):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(tmp, (mtime, mtime))
+    os.replace(tmp, path)
+
+
+class History:
+    def __init__(self, generated_dir):
+        self.generated_dir = Path(generated_dir)
+        self.dir = self.generated_dir / "history"
+        self._log = None
+        self._since = None
+        self._last = None             # (stem, csv text, json text) of the newest recorded generation
+        self._materialized = {}       # stem -> time it was rebuilt into generated_dir
+
+    @property
+    def log(self):
+        if self._log is None:
+            path = self.dir / "log.json"
+            self._log = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        return self._log
+
+    def _save_log(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / "log.json"
+        tmp = path.with_name(f".log.json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.log, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @property
+    def since(self):
+        """Timestamp from which generations belong to the store (None until start())."""
+        if self._since is None:
+            path = self.dir / "since"
+            if path.exists():
+                self._since = int(path.read_text(encoding="utf-8").strip())
+        return self._since
+
+    def start(self):
+        """Take ownership of generations committed from now on; a no-op once started."""
+        with _lock:
+            if self.since is None:
+                self.dir.mkdir(parents=True, exist_ok=True)
+                self._since = int(time.time())
+                _write_text(self.dir / "since", str(self._since))
+            return self._since
+
+    def __contains__(self, stem):
+        return stem in self.log
+
+    # ---------- deltas ----------
+    @staticmethod
+    def _csv_delta(old, new):
+        a, b = old.splitlines(keepends=True), new.splitlines(keepends=True)
+        ops = difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+        return [[i1, i2, b[j1:j2]] for tag, i1, i2, j1, j2 in ops if tag != "equal"]
+
+    @staticmethod
+    def _apply_csv(text, ops):
+        lines = text.splitlines(keepends=True)
+        for i1, i2, new in reversed(ops):
+            lines[i1:i2] = new
+        return "".join(lines)
+
+    @staticmethod
+    def _json_delta(old, new):
+        """Cell-level delta between two JSON texts, or None when either isn't a {section: [rows]} timetable."""
+        try:
+            a, b = json.loads(old), json.loads(new)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(a, dict) or not isinstance(b, dict):
+            return None
+        delta = {"order": list(b), "cells": {}, "whole": {}}
+        for section, rows in b.items():
+            prev = a.get(section)
+            if not isinstance(rows, list) or not isinstance(prev, list) or len(prev) != len(rows) or \
+                    any(not isinstance(r, dict) or not isinstance(p, dict) or list(r) != list(p) for r, p in zip(rows, prev)):
+                delta["whole"][section] = rows
+                continue
+            changes = [[i, {k: v for k, v in r.items() if p.get(k) != v}] for i, (r, p) in enumerate(zip(rows, prev)) if r != p]
+            if changes:
+                delta["cells"][section] = changes
+        return delta
+
+    @staticmethod
+    def _apply_json(text, delta):
+        data = json.loads(text)
+        out = {}
+        for section in delta["order"]:
+            if section in delta["whole"]:
+                out[section] = delta["whole"][section]
+                continue
+            rows = data[section]
+            for i, changes in delta["cells"].get(section, []):
+                rows[i].update(changes)
+            out[section] = rows
+        return json.dumps(out, ensure_ascii=False)
+
+    # ---------- record / rebuild ----------
+    def _texts(self, stem):
+        texts = []
+        for ext in ("csv", "json"):
+            path = self.generated_dir / f"{stem}.{ext}"
+            if path.exists():
+                with open(path, encoding="utf-8", newline="") as f:    # keep \r\n so rebuilds are byte-exact
+                    texts.append(f.read())
+            else:
+                texts.append(None)
+        return texts
+
+    def record(self, stem):
+        """Add a generation (whose files are in generated_dir) to the history; no-op if already there."""
+        with _lock:
+            if stem in self.log:
+                return self.log[stem]
+            csv_text, json_text = self._texts(stem)
+            if csv_text is None and json_text is None:
+                raise FileNotFoundError(f"No files for generation {stem}")
+            self.dir.mkdir(parents=True, exist_ok=True)
+            mtime = max((self.generated_dir / f"{stem}.{ext}").stat().st_mtime for ext in ("csv", "json")
+                        if (self.generated_dir / f"{stem}.{ext}").exists())
+
+            entry = {"kind": "snapshot", "base": None, "depth": 0, "mtime": mtime}
+            snapshot = {"csv": csv_text, "json": json_text}
+            base = self._newest()
+            if base and self.log[base]["depth"] + 1 < SNAPSHOT_EVERY and csv_text is not None and json_text is not None:
+                base_csv, base_json = self.rebuild(base)
+                delta = self._delta(base_csv, base_json, csv_text, json_text)
+                if delta and len(json.dumps(delta)) < len(json.dumps(snapshot)) // 2:
+                    entry = {"kind": "delta", "base": base, "depth": self.log[base]["depth"] + 1, "mtime": mtime}
+                    _write_gz(self.dir / f"{stem}.delta.gz", delta)
+            if entry["kind"] == "snapshot":
+                _write_gz(self.dir / f"{stem}.snap.gz", snapshot)
+            self.log[stem] = entry
+            self._save_log()
+            self._last = (stem, csv_text, json_text)
+            return entry
+
+    def _delta(self, base_csv, base_json, csv_text, json_text):
+        if base_csv is None or base_json is None:
+            return None
+        delta = {"csv": self._csv_delta(base_csv, csv_text), "json": self._json_delta(base_json, json_text)}
+        if delta["json"] is None:
+            return None
+        # only keep deltas that replay exactly
+        if self._apply_csv(base_csv, delta["csv"]) != csv_text or self._apply_json(base_json, delta["json"]) != json_text:
+            return None
+        return delta
+
+    def _newest(self):
+        return max(self.log, key=_timestamp) if self.log else None
+
+    def rebuild(self, stem):
+        """(csv text, json text) of a recorded generation: its snapshot plus the deltas after it."""
+        with _lock:
+            if self._last and self._last[0] == stem:
+                return self._last[1], self._last[2]
+            chain = []
+            while self.log[stem]["kind"] == "delta":
+                chain.append(stem)
+                stem = self.log[stem]["base"]
+            snap = _read_gz(self.dir / f"{stem}.snap.gz")
+            csv_text, json_text = snap["csv"], snap["json"]
+            for s in reversed(chain):
+                delta = _read_gz(self.dir / f"{s}.delta.gz")
+                csv_text = self._apply_csv(csv_text, delta["csv"])
+                json_text = self._apply_json(json_text, delta["json"])
+            return csv_text, json_text
+
+    def materialize(self, name):
+        """Write generated_dir/<name> back from history if it was pruned; True if the file exists afterwards."""
+        path = self.generated_dir / name
+        if path.exists():
+            return True
+        m = GENERATION_RE.match(name)
+        if not m or Path(name).stem not in self.log:
+            return False
+        stem = Path(name).stem
+        with _lock:
+            csv_text, json_text = self.rebuild(stem)
+            text = csv_text if m.group(2) == "csv" else json_text
+            if text is None:
+                return False
+            _write_text(path, text, mtime=self.log[stem]["mtime"])
+            self._materialized[stem] = time.time()
+        return True
+
+    # ---------- maintenance ----------
+    def generations(self):
+        """Stems of the generations with plain files in generated_dir, oldest first."""
+        stems = {p.stem for p in self.generated_dir.iterdir() if GENERATION_RE.match(p.name) and p.is_file()}
+        return sorted(stems, key=_timestamp)
+
+    def backfill(self, skip=()):
+        """Record every generation on disk that isn't in the history yet (oldest first)."""
+        added = 0
+        for stem in self.generations():
+            if stem not in self.log and stem not in skip:
+                self.record(stem)
+                added += 1
+        return added
+
+    def prune(self, keep=KEEP_FULL, protect=()):
+        """
+        Delete the plain files of recorded generations older than the newest `keep`; returns the stems.
+        Generations from before start() are never deleted.
+        """
+        with _lock:
+            if self.since is None:
+                return []
+            stems = self.generations()
+            removed = []
+            now = time.time()
+            for stem in stems[:max(0, len(stems) - keep)]:
+                if stem not in self.log or stem in protect or _timestamp(stem) < self.since \
+                        or now - self._materialized.get(stem, 0) < MATERIALIZED_TTL:
+                    continue
+                for ext in ("csv", "json"):
+                    (self.generated_dir / f"{stem}.{ext}").unlink(missing_ok=True)
+                removed.append(stem)
+            return removed
+
+    def stats(self):
+        files = list(self.dir.glob("*.gz")) if self.dir.exists() else []
+        return {
+            "generations": len(self.log),
+            "snapshots": sum(1 for e in self.log.values() if e["kind"] == "snapshot"),
+            "deltas": sum(1 for e in self.log.values() if e["kind"] == "delta"),
+            "bytes": sum(f.stat().st_size for f in files),
+            "snapshot_every": SNAPSHOT_EVERY,
+            "keep_full": KEEP_FULL,
+            "since": self.since,
+        }
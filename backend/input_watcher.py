@@ -0,0 +1,133 @@
+# input_watcher.py
+"""
+Optional background watcher for the scheduler inputs (teachers.csv, subjects.csv,
+subjects_with_teachers.csv, teacher_availability.csv).
+
+The files are polled by (mtime, size) - no extra dependency - and a burst of edits is debounced
+until nothing has changed for `debounce` seconds. The settled contents are then compared with the
+last ones seen and the change is classified:
+
+  - cosmetic:   only teacher names / emails / passwords changed, or teachers nobody teaches with
+                were added/removed -> the caller refreshes names in the latest generation
+  - structural: subjects, credits, types, teacher assignments or availability changed, or a
+                teacher that is assigned a subject appeared/disappeared -> the caller regenerates
+
+Callbacks run on the watcher thread, one change at a time.
+"""
+import csv
+import os
+import threading
+import time
+from pathlib import Path
+
+INPUT_FILES = ["teachers.csv", "subjects.csv", "subjects_with_teachers.csv", "teacher_availability.csv"]
+POLL_SECONDS = float(os.environ.get("TIBL_WATCH_INTERVAL", 1.0))
+DEBOUNCE_SECONDS = float(os.environ.get("TIBL_WATCH_DEBOUNCE", 3.0))
+
+
+def _rows(path):
+    if not path.exists():
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return [{(k or "").strip().lower(): (v or "").strip() for k, v in row.items()} for row in csv.DictReader(f)]
+
+
+def read_inputs(base_dir):
+    base_dir = Path(base_dir)
+    teachers = {r.get("id", ""): r for r in _rows(base_dir / "teachers.csv") if r.get("id")}
+    subjects = sorted(tuple(sorted(r.items())) for r in _rows(base_dir / "subjects.csv"))
+    assignments = sorted(tuple(sorted(r.items())) for r in _rows(base_dir / "subjects_with_teachers.csv"))
+    availability = sorted(tuple(sorted(r.items())) for r in _rows(base_dir / "teacher_availability.csv"))
+    return {"teachers": teachers, "subjects": subjects, "assignments": assignments, "availability": availability}
+
+
+def classify(old, new):
+    """("none" | "cosmetic" | "structural", details) for two read_inputs() results."""
+    reasons = []
+    if old["subjects"] != new["subjects"]:
+        reasons.append("subjects.csv changed")
+    if old["assignments"] != new["assignments"]:
+        reasons.append("subjects_with_teachers.csv changed")
+    if old.get("availability") != new.get("availability"):
+        reasons.append("teacher_availability.csv changed")
+
+    assigned = {dict(r).get("teacher_id", "") for r in new["assignments"]} | \
+               {dict(r).get("teacher_id", "") for r in old["assignments"]}
+    added = set(new["teachers"]) - set(old["teachers"])
+    removed = set(old["teachers"]) - set(new["teachers"])
+    if (added | removed) & assigned:
+        reasons.append(f"assigned teachers added/removed: {sorted((added | removed) & assigned)}")
+
+    renamed = {tid: (old["teachers"][tid].get("name", ""), row.get("name", ""))
+               for tid, row in new["teachers"].items()
+               if tid in old["teachers"] and old["teachers"][tid].get("name", "") != row.get("name", "")}
+    details = {"reasons": reasons, "renamed": renamed, "added": sorted(added), "removed": sorted(removed)}
+    if reasons:
+        return "structural", details
+    if renamed or added or removed or old["teachers"] != new["teachers"]:
+        return "cosmetic", details
+    return "none", details
+
+
+class InputWatcher:
+    def __init__(self, base_dir, on_cosmetic, on_structural, poll=POLL_SECONDS, debounce=DEBOUNCE_SECONDS):
+        self.base_dir = Path(base_dir)
+        self.on_cosmetic = on_cosmetic
+        self.on_structural = on_structural
+        self.poll = poll
+        self.debounce = debounce
+        self.status = {"running": False, "last_change": None, "last_kind": None, "last_action": None, "last_error": None}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stamp(self):
+        stamp = {}
+        for name in INPUT_FILES:
+            path = self.base_dir / name
+            try:
+                st = path.stat()
+                stamp[name] = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                stamp[name] = None
+        return stamp
+
+    def start(self):
+        self._stop.clear()
+        # baseline taken before returning so edits made right after start() are not missed
+        self._thread = threading.Thread(target=self._run, args=(self._stamp(), read_inputs(self.base_dir)),
+                                        name="tibl-input-watcher", daemon=True)
+        self._thread.start()
+        self.status["running"] = True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll * 2 + 1)
+        self.status["running"] = False
+
+    def _run(self, stamp, inputs):
+        changed_at = None
+        while not self._stop.wait(self.poll):
+            current = self._stamp()
+            if current != stamp:
+                stamp, changed_at = current, time.monotonic()
+                continue
+            if changed_at is None or time.monotonic() - changed_at < self.debounce:
+                continue
+            changed_at = None
+            try:
+                new_inputs = read_inputs(self.base_dir)
+                kind, details = classify(inputs, new_inputs)
+                inputs = new_inputs
+                self.status.update(last_change=time.time(), last_kind=kind, last_error=None)
+                if kind == "cosmetic":
+                    print(f"[watcher] cosmetic input change: {details}")
+                    self.on_cosmetic(details)
+                    self.status["last_action"] = "metadata refresh"
+                elif kind == "structural":
+                    print(f"[watcher] structural input change: {details['reasons']}")
+                    self.on_structural(details)
+                    self.status["last_action"] = "regeneration"
+            except Exception as e:
+                print(f"[watcher] failed to handle input change: {e}")
+                self.status["last_error"] = str(e)
@@ -2,6 +2,9 @@ import pandas as pd
 import json
 import os
 
+from xlsx_writer import records_from_sheets
+
+
 def excel_to_json(excel_path, output_json_path):
 
     # Debugging: Print the path being used
@@ -25,11 +28,21 @@ def excel_to_json(excel_path, output_json_path):
     print(f"✅ JSON saved to: {output_json_path}")
 
 
+def sheets_to_json(sheets, output_json_path):
+    """Same JSON shape as excel_to_json, straight from in-memory sheets (no XLSX round-trip)."""
+    final_json = records_from_sheets(sheets)
+    with open(output_json_path, "w", encoding="utf-8") as f:
+        json.dump(final_json, f, ensure_ascii=False)
+
+    print(f"✅ JSON saved to: {output_json_path}")
+
+
 # ---------------------------------------
 #  USE YOUR CORRECT WINDOWS PATH HERE
 # ---------------------------------------
 
-excel_to_json(
-    excel_path=r"c:\Users\saisr\OneDrive\Desktop\Desktop\timetable-py\Tibl.ai-main\backend\timetable_tools\output_v5\All_Timetables_with_Teachers_fixed_v2.xlsx",
-    output_json_path="timetable.json"
-)
+if __name__ == "__main__":
+    excel_to_json(
+        excel_path=r"c:\Users\saisr\OneDrive\Desktop\Desktop\timetable-py\Tibl.ai-main\backend\timetable_tools\output_v5\All_Timetables_with_Teachers_fixed_v2.xlsx",
+        output_json_path="timetable.json"
+    )
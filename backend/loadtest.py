@@ -0,0 +1,319 @@
+# loadtest.py
+"""
+Load-testing harness for the API.
+
+By default it builds a throwaway copy of the backend seeded with a synthetic institution (teachers,
+subjects, an admin), runs one generation, then replays a weighted mix of requests through
+concurrency stages and prints throughput and latency percentiles per route.
+
+    python loadtest.py                                   # in-process (httpx ASGI transport)
+    python loadtest.py --server                          # same sandbox behind a local uvicorn
+    python loadtest.py --url http://127.0.0.1:8000 --email a@b --password x   # an existing server (read-only mix)
+
+    --stages 10:15,50:30      concurrency:seconds, run in order (a ramp)
+    --mix teacher=40,json=10  route weights (routes: see ROUTES)
+    --max-p99 teacher=50      exit 1 if a route's p99 (ms) is over the limit; for CI regression checks
+    --out results.json        also write the numbers as JSON
+
+Needs httpx (pip install httpx), which the API itself does not.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ROUTES = ["login", "teacher", "json", "preview", "latest", "user_edit", "generate"]
+WRITE_ROUTES = {"user_edit", "generate"}
+DEFAULT_MIX = "login=10,teacher=35,json=15,preview=10,latest=20,user_edit=8,generate=2"
+DEFAULT_STAGES = "5:10,20:15,50:15"
+PASSWORD = "loadtest"
+ADMIN_EMAIL = "admin@loadtest.local"
+
+
+# ---------- synthetic institution ----------
+def seed_sandbox(root, teachers=60, subjects=6, seed=7):
+    """Copy the backend code into `root` and write synthetic inputs next to it."""
+    rng = random.Random(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    for src in HERE.glob("*.py"):
+        shutil.copy2(src, root / src.name)
+    # every backend module (here and in the in-process app) is imported from the sandbox copy
+    sys.path.insert(0, str(root))
+    import auth
+    import timetable
+
+    hashed = auth.hash_password(PASSWORD)            # one hash shared by every synthetic account
+    staff = [(f"LT_{i:04d}", f"Teacher {i:04d}", f"teacher{i:04d}@loadtest.local") for i in range(1, teachers + 1)]
+    with open(root / "teachers.csv", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "name", "email", "password"])
+        w.writerows([tid, name, email, hashed] for tid, name, email in staff)
+    (root / "admin.json").write_text(json.dumps({
+        "id": "ADMIN_001", "name": "Load Test Admin", "role": "Admin", "email": ADMIN_EMAIL, "password": hashed,
+    }, indent=4), encoding="utf-8")
+
+    with open(root / "subjects.csv", "w", newline="", encoding="utf-8") as fs, \
+            open(root / "subjects_with_teachers.csv", "w", newline="", encoding="utf-8") as ft:
+        ws, wt = csv.writer(fs), csv.writer(ft)
+        ws.writerow(["Branch", "Subject Type", "Subject Name", "Credits"])
+        wt.writerow(["Branch", "Subject Type", "Subject Name", "teacher_id"])
+        for branch in timetable.BRANCH_SECTIONS:
+            for n in range(1, subjects + 1):
+                name = f"{branch} Synthetic Subject {n}"
+                ws.writerow([branch, "Theory", name, rng.choice([2, 3, 4])])
+                wt.writerow([branch, "Theory", name, rng.choice(staff)[0]])
+            for n in range(1, 3):
+                name = f"{branch} Synthetic Laboratory {n}"
+                ws.writerow([branch, "Lab", name, 1])
+                wt.writerow([branch, "Lab", name, rng.choice(staff)[0]])
+    return staff
+
+
+# ---------- traffic ----------
+def parse_pairs(text, cast=float):
+    pairs = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        key, _, value = part.partition("=") if "=" in part else part.partition(":")
+        pairs[key.strip()] = cast(value)
+    return pairs
+
+
+def parse_stages(text):
+    return [(int(c), float(s)) for c, s in (p.split(":") for p in text.split(",") if p.strip())]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, ms, ok):
+        self.latencies[route].append(ms)
+        if not ok:
+            self.errors[route] += 1
+
+    def summary(self, elapsed):
+        out = {}
+        for route in sorted(self.latencies):
+            lat = sorted(self.latencies[route])
+            pick = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 2)
+            out[route] = {
+                "requests": len(lat),
+                "errors": self.errors[route],
+                "rps": round(len(lat) / elapsed, 1) if elapsed else 0,
+                "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": round(lat[-1], 2),
+            }
+        return out
+
+
+class Traffic:
+    """Issues one request of a given route kind against the current state of the server."""
+
+    def __init__(self, client, staff, admin_creds):
+        self.client = client
+        self.staff = staff
+        self.admin_creds = admin_creds
+        self.teacher_ids = [tid for tid, _, _ in staff]
+        self.users = list(staff)
+        self.latest_csv = None
+        self.admin_headers = {}       # bearer token for the write routes
+
+    async def refresh(self):
+        if not self.admin_headers:
+            r = await self.client.post("/login", json=self.admin_creds)
+            if r.status_code == 200:
+                self.admin_headers = {"Authorization": f"Bearer {r.json()['token']}"}
+        r = await self.client.get("/latest")
+        if r.status_code == 200:
+            name = r.json()["filename"]
+            self.latest_csv = name[:-5] + ".csv" if name.endswith(".json") else name
+        r = await self.client.get("/users")
+        teachers = [u for u in r.json() if u.get("role") == "Teacher"] if r.status_code == 200 else []
+        if teachers:
+            self.teacher_ids = [u["id"] for u in teachers]
+            self.users = [(u["id"], u["name"], u.get("email", "")) for u in teachers]
+
+    async def request(self, route):
+        c = self.client
+        if route == "login":
+            if self.staff:
+                _, _, email = random.choice(self.staff)
+                return await c.post("/login", json={"email": email, "password": PASSWORD})
+            return await c.post("/login", json=self.admin_creds)
+        if route == "teacher":
+            return await c.get(f"/timetable/teacher/{random.choice(self.teacher_ids)}")
+        if route == "json":
+            return await c.get(f"/json/{self.latest_csv[:-4]}.json")
+        if route == "preview":
+            return await c.get(f"/preview/{self.latest_csv}")
+        if route == "latest":
+            return await c.get("/latest")
+        if route == "user_edit":
+            # a no-op rename: exercises the write path without drifting the data
+            tid, name, email = random.choice(self.users)
+            return await c.put(f"/users/{tid}", json={"name": name, "email": email}, headers=self.admin_headers)
+        if route == "generate":
+            r = await c.post("/generate", headers=self.admin_headers)
+            if r.status_code == 200:
+                self.latest_csv = r.json().get("filename") or self.latest_csv
+            return r
+        raise ValueError(f"Unknown route {route}")
+
+
+async def run_stage(traffic, stats, mix, concurrency, seconds):
+    routes, weights = zip(*mix.items())
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            route = random.choices(routes, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = (await traffic.request(route)).status_code < 400
+            except Exception:
+                ok = False
+            stats.record(route, (time.perf_counter() - started) * 1000, ok)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run(client, staff, admin_creds, mix, stages):
+    traffic = Traffic(client, staff, admin_creds)
+    await traffic.refresh()
+    if not traffic.latest_csv:
+        print("No generation yet; running one first...")
+        r = await client.post("/generate", headers=traffic.admin_headers)
+        r.raise_for_status()
+        traffic.latest_csv = r.json()["filename"]
+
+    results = {"stages": []}
+    total = Stats()
+    started = time.perf_counter()
+    for concurrency, seconds in stages:
+        stats = Stats()
+        stage_started = time.perf_counter()
+        await run_stage(traffic, stats, mix, concurrency, seconds)
+        summary = stats.summary(time.perf_counter() - stage_started)
+        results["stages"].append({"concurrency": concurrency, "seconds": seconds, "routes": summary})
+        print_table(f"stage: {concurrency} concurrent for {seconds:g}s", summary)
+        for route, lat in stats.latencies.items():
+            total.latencies[route].extend(lat)
+            total.errors[route] += stats.errors[route]
+    results["total"] = total.summary(time.perf_counter() - started)
+    print_table("total", results["total"])
+    return results
+
+
+def print_table(title, summary):
+    print(f"\n== {title} ==")
+    print(f"{'route':<11}{'reqs':>7}{'errs':>6}{'rps':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for route, s in summary.items():
+        print(f"{route:<11}{s['requests']:>7}{s['errors']:>6}{s['rps']:>8}{s['p50']:>9}{s['p90']:>9}{s['p99']:>9}{s['max']:>9}")
+
+
+# ---------- targets ----------
+def wait_for_server(url, timeout=30):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/latest", timeout=1).status_code in (200, 404):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Load-test the timetable API.")
+    p.add_argument("--url", help="test an already running server instead of a seeded sandbox")
+    p.add_argument("--server", action="store_true", help="run the sandbox behind a local uvicorn")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--email", default=ADMIN_EMAIL, help="login for --url mode")
+    p.add_argument("--password", default=PASSWORD, help="password for --url mode")
+    p.add_argument("--allow-writes", action="store_true", help="allow user edits and /generate in --url mode")
+    p.add_argument("--teachers", type=int, default=60)
+    p.add_argument("--subjects", type=int, default=6, help="theory subjects per branch")
+    p.add_argument("--mix", default=DEFAULT_MIX)
+    p.add_argument("--stages", default=DEFAULT_STAGES)
+    p.add_argument("--max-p99", default="", help="route=ms limits, e.g. teacher=50,latest=20")
+    p.add_argument("--out", help="write results as JSON")
+    p.add_argument("--keep", action="store_true", help="keep the sandbox directory")
+    args = p.parse_args(argv)
+
+    try:
+        import httpx
+    except ImportError:
+        sys.exit("loadtest.py needs httpx: pip install httpx")
+
+    mix = {k: v for k, v in parse_pairs(args.mix).items() if v > 0}
+    unknown = set(mix) - set(ROUTES)
+    if unknown:
+        sys.exit(f"Unknown routes in --mix: {sorted(unknown)}; choose from {ROUTES}")
+    if args.url and not args.allow_writes:
+        mix = {k: v for k, v in mix.items() if k not in WRITE_ROUTES}
+    stages = parse_stages(args.stages)
+    admin_creds = {"email": args.email, "password": args.password}
+
+    sandbox, server = None, None
+    try:
+        if args.url:
+            staff = []
+            client = httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=120)
+        else:
+            sandbox = Path(tempfile.mkdtemp(prefix="tibl_loadtest_"))
+            staff = seed_sandbox(sandbox, teachers=args.teachers, subjects=args.subjects)
+            print(f"Sandbox: {sandbox} ({len(staff)} teachers)")
+            if args.server:
+                server = subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+                    cwd=sandbox)
+                url = f"http://127.0.0.1:{args.port}"
+                wait_for_server(url)
+                client = httpx.AsyncClient(base_url=url, timeout=120)
+            else:
+                os.chdir(sandbox)
+                import main as app_module
+
+                client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app),
+                                           base_url="http://loadtest", timeout=120)
+
+        async def go():
+            async with client:
+                return await run(client, staff, admin_creds, mix, stages)
+
+        results = asyncio.run(go())
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+        if sandbox and not args.keep:
+            os.chdir(HERE)
+            shutil.rmtree(sandbox, ignore_errors=True)
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    failed = [f"{route} p99 {results['total'][route]['p99']}ms > {limit:g}ms"
+              for route, limit in parse_pairs(args.max_p99).items()
+              if route in results["total"] and results["total"][route]["p99"] > limit]
+    for line in failed:
+        print(f"FAIL {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
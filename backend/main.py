@@ -1,15 +1,98 @@
 # main.py
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+import os
 import time
 import csv
 import json
+import shutil
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Dict
-from timetable_runner import generate_timetable
+from typing import List, Dict, Optional
+from timetable_runner import generate_timetable, prepare_workspace
+import auth
+import events
+import history
+import input_watcher
+import manual_edits
+import tenants
+import term_calendar
+import timetable_index
+import user_import
+
+# ---------- executors ----------
+# Read endpoints are async and push blocking file access onto IO_EXECUTOR, so they never wait behind
+# Starlette's shared threadpool. Generation is CPU-bound and runs in its own process pool (separate GIL),
+# sized by TIBL_GENERATION_WORKERS, so a long /generate can't starve /login or /timetable/teacher.
+IO_WORKERS = int(os.environ.get("TIBL_IO_WORKERS", 16))
+GENERATION_WORKERS = int(os.environ.get("TIBL_GENERATION_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# hard cap on a run's wall-clock time (seconds); the scheduler stops itself at the deadline and the
+# request gives up GENERATION_GRACE seconds later if the worker doesn't come back
+GENERATION_BUDGET = float(os.environ.get("TIBL_GENERATION_BUDGET", 120))
+GENERATION_GRACE = float(os.environ.get("TIBL_GENERATION_GRACE", 15))
+
+# failures of background work (history, change events, derived files) are reported here, not raised
+log = logging.getLogger("tibl")
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="tibl-io")
+_generation_executor = None
+_generation_executor_lock = threading.Lock()
+
+
+def get_generation_executor():
+    global _generation_executor
+    with _generation_executor_lock:
+        if _generation_executor is None:
+            _generation_executor = ProcessPoolExecutor(
+                max_workers=GENERATION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _generation_executor
+
+
+async def run_io(fn, *args, **kwargs):
+    # run in a copy of the caller's context so the request's tenant (see tenants.py) stays active
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def run_cpu(fn, *args):
+    global _generation_executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_generation_executor(), fn, *args)
+    except BrokenProcessPool:
+        # a worker died (OOM, kill); start a fresh pool for the next job
+        with _generation_executor_lock:
+            _generation_executor = None
+        raise
+
+
+@asynccontextmanager
+async def lifespan(app):
+    tenants.all_tenants()        # load every provisioned tenant now (see start_tenant); later ones on first request
+    yield
+    for tenant in tenants.loaded():
+        if tenant.watcher:
+            tenant.watcher.stop()
+    io_executor.shutdown(wait=False)
+    if _generation_executor is not None:
+        _generation_executor.shutdown(wait=False, cancel_futures=True)
 
-app = FastAPI(title="Tibl.ai Backend")
+
+app = FastAPI(title="Tibl.ai Backend", lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -23,32 +106,83 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.add_middleware(tenants.TenantMiddleware)
+
+# Every path below belongs to the tenant of the current request (see tenants.py): the default tenant
+# is this folder, others live under tenants/<name>/ with the same layout. Locks, the latest
+# generation, the history and the event broker are per tenant too (tenants.active()).
+TenantPath = tenants.TenantPath
+BASE_DIR = TenantPath("base_dir")
+GENERATED_DIR = TenantPath("generated_dir")
+XLSX_CACHE_DIR = TenantPath("generated_dir", "xlsx")
+REPORTS_DIR = TenantPath("generated_dir", "reports")
+STAGING_DIR = TenantPath("generated_dir", ".staging")
+GRIDS_DIR = TenantPath("generated_dir", "grids")           # compact binary grids (see compact_grid.py), built on demand
+CALENDARS_DIR = TenantPath("generated_dir", "calendars")   # calendars/<generation>/{teacher,section,room}/<key>.ics
+WORKLOAD_DIR = TenantPath("generated_dir", "workload")     # workload/<generation>.json (see workload.py)
+COLUMNAR_DIR = TenantPath("generated_dir", "columnar")     # columnar/<generation>.{parquet|csv.gz} + .schema.json (see columnar_export.py)
+PARTIAL_DIR = TenantPath("generated_dir", "partial")       # partial/<job>/: best-so-far output + checkpoint of budget-stopped runs
+WORKSPACES_DIR = TenantPath("workspaces_dir")              # one throwaway sub-folder per /generate call
+ADMIN_FILE = TenantPath("base_dir", "admin.json")
+TEACHERS_FILE = TenantPath("base_dir", "teachers.csv")
+SUBJECTS_TEACHERS_FILE = TenantPath("base_dir", "subjects_with_teachers.csv")
+PINS_FILE = TenantPath("base_dir", "pins.json")            # hand-pinned periods the scheduler keeps (see manual_edits.py)
+TERM_FILE = TenantPath("base_dir", term_calendar.TERM_FILE)  # term dates, holidays, substitute days (see term_calendar.py)
+DAYS = ["MON", "TUE", "WED", "THU", "FRI"]
+
+
+# ---------- auth dependencies ----------
+# Every write endpoint takes one of these; tokens come from /login (see auth.py).
+async def bearer_token(authorization: Optional[str] = Header(None)):
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return None
+
+
+async def current_user(token: Optional[str] = Depends(bearer_token)):
+    """Resolve the bearer token from memory (no disk access); use as a route dependency."""
+    user = auth.resolve_token(token) if token else None
+    if not user or user.get("tenant") != tenants.active().name:
+        raise HTTPException(401, "Not authenticated")
+    return user
 
-BASE_DIR = Path(__file__).resolve().parent
-GENERATED_DIR = BASE_DIR / "generated"
-GENERATED_DIR.mkdir(exist_ok=True)
-ADMIN_FILE = BASE_DIR / "admin.json"
+
+async def require_admin(user: dict = Depends(current_user)):
+    if user.get("role") != "Admin":
+        raise HTTPException(403, "Admin only")
+    return user
+
+
+async def require_self_or_admin(user_id: str, user: dict = Depends(current_user)):
+    """For /users/{user_id} routes a teacher may use on their own profile."""
+    if user.get("role") != "Admin" and user.get("id") != user_id:
+        raise HTTPException(403, "Only an admin can change another user")
+    return user
 
 
 def get_latest_generated_file():
+    tenant = tenants.active()
+    if tenant.latest_file and (tenant.generated_dir / tenant.latest_file).exists():
+        return tenant.latest_file
     files = sorted(
-        [p for p in GENERATED_DIR.iterdir() if p.is_file()],
+        [p for p in tenant.generated_dir.iterdir() if p.is_file()],
         key=lambda p: p.stat().st_mtime,
         reverse=True
     )
-    return files[0].name if files else None
+    tenant.latest_file = files[0].name if files else None
+    return tenant.latest_file
 
 
 @app.get("/latest")
-def latest():
-    name = get_latest_generated_file()
+async def latest():
+    name = await run_io(get_latest_generated_file)
     if not name:
         raise HTTPException(404, "No generated files found")
     return {"filename": name, "download_url": f"/download/{name}"}
 
 
 @app.get("/preview/{filename}")
-def preview(filename: str) -> List[Dict]:
+async def preview(filename: str) -> List[Dict]:
     filepath = (GENERATED_DIR / filename).resolve()
 
     # Safety check: ensure path is inside GENERATED_DIR
@@ -58,7 +192,11 @@ def preview(filename: str) -> List[Dict]:
     except RuntimeError:
         raise HTTPException(400, "Invalid filename")
 
-    if not filepath.exists():
+    return await run_io(read_csv_rows, filepath)
+
+
+def read_csv_rows(filepath):
+    if not materialize(filepath).exists():
         raise HTTPException(404, "File not found")
 
     rows = []
@@ -74,77 +212,819 @@ def preview(filename: str) -> List[Dict]:
 
 
 @app.post("/generate")
-def generate():
-    """
-    Run the whole pipeline and return URLs to the stored CSV + JSON.
+async def generate(budget: Optional[float] = None, max_steps: Optional[int] = None, resume: Optional[str] = None,
+                   admin: dict = Depends(require_admin)):
     """
-    try:
-        raw_csv_path, raw_json_path = generate_timetable()
-    except Exception as e:
-        raise HTTPException(500, f"Generation failed: {e}")
+    Run the whole pipeline in a private workspace and return URLs to the stored CSV + JSON.
+    Concurrent calls each get their own workspace, so they never overwrite each other's files.
+    The scheduler itself runs in the generation process pool.
 
-    ts = int(time.time())
-    csv_name = f"timetable_{ts}.csv"
-    json_name = f"timetable_{ts}.json"
+    Runs are bounded: ?budget= seconds (at most TIBL_GENERATION_BUDGET) and ?max_steps= placement
+    attempts; POST /generate/jobs/{job}/cancel stops one early. A run that stops early, or finishes
+    with periods or labs that fit nowhere (reason "unplaced"), is not committed: its best-so-far
+    timetable, the unplaced items and a checkpoint are kept under generated/partial/<job> and
+    ?resume=<job> continues from that checkpoint.
 
-    csv_dest = GENERATED_DIR / csv_name
-    json_dest = GENERATED_DIR / json_name
+    A finished run whose validation report fails (teacher/room clashes, missing labs, ...) is not
+    committed either: it is reported as "failed" and kept under generated/partial/<job> for inspection.
+    """
+    if budget is not None and budget <= 0:
+        raise HTTPException(400, "budget must be a positive number of seconds")
+    if max_steps is not None and max_steps <= 0:
+        raise HTTPException(400, "max_steps must be a positive integer")
+    budget = min(budget or GENERATION_BUDGET, GENERATION_BUDGET)
+    checkpoint = None
+    if resume:
+        checkpoint = PARTIAL_DIR / Path(resume).name / "checkpoint.json"
+        if not await run_io(checkpoint.exists):
+            raise HTTPException(404, f"No checkpoint for job {resume}")
 
+    previous = await run_io(get_latest_generated_file)
+    workspace = Path(await run_io(tempfile.mkdtemp, prefix="job_", dir=WORKSPACES_DIR))
+    job = workspace.name
+    cancel_file = workspace / "cancel"
+    running_jobs = tenants.active().running_jobs
+    running_jobs[job] = (workspace, time.time())
     try:
-        # copy csv
-        with open(raw_csv_path, "rb") as s, open(csv_dest, "wb") as d:
-            d.write(s.read())
-        # copy json
-        with open(raw_json_path, "rb") as s, open(json_dest, "wb") as d:
-            d.write(s.read())
-    except Exception as e:
-        raise HTTPException(500, f"Failed to store generated assets: {e}")
+        inputs_dir, output_dir = await run_io(prepare_workspace, workspace, BASE_DIR)
+        try:
+            raw_csv_path, raw_json_path, report = await asyncio.wait_for(
+                run_cpu(generate_timetable, str(inputs_dir), str(output_dir), time.time() + budget, max_steps,
+                        str(cancel_file), str(checkpoint) if checkpoint else None),
+                timeout=budget + GENERATION_GRACE)
+        except asyncio.TimeoutError:
+            cancel_file.touch()
+            raise HTTPException(504, f"Generation did not finish within {budget + GENERATION_GRACE:.0f}s")
+        except Exception as e:
+            log.exception("Generation %s failed", job)
+            raise HTTPException(500, f"Generation failed: {e}")
+
+        scheduler = report.get("scheduler", {})
+        if not scheduler.get("complete", True):
+            await run_io(keep_partial, job, Path(raw_csv_path), Path(raw_json_path), report)
+            return {
+                "status": "partial",
+                "job": job,
+                "reason": scheduler.get("reason"),
+                "scheduler": scheduler,
+                "partial_url": f"/generate/partial/{job}",
+                "resume_url": f"/generate?resume={job}",
+            }
+        if not report.get("ok", False):
+            await run_io(keep_partial, job, Path(raw_csv_path), Path(raw_json_path), report)
+            return {
+                "status": "failed",
+                "job": job,
+                "validation": {"ok": False, "summary": report.get("summary", {}), "error": report.get("error")},
+                "partial_url": f"/generate/partial/{job}",
+            }
 
+        try:
+            csv_name, json_name = await run_io(commit_generation, Path(raw_csv_path), Path(raw_json_path), report)
+        except Exception as e:
+            log.exception("Failed to commit generation %s", job)
+            raise HTTPException(500, f"Failed to store generated assets: {e}")
+    finally:
+        running_jobs.pop(job, None)
+        await run_io(shutil.rmtree, workspace, ignore_errors=True)
+
+    await run_io(announce_generation, previous, csv_name, json_name)
     return {
+        "status": "complete",
         "filename": csv_name,
         "download_url": f"/download/{csv_name}",
         "json_filename": json_name,
-        "json_url": f"/json/{json_name}"
+        "json_url": f"/json/{json_name}",
+        "validation": {"ok": report.get("ok", False), "summary": report.get("summary", {})},
+        "validation_url": f"/validate/{json_name}",
+        "scheduler": {k: scheduler.get(k) for k in ("steps", "elapsed")},
     }
 
 
-@app.get("/download/{filename}")
-def download_csv(filename: str):
-    filepath = (GENERATED_DIR / filename).resolve()
+@app.get("/generate/jobs")
+async def generation_jobs():
+    now = time.time()
+    return {"jobs": [{"job": job, "elapsed": round(now - started, 1)} for job, (_, started) in tenants.active().running_jobs.items()]}
+
+
+@app.post("/generate/jobs/{job}/cancel")
+async def cancel_generation(job: str, admin: dict = Depends(require_admin)):
+    """Ask a running job to stop; it returns its best-so-far timetable as a partial result."""
+    running_jobs = tenants.active().running_jobs
+    if job not in running_jobs:
+        raise HTTPException(404, "No such running job")
+    await run_io((running_jobs[job][0] / "cancel").touch)
+    return {"status": "cancelling", "job": job}
+
+
+@app.get("/generate/partial/{job}")
+async def get_partial(job: str):
+    folder = PARTIAL_DIR / Path(job).name
+    if not await run_io((folder / "timetable.json").exists):
+        raise HTTPException(404, "No partial result for this job")
+    report, data = await asyncio.gather(
+        run_io(lambda: json.loads((folder / "report.json").read_text(encoding="utf-8"))),
+        run_io(lambda: json.loads((folder / "timetable.json").read_text(encoding="utf-8"))))
+    return {"job": folder.name, "scheduler": report.get("scheduler"), "validation": report.get("summary"), "timetable": data}
+
+
+def keep_partial(job, csv_path, json_path, report):
+    """Keep an uncommitted run's output, report and checkpoint under PARTIAL_DIR/<job> (not a generation)."""
+    folder = PARTIAL_DIR / job
+    folder.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(csv_path, folder / "overall_schedule.csv")
+    shutil.copyfile(json_path, folder / "timetable.json")
+    checkpoint = Path(json_path).parent / "checkpoint.json"
+    if checkpoint.exists():
+        shutil.copyfile(checkpoint, folder / "checkpoint.json")
+    (folder / "report.json").write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+
+
+def commit_generation(csv_path, json_path, report):
+    """
+    Move a finished job's files into GENERATED_DIR atomically.
+
+    Files are staged under generated/.staging (same filesystem) and renamed into place, JSON first,
+    so readers never see a half-written file or a CSV whose JSON isn't there yet. The name reservation
+    is serialized so two jobs finishing in the same second get different timestamps.
+    """
+    tenant = tenants.active()
+    STAGING_DIR.mkdir(exist_ok=True)
+    REPORTS_DIR.mkdir(exist_ok=True)
+    tenant.history.start()      # before the name is reserved: generations from here on may be pruned
+    with tenant.commit_lock:
+        ts = int(time.time())
+        while (GENERATED_DIR / f"timetable_{ts}.csv").exists() or (GENERATED_DIR / f"timetable_{ts}.json").exists():
+            ts += 1
+        csv_name = f"timetable_{ts}.csv"
+        json_name = f"timetable_{ts}.json"
+
+        staged_json = STAGING_DIR / json_name
+        staged_csv = STAGING_DIR / csv_name
+        shutil.copyfile(json_path, staged_json)
+        shutil.copyfile(csv_path, staged_csv)
+        # keep the validation report next to the generation (sub-folder so /latest ignores it)
+        (REPORTS_DIR / json_name).write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+        calendars = Path(json_path).parent / "calendars"
+        if calendars.is_dir():
+            CALENDARS_DIR.mkdir(exist_ok=True)
+            staged_calendars = STAGING_DIR / f"{Path(json_name).stem}_calendars"
+            shutil.rmtree(staged_calendars, ignore_errors=True)
+            shutil.copytree(calendars, staged_calendars)
+            os.replace(staged_calendars, CALENDARS_DIR / Path(json_name).stem)
+        stage_columnar(Path(json_path).parent, Path(json_name).stem)
+        workload_json = Path(json_path).parent / "workload.json"
+        if workload_json.exists():
+            WORKLOAD_DIR.mkdir(exist_ok=True)
+            shutil.copyfile(workload_json, STAGING_DIR / f"{Path(json_name).stem}_workload.json")
+            os.replace(STAGING_DIR / f"{Path(json_name).stem}_workload.json", WORKLOAD_DIR / f"{Path(json_name).stem}.json")
+        os.replace(staged_json, GENERATED_DIR / json_name)
+        os.replace(staged_csv, GENERATED_DIR / csv_name)
+        tenant.latest_file = csv_name
+    maintain_history()
+    return csv_name, json_name
+
+
+def stage_columnar(output_dir, stem):
+    """Copy a job's schedule.<fmt> + schema into COLUMNAR_DIR as <stem>.<fmt>, schema first."""
+    import columnar_export
+
+    data = columnar_export.find_columnar(output_dir, "schedule")
+    if not data:
+        return
+    COLUMNAR_DIR.mkdir(exist_ok=True)
+    fmt = data.name.split(".", 1)[1]
+    for src, name in ((Path(output_dir) / "schedule.schema.json", f"{stem}.schema.json"), (data, f"{stem}.{fmt}")):
+        staged = STAGING_DIR / name
+        shutil.copyfile(src, staged)
+        os.replace(staged, COLUMNAR_DIR / name)
+
+
+def maintain_history():
+    """
+    After a commit: record every generation but the latest in the delta history and drop the old plain
+    files of those committed since the history was started (see history.History.prune).
+    """
+    latest = get_latest_generated_file()
+    protect = {Path(latest).stem} if latest else set()
     try:
-        if GENERATED_DIR.resolve() not in filepath.parents and filepath != GENERATED_DIR.resolve():
-            raise HTTPException(400, "Invalid filename")
-    except RuntimeError:
+        generation_history = tenants.active().history
+        generation_history.backfill(skip=protect)
+        generation_history.prune(keep=max(history.KEEP_FULL, 2), protect=protect)
+    except Exception as e:
+        log.warning("Failed to update generation history: %s", e)
+
+
+def materialize(filepath):
+    """Rebuild a pruned generation file from the history; other paths are left alone."""
+    if filepath.parent == GENERATED_DIR.resolve() and not filepath.exists():
+        try:
+            tenants.active().history.materialize(filepath.name)
+        except Exception as e:
+            log.warning("Failed to rebuild %s from history: %s", filepath.name, e)
+    return filepath
+
+
+@app.get("/history")
+async def history_stats():
+    return await run_io(lambda: tenants.active().history.stats())
+
+
+@app.get("/tenant")
+async def tenant_info():
+    """The institution this request is served for (/t/<name>/... or X-Tenant), plus parsed-file cache usage."""
+    tenant = tenants.active()
+    await run_io(get_latest_generated_file)
+    stats = timetable_index.cache_stats()
+    return {**tenant.info(), "config": await run_io(tenant.config),
+            "cache": {"budget_bytes": stats["budget_bytes"], "used_bytes": stats["used_bytes"],
+                      **stats["scopes"].get(tenant.name, {"entries": 0, "bytes": 0})}}
+
+
+def announce_generation(previous, csv_name, json_name):
+    """Publish a "generation" event listing the sections/teachers that differ from the previous one."""
+    try:
+        new_index = timetable_index.load_index(GENERATED_DIR / json_name)
+        old_path = GENERATED_DIR / (Path(previous).stem + ".json") if previous else None
+        old_index = timetable_index.load_index(old_path) if old_path and old_path.exists() else None
+        sections, teachers = timetable_index.changed_keys(old_index, new_index)
+    except Exception as e:
+        log.warning("Failed to compute changes for %s: %s", json_name, e)
+        sections, teachers = None, None
+    tenants.active().broker.publish("generation", {
+        "id": Path(json_name).stem,
+        "csv": csv_name,
+        "json": json_name,
+        "sections": sections,
+        "teachers": teachers,
+    })
+
+
+# ---------- input watcher ----------
+# With TIBL_WATCH_INPUTS=1 hand edits of teachers.csv / subjects.csv / subjects_with_teachers.csv
+# are picked up without a manual /generate: renames are patched into the latest generation,
+# anything that changes what has to be scheduled triggers a regeneration in the background.
+WATCH_INPUTS = os.environ.get("TIBL_WATCH_INPUTS", "") == "1"
+
+
+def regenerate():
+    """Blocking /generate for the watcher thread; same workspace, pool and commit path."""
+    previous = get_latest_generated_file()
+    workspace = Path(tempfile.mkdtemp(prefix="job_", dir=WORKSPACES_DIR))
+    try:
+        inputs_dir, output_dir = prepare_workspace(workspace, BASE_DIR)
+        raw_csv_path, raw_json_path, report = get_generation_executor().submit(
+            generate_timetable, str(inputs_dir), str(output_dir), time.time() + GENERATION_BUDGET).result()
+        if not report.get("scheduler", {}).get("complete", True):
+            log.warning("Regeneration stopped early (%s); keeping the current timetable", report["scheduler"].get("reason"))
+            return None
+        if not report.get("ok", False):
+            log.warning("Regeneration failed validation (%s); keeping the current timetable",
+                        report.get("summary") or report.get("error"))
+            return None
+        csv_name, json_name = commit_generation(Path(raw_csv_path), Path(raw_json_path), report)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    announce_generation(previous, csv_name, json_name)
+    log.info("Regenerated %s after an input change", json_name)
+    return csv_name, json_name
+
+
+def rename_in_json(path, renamed):
+    """Replace "— Old Name (ID)" cells of a timetable JSON for {id: (old, new)}, in one rename."""
+    path = Path(path)
+    if not path.exists():
+        return False
+    content = original = path.read_text(encoding="utf-8")
+    for tid, (old, new) in renamed.items():
+        content = content.replace(f"— {old} ({tid})", f"— {new} ({tid})")
+    if content == original:
+        return False
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
+    return True
+
+
+def rename_in_latest(renamed):
+    """
+    Patch renamed teachers ({id: (old, new)}) into the latest generation: its JSON and CSV, each
+    replaced in one rename, then the calendar feeds and workload summary derived from the CSV.
+    The XLSX, grid and columnar caches notice the newer JSON/CSV and rebuild themselves.
+    """
+    latest_file = get_latest_generated_file()
+    if not renamed or not latest_file:
+        return
+    stem = Path(latest_file).stem
+    rename_in_json(GENERATED_DIR / f"{stem}.json", renamed)
+    csv_path = GENERATED_DIR / f"{stem}.csv"
+    if not csv_path.exists():
+        return
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames, rows = reader.fieldnames, list(reader)
+    if "Teacher ID" not in fieldnames or "Teacher Name" not in fieldnames:
+        return
+    changed = False
+    for row in rows:
+        if row["Teacher ID"] in renamed and row["Teacher Name"] != renamed[row["Teacher ID"]][1]:
+            row["Teacher Name"] = renamed[row["Teacher ID"]][1]
+            changed = True
+    if not changed:
+        return
+    rewrite_csv(csv_path, fieldnames, rows)
+    try:
+        rerender_calendars(term_calendar.load_term(TERM_FILE))
+        rewrite_workload(csv_path)
+    except Exception as e:
+        log.warning("Failed to refresh derived files of %s: %s", stem, e)
+
+
+def rewrite_workload(csv_path):
+    """Rebuild the stored workload summary of a generation from its CSV (staged, then renamed into place)."""
+    import workload
+
+    stem = Path(csv_path).stem
+    stored = WORKLOAD_DIR / f"{stem}.json"
+    if not stored.exists():
+        return
+    STAGING_DIR.mkdir(exist_ok=True)
+    staged = STAGING_DIR / f"{stem}_workload.json"
+    summary = workload.build_workload(csv_path, SUBJECTS_TEACHERS_FILE)
+    staged.write_text(json.dumps(summary, ensure_ascii=False), encoding="utf-8")
+    os.replace(staged, stored)
+
+
+def refresh_teacher_names(details):
+    """Cosmetic input change: rewrite renamed teachers in the latest generation instead of regenerating."""
+    renamed = details.get("renamed") or {}
+    rename_in_latest(renamed)
+    for tid, (_, new) in renamed.items():
+        auth.sessions.update_user(tid, tenant=tenants.active().name, name=new)
+    teachers = sorted({*renamed, *details.get("added", []), *details.get("removed", [])})
+    if teachers:
+        tenants.active().broker.publish("user", {"action": "refreshed", "ids": teachers, "teachers": teachers})
+
+
+def watcher_for(tenant):
+    """The tenant's input watcher (created on first use); its callbacks run with the tenant active."""
+    if tenant.watcher is None:
+        tenant.watcher = input_watcher.InputWatcher(
+            tenant.base_dir,
+            on_cosmetic=lambda details: tenants.run_as(tenant, refresh_teacher_names, details),
+            on_structural=lambda details: tenants.run_as(tenant, regenerate))
+    return tenant.watcher
+
+
+def start_tenant(tenant):
+    if WATCH_INPUTS:
+        watcher_for(tenant).start()
+
+
+tenants.on_create.append(start_tenant)
+
+
+@app.get("/watcher")
+async def watcher_status():
+    return {"enabled": WATCH_INPUTS, **watcher_for(tenants.active()).status}
+
+
+@app.get("/events")
+async def event_stream(request: Request):
+    """
+    Server-sent events: "generation" when a new timetable is committed, "user" when a user record
+    changes. Replaces polling /latest; reconnecting clients get missed events via Last-Event-ID.
+    """
+    last_id = request.headers.get("last-event-id")
+    broker = tenants.active().broker
+    queue = broker.subscribe(int(last_id) if last_id and last_id.isdigit() else None)
+    return StreamingResponse(
+        events.stream(queue, broker),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _build_validation_report(csv_path):
+    import timetable_validator
+    from timetable import AVAILABILITY_FILE, batches_for, load_availability, load_subjects_teachers
+
+    subj_csv = SUBJECTS_TEACHERS_FILE if SUBJECTS_TEACHERS_FILE.exists() else BASE_DIR / "subjects.csv"
+    subjects, _ = load_subjects_teachers(str(subj_csv), str(TEACHERS_FILE))
+    return timetable_validator.validate(timetable_validator.frame_from_schedule_csv(csv_path), subjects,
+                                        batches_for=functools.partial(batches_for, config=tenants.active().config()),
+                                        availability=load_availability(str(BASE_DIR / AVAILABILITY_FILE)))
+
+
+@app.get("/validate/{filename}")
+async def validate_generation(filename: str, refresh: bool = False):
+    """
+    Quality report for a generation (`filename` may be its .csv or .json name).
+    Returns the report stored at generation time unless ?refresh=true, which re-checks the stored CSV.
+    """
+    return await run_io(load_validation_report, filename, refresh)
+
+
+def load_validation_report(filename, refresh):
+    stem = Path(filename).stem
+    csv_path = (GENERATED_DIR / f"{stem}.csv").resolve()
+    if GENERATED_DIR.resolve() not in csv_path.parents:
         raise HTTPException(400, "Invalid filename")
 
-    if not filepath.exists():
+    stored = REPORTS_DIR / f"{stem}.json"
+    if stored.exists() and not refresh:
+        return JSONResponse(json.loads(stored.read_text(encoding="utf-8")))
+
+    if not materialize(csv_path).exists():
         raise HTTPException(404, "File not found")
+    try:
+        return timetable_index.cached("validation", csv_path, _build_validation_report)
+    except Exception as e:
+        raise HTTPException(500, f"Validation failed: {e}")
 
-    return FileResponse(filepath, media_type="text/csv", filename=filename)
 
+def get_generation_xlsx(json_path):
+    """
+    Workbook for one generation, built from its JSON the first time it is asked for and then
+    cached under generated/xlsx/ (rebuilt if the JSON changed since, e.g. after a rename).
+    """
+    from xlsx_writer import sheets_from_records, write_workbook
+
+    json_path = Path(json_path)
+    XLSX_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    xlsx_path = XLSX_CACHE_DIR / f"{json_path.stem}.xlsx"
+    if xlsx_path.exists() and xlsx_path.stat().st_mtime >= json_path.stat().st_mtime:
+        return xlsx_path
 
-# Dev: serve the uploaded XLSX directly for browser download
-@app.get("/download/dev-xlsx")
-def download_dev_xlsx():
-    dev_path = Path("/mnt/data/timetable_tools/output_v5/All_Timetables_with_Teachers_fixed_v2.xlsx")
-    if not dev_path.exists():
-        raise HTTPException(status_code=404, detail="Dev XLSX not found on server")
+    index = timetable_index.load_index(json_path)
+    tmp_path = xlsx_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    write_workbook(sheets_from_records(index.data), tmp_path)
+    os.replace(tmp_path, xlsx_path)
+    return xlsx_path
+
+
+def get_generation_grid(json_path):
+    """
+    Compact grid file for one generation, built from its JSON (and the CSV's rooms) the first time
+    it is asked for and then cached under generated/grids/, like the XLSX.
+    """
+    import compact_grid
+
+    json_path = Path(json_path)
+    GRIDS_DIR.mkdir(parents=True, exist_ok=True)
+    grid_path = GRIDS_DIR / f"{json_path.stem}.ttg"
+    if grid_path.exists() and grid_path.stat().st_mtime >= json_path.stat().st_mtime:
+        return grid_path
+
+    csv_path = json_path.with_suffix(".csv")
+    rooms = compact_grid.rooms_from_schedule_csv(csv_path) if csv_path.exists() else None
+    compact_grid.write_grid(timetable_index.load_index(json_path).data, grid_path, rooms)
+    return grid_path
+
+
+def get_generation_columnar(csv_path):
+    """Columnar export of a generation, written at commit time or built from its CSV on first request."""
+    import columnar_export
+
+    csv_path = Path(csv_path)
+    path = columnar_export.find_columnar(COLUMNAR_DIR, csv_path.stem)
+    if path and path.stat().st_mtime >= csv_path.stat().st_mtime:
+        return path
+    return columnar_export.export_schedule(csv_path, COLUMNAR_DIR, csv_path.stem)
+
+
+def load_generation_grid(json_path):
+    """Memory-mapped CompactGrid for a generation, kept in the shared parsed-file cache."""
+    import compact_grid
+
+    return timetable_index.cached("grid", get_generation_grid(json_path), compact_grid.load_grid)
+
+
+async def xlsx_response(json_path, download_name):
+    try:
+        xlsx_path = await run_io(get_generation_xlsx, json_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Failed to build XLSX: {e}")
     return FileResponse(
-        path=dev_path,
+        path=xlsx_path,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=dev_path.name,
+        filename=download_name,
     )
 
 
-# Dev: return the local filesystem path (raw) so external tooling can map it to a URL
+# Serve the latest generation as XLSX (declared before /download/{filename} so it isn't shadowed)
+@app.get("/download/dev-xlsx")
+async def download_dev_xlsx():
+    return await xlsx_response(await run_io(get_latest_json_path), "All_Timetables_with_Teachers_fixed_v2.xlsx")
+
+
+# Dev: return the local filesystem path of the latest generation's workbook
 @app.get("/dev-xlsx-path")
-def dev_xlsx_path():
-    local_path = "/mnt/data/timetable_tools/output_v5/All_Timetables_with_Teachers_fixed_v2.xlsx"
-    return {"local_path": local_path}
+async def dev_xlsx_path():
+    try:
+        local_path = await run_io(get_generation_xlsx, await run_io(get_latest_json_path))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Failed to build XLSX: {e}")
+    return {"local_path": str(local_path)}
+
+
+def generation_json_path(filename):
+    """GENERATED_DIR/<name>.json for a generation given by its .json or .csv name."""
+    json_name = filename[:-4] + ".json" if filename.endswith(".csv") else filename
+    filepath = (GENERATED_DIR / json_name).resolve()
+    try:
+        if GENERATED_DIR.resolve() not in filepath.parents:
+            raise HTTPException(400, "Invalid filename")
+    except RuntimeError:
+        raise HTTPException(400, "Invalid filename")
+
+    if filepath.suffix != ".json" or not materialize(filepath).exists():
+        raise HTTPException(404, "File not found")
+    return filepath
+
+
+@app.get("/xlsx/{filename}")
+async def download_xlsx(filename: str):
+    """XLSX for a given generation; `filename` may be its .json or .csv name."""
+    filepath = await run_io(generation_json_path, filename)
+    return await xlsx_response(filepath, f"{filepath.stem}.xlsx")
+
+
+def _load_manifest(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def find_calendar(kind, key, generation=None):
+    """(path, etag) of a pre-rendered feed in the given (default: latest) generation."""
+    if generation:
+        stem = generation_json_path(generation).stem
+    else:
+        latest_name = get_latest_generated_file()
+        if not latest_name:
+            raise HTTPException(404, "No generated files found")
+        stem = Path(latest_name).stem
+    manifest_path = CALENDARS_DIR / stem / "manifest.json"
+    if not manifest_path.exists():
+        raise HTTPException(404, "No calendar feeds for this generation")
+    etag = timetable_index.cached("calendar_manifest", manifest_path, _load_manifest).get(kind, {}).get(key)
+    if not etag:
+        raise HTTPException(404, f"No {kind} calendar for {key}")
+    return CALENDARS_DIR / stem / kind / f"{key}.ics", etag
+
+
+@app.get("/calendar/{kind}/{name}")
+async def get_calendar(kind: str, name: str, request: Request, generation: Optional[str] = None):
+    """
+    Subscribable ICS feed: /calendar/teacher/TCHR_001.ics, /calendar/section/CSE-A.ics,
+    /calendar/room/CSE_Lab1.ics. Served from files rendered at generation time; the ETag is the
+    feed's content hash, so If-None-Match polls of an unchanged feed get a bodiless 304.
+    """
+    if kind not in ("teacher", "section", "room") or not name.endswith(".ics"):
+        raise HTTPException(404, "Unknown calendar")
+    path, etag = await run_io(find_calendar, kind, name[:-4], generation)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "public, max-age=300"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="text/calendar; charset=utf-8", headers=headers)
+
+
+def etag_matches(if_none_match, etag):
+    """
+    If-None-Match against our (strong) ETag, with the weak comparison GET uses: "*" matches anything,
+    otherwise one of the comma-separated tags, with or without W/, must equal "<etag>" exactly.
+    """
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == f'"{etag}"':
+            return True
+    return False
+
+
+@app.get("/grid/{filename}")
+async def download_grid(filename: str, expand: bool = False, sections: Optional[str] = None):
+    """
+    Compact binary form of a generation (format in compact_grid.py), a fraction of the JSON's size.
+    ?expand=true returns it expanded to the /json shape instead, optionally only ?sections=...
+    """
+    filepath = await run_io(generation_json_path, filename)
+    try:
+        if expand:
+            grid = await run_io(load_generation_grid, filepath)
+            return JSONResponse(grid.to_data(split_csv_param(sections)))
+        grid_path = await run_io(get_generation_grid, filepath)
+    except Exception as e:
+        raise HTTPException(500, f"Failed to build grid: {e}")
+    return FileResponse(grid_path, media_type="application/octet-stream", filename=f"{filepath.stem}.ttg")
+
+
+@app.get("/columnar/{filename}")
+async def download_columnar(filename: str, schema: bool = False):
+    """
+    Typed columnar copy of a generation's overall schedule (Parquet, or gzip CSV without pyarrow).
+    ?schema=true returns its schema (version, format, dtypes, categories) instead.
+    """
+    filepath = (await run_io(generation_json_path, filename)).with_suffix(".csv")
+    if not (await run_io(materialize, filepath)).exists():
+        raise HTTPException(404, "File not found")
+    try:
+        path = await run_io(get_generation_columnar, filepath)
+    except Exception as e:
+        raise HTTPException(500, f"Failed to build columnar export: {e}")
+    if schema:
+        return FileResponse(COLUMNAR_DIR / f"{filepath.stem}.schema.json", media_type="application/json")
+    media = "application/vnd.apache.parquet" if path.suffix == ".parquet" else "application/gzip"
+    return FileResponse(path, media_type=media, filename=path.name)
+
+
+@app.get("/workload")
+async def get_workload(generation: Optional[str] = None, teacher: Optional[str] = None,
+                       branch: Optional[str] = None, department: Optional[str] = None):
+    """
+    Teacher workload and utilisation for a generation (the latest by default): weekly load, daily
+    peaks, idle gaps, back-to-back streaks and lab hours per teacher, plus branch and department
+    rollups. ?teacher= / ?branch= / ?department= narrow the response to those entries.
+    """
+    try:
+        summary = await run_io(load_workload, generation)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Failed to build workload summary: {e}")
+    if not (teacher or branch or department):
+        return summary
+    response = {"generation": summary["generation"]}
+    for key, value, table in (("teacher", teacher, "teachers"), ("branch", branch, "branches"),
+                              ("department", department, "departments")):
+        if value and value not in summary[table]:
+            raise HTTPException(404, f"No workload for {key} {value}")
+        if value:
+            response[key] = summary[table][value]
+    if department:
+        response["department"] = {**response["department"], "members": {
+            tid: t for tid, t in summary["teachers"].items() if t["department"] == department}}
+    return response
+
+
+def load_workload(generation=None):
+    """Summary stored at generation time, else built from the generation's CSV (and cached)."""
+    import workload
+
+    name = generation or get_latest_generated_file()
+    if not name:
+        raise HTTPException(404, "No timetable generated yet")
+    csv_path = generation_json_path(name).with_suffix(".csv")
+    stored = WORKLOAD_DIR / f"{csv_path.stem}.json"
+    if stored.exists():
+        summary = timetable_index.cached("workload", stored, lambda p: json.loads(p.read_text(encoding="utf-8")))
+    else:
+        if not materialize(csv_path).exists():
+            raise HTTPException(404, "File not found")
+        summary = timetable_index.cached("workload_built", csv_path,
+                                         lambda p: workload.build_workload(p, SUBJECTS_TEACHERS_FILE))
+    return {"generation": csv_path.name, **summary}
+
+
+@app.get("/free/resources")
+async def free_resources(day: str, slot: str, kind: str = "room", pool: Optional[str] = None,
+                         generation: Optional[str] = None):
+    """
+    Rooms, sections or teachers (kind=) free at one day and slot of a generation (the latest by
+    default). ?pool=CSE limits rooms to that branch's lab pool.
+    """
+    return await run_io(find_free_resources, day.upper(), slot, kind, pool, generation)
+
+
+@app.get("/free/slots")
+async def free_slots(sections: Optional[str] = None, teachers: Optional[str] = None, rooms: Optional[str] = None,
+                     pool: Optional[str] = None, day: Optional[str] = None, length: int = 1, limit: int = 20,
+                     generation: Optional[str] = None):
+    """
+    Periods where every listed section, teacher and room is free for `length` consecutive periods
+    (2 for a lab), earliest first, so the first item is the first fit. ?pool=CSE (or ANY) also
+    requires a free room from that lab pool and lists the candidates.
+    """
+    return await run_io(find_free_slots, split_csv_param(sections) or [], split_csv_param(teachers) or [],
+                        split_csv_param(rooms) or [], pool, day.upper() if day else None, length, limit, generation)
+
+
+def load_free_index(generation=None):
+    """(FreeIndex for a generation, teacher unavailability masks), each built once per file version."""
+    import free_finder
+    from timetable import AVAILABILITY_FILE, load_availability
+
+    name = generation or get_latest_generated_file()
+    if not name:
+        raise HTTPException(404, "No timetable generated yet")
+    csv_path = generation_json_path(name).with_suffix(".csv")
+    if not materialize(csv_path).exists():
+        raise HTTPException(404, "File not found")
+    pools = lab_pools()
+    index = timetable_index.cached("free", csv_path, lambda p: free_finder.FreeIndex.from_csv(p, pools))
+    availability_file = BASE_DIR / AVAILABILITY_FILE
+    unavailable = timetable_index.cached(
+        "unavailable", availability_file,
+        lambda p: free_finder.unavailability_masks(load_availability(str(p)))) if availability_file.exists() else {}
+    return index, unavailable
+
+
+def lab_pools():
+    from timetable import LAB_POOLS
+
+    return tenants.active().config().get("lab_pools", LAB_POOLS)
+
+
+def _check_pool(pool):
+    pools = lab_pools()
+    if pool and pool != "ANY" and pool not in pools:
+        raise HTTPException(400, f"pool must be ANY or one of {sorted(pools)}")
+
+
+def find_free_resources(day, slot, kind, pool, generation):
+    import free_finder
+
+    if kind not in free_finder.KINDS:
+        raise HTTPException(400, f"kind must be one of {list(free_finder.KINDS)}")
+    if day not in DAYS:
+        raise HTTPException(400, f"day must be one of {DAYS}")
+    _check_pool(pool)
+    try:
+        slot_idx = free_finder.slot_index(slot)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    index, unavailable = load_free_index(generation)
+    keys = index.rooms(None if pool == "ANY" else pool) if kind == "room" else None
+    return {"day": day, "slot": free_finder.TIME_SLOTS[slot_idx], "kind": kind,
+            "free": index.free_at(kind, day, slot_idx, keys, unavailable)}
+
+
+def find_free_slots(sections, teachers, rooms, pool, day, length, limit, generation):
+    import free_finder
+
+    if day and day not in DAYS:
+        raise HTTPException(400, f"day must be one of {DAYS}")
+    if not 1 <= length <= free_finder.N_SLOTS:
+        raise HTTPException(400, f"length must be between 1 and {free_finder.N_SLOTS}")
+    _check_pool(pool)
+    index, unavailable = load_free_index(generation)
+    resources = [("section", k) for k in sections] + [("teacher", k) for k in teachers] + [("room", k) for k in rooms]
+    try:
+        found = list(itertools.islice(index.common_slots(resources, length, day, pool, unavailable), max(1, limit)))
+    except KeyError as e:
+        raise HTTPException(404, e.args[0])
+    return {"sections": sections, "teachers": teachers, "rooms": rooms, "pool": pool, "length": length,
+            "first": found[0] if found else None, "slots": found}
+
+
+@app.get("/diff/{old}/{new}")
+async def diff_generations(old: str, new: str, teacher: Optional[str] = None, section: Optional[str] = None):
+    """
+    Sessions moved, added and removed between two generations (.json or .csv names), grouped by
+    section and by teacher. ?teacher=ID or ?section=NAME narrows the response to that entry.
+    """
+    old_path, new_path = await asyncio.gather(run_io(generation_json_path, old), run_io(generation_json_path, new))
+    try:
+        result = await run_io(timetable_index.load_diff, old_path, new_path)
+    except Exception as e:
+        raise HTTPException(500, f"Failed to diff generations: {e}")
+
+    empty = {"moved": [], "added": [], "removed": []}
+    response = {"old": old_path.name, "new": new_path.name, "summary": result["summary"]}
+    if teacher or section:
+        if teacher:
+            response["teacher"] = result["teachers"].get(teacher, empty)
+        if section:
+            response["section"] = result["sections"].get(section, empty)
+    else:
+        response["sections"] = result["sections"]
+        response["teachers"] = result["teachers"]
+    return response
+
+
+@app.get("/download/{filename}")
+async def download_csv(filename: str):
+    filepath = (GENERATED_DIR / filename).resolve()
+    try:
+        if GENERATED_DIR.resolve() not in filepath.parents and filepath != GENERATED_DIR.resolve():
+            raise HTTPException(400, "Invalid filename")
+    except RuntimeError:
+        raise HTTPException(400, "Invalid filename")
+
+    if not (await run_io(materialize, filepath)).exists():
+        raise HTTPException(404, "File not found")
+
+    return FileResponse(filepath, media_type="text/csv", filename=filename)
 
 
 @app.get("/json/{filename}")
-def download_json(filename: str):
+async def download_json(filename: str, sections: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Optional projection: ?sections=CSE-A,CSE-B keeps only those sections,
+    ?fields=09:00-10:00,10:00-11:00 keeps only those columns (plus "Day").
+    """
     filepath = (GENERATED_DIR / filename).resolve()
     try:
         if GENERATED_DIR.resolve() not in filepath.parents and filepath != GENERATED_DIR.resolve():
@@ -152,21 +1032,30 @@ def download_json(filename: str):
     except RuntimeError:
         raise HTTPException(400, "Invalid filename")
 
-    if not filepath.exists():
+    if not (await run_io(materialize, filepath)).exists():
         raise HTTPException(404, "File not found")
 
-    # Load JSON content and return as JSONResponse (ensures fetch(...).json() works)
+    # Parsed once per file and shared with the other timetable endpoints
     try:
-        text = filepath.read_text(encoding="utf-8")
-        data = json.loads(text)
+        index = await run_io(timetable_index.load_index, filepath)
     except Exception as e:
         raise HTTPException(500, f"Failed to read/parse JSON file: {e}")
 
-    return JSONResponse(data)
+    return JSONResponse(index.project(split_csv_param(sections), split_csv_param(fields)))
+
+
+def split_csv_param(value):
+    if not value:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
 
 
 @app.get("/users")
-def get_users():
+async def get_users():
+    return await run_io(read_users)
+
+
+def read_users():
     teachers_file = BASE_DIR / "teachers.csv"
     
     # Start with Admin user
@@ -175,9 +1064,9 @@ def get_users():
     if ADMIN_FILE.exists():
         try:
             admin_data = json.loads(ADMIN_FILE.read_text(encoding="utf-8"))
-            users.append(admin_data)
+            users.append({k: v for k, v in admin_data.items() if k != "password"})
         except Exception as e:
-            print(f"Error reading admin.json: {e}")
+            log.warning("Error reading admin.json: %s", e)
     else:
         # Fallback if file missing
         users.append({
@@ -185,7 +1074,6 @@ def get_users():
             "name": "Srinand",
             "role": "Admin",
             "email": "admin@tibl.ai",
-            "password": "password123",
             "created_at": "Sep 13, 2025"
         })
     
@@ -201,7 +1089,6 @@ def get_users():
                     "name": row["name"],
                     "role": "Teacher",
                     "email": row.get("email", ""),
-                    "password": row.get("password", ""),
                     "created_at": "Sep 13, 2025" # Default date
                 })
     except Exception as e:
@@ -210,144 +1097,317 @@ def get_users():
     return users
 
 
-from pydantic import BaseModel
 
 class LoginRequest(BaseModel):
     email: str
     password: str
 
 @app.post("/login")
-def login(creds: LoginRequest):
-    # Check for Admin
-    admin_user = None
-    if ADMIN_FILE.exists():
-        try:
-             admin_data = json.loads(ADMIN_FILE.read_text(encoding="utf-8"))
-             if admin_data["email"] == creds.email and admin_data["password"] == creds.password:
-                 admin_user = admin_data
-        except Exception:
-             pass
-    
+async def login(creds: LoginRequest):
+    """Verify credentials once and return the user plus a bearer token for later calls."""
+    found = await run_io(auth.find_user, creds.email, ADMIN_FILE, TEACHERS_FILE)
+    user = None
+    # hashing is CPU-bound, keep it off the event loop
+    if found and await run_io(auth.verify_password, creds.password, found[0]):
+        user = found[1]
     # Fallback to hardcoded if file check failed or file missing, but only if it matches hardcoded defaults (legacy support)
-    if not admin_user and creds.email == "admin@tibl.ai" and creds.password == "password123":
-         admin_user = {
+    elif (not ADMIN_FILE.exists() and tenants.active().name == tenants.DEFAULT_TENANT
+          and creds.email == "admin@tibl.ai" and creds.password == "password123"):
+        user = {
             "id": "ADMIN_001",
             "name": "Srinand",
             "role": "Admin",
             "email": "admin@tibl.ai",
-         }
-
-    if admin_user:
-        return {
-            "id": admin_user["id"],
-            "name": admin_user["name"],
-            "role": "Admin",
-            "email": admin_user["email"],
-            "avatar": f"https://ui-avatars.com/api/?name={admin_user['name']}&background=3b82f6&color=fff"
         }
+    if not user:
+        raise HTTPException(401, "Invalid email or password")
+    # a token is only good for the tenant it was issued by (current_user checks it)
+    user = {**user, "tenant": tenants.active().name}
 
-    teachers_file = BASE_DIR / "teachers.csv"
-    if not teachers_file.exists():
-        raise HTTPException(401, "Invalid credentials")
-    
-    try:
-        with open(teachers_file, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                email = row.get("email", "")
-                password = row.get("password", "")
-                
-                if email == creds.email and password == creds.password:
-                    return {
-                        "id": row["id"],
-                        "name": row["name"],
-                        "role": "Teacher",
-                        "email": email,
-                        "avatar": f"https://ui-avatars.com/api/?name={row['name']}&background=random&color=fff"
-                    }
-    except Exception as e:
-        print(f"Login error: {e}")
-        
-    raise HTTPException(401, "Invalid email or password")
+    background = "3b82f6" if user["role"] == "Admin" else "random"
+    return {
+        **user,
+        "avatar": f"https://ui-avatars.com/api/?name={user['name']}&background={background}&color=fff",
+        "token": auth.issue_token(user),
+        "expires_in": auth.SESSION_TTL_SECONDS,
+    }
 
 
-@app.get("/timetable/teacher/{teacher_id}")
-def get_teacher_timetable(teacher_id: str):
-    # 1. Find the latest JSON file
+@app.get("/me")
+async def me(user: dict = Depends(current_user)):
+    return user
+
+
+@app.post("/logout")
+async def logout(token: Optional[str] = Depends(bearer_token)):
+    if token:
+        auth.revoke_token(token)
+    return {"status": "success"}
+
+
+def get_latest_json_path():
+    """JSON of the latest generation, falling back to the static timetable.json."""
     json_filename = get_latest_generated_file()
-    if not json_filename:
-        # If no generated file, try to load the static 'timetable.json' if it exists
-        static_json = BASE_DIR / "timetable.json"
-        if static_json.exists():
-            filepath = static_json
-        else:
-            raise HTTPException(404, "No timetable data found")
-    else:
-        # If we have a generated file, prefer that.
+    if json_filename:
         # Ensure we are looking for the JSON version.
-        target_json_name = json_filename
-        if target_json_name.endswith(".csv"):
-            target_json_name = target_json_name.replace(".csv", ".json")
-            
-        filepath = GENERATED_DIR / target_json_name
-        
-        # Fallback to static if generated JSON doesn't exist
-        if not filepath.exists():
-             filepath = BASE_DIR / "timetable.json"
-             if not filepath.exists():
-                 raise HTTPException(404, "Timetable JSON not found")
+        if json_filename.endswith(".csv"):
+            json_filename = json_filename.replace(".csv", ".json")
+        filepath = GENERATED_DIR / json_filename
+        if filepath.exists():
+            return filepath
+    static_json = BASE_DIR / "timetable.json"
+    if static_json.exists():
+        return static_json
+    raise HTTPException(404, "No timetable data found")
 
+
+def get_latest_index():
+    filepath = get_latest_json_path()
     try:
-        text = filepath.read_text(encoding="utf-8")
-        full_data = json.loads(text)
+        return timetable_index.load_index(filepath)
     except Exception as e:
         raise HTTPException(500, f"Failed to load timetable: {e}")
 
-    # 2. Filter for the teacher
-    # Structure: { "Section": [ { "Day": "MON", "Time": "Value" } ] }
-    
-    # We want to build: { "My Schedule": [ { "Day": "MON", "09:00-10:00": "Class (Section)", ... } ] }
-    # Initialize empty schedule for MON-FRI
-    days = ["MON", "TUE", "WED", "THU", "FRI"]
-    my_schedule = {day: {"Day": day} for day in days}
-    
-    # Iterate through all sections
-    for section, rows in full_data.items():
-        for row in rows:
-            day = row.get("Day")
-            if day not in my_schedule:
-                continue
-            
-            # Check all time slots
-            for time_slot, content in row.items():
-                if time_slot == "Day":
-                    continue
-                
-                # Content format: "Subject — Teacher Name (ID)"
-                # We check if teacher_id is in content
-                if content and isinstance(content, str) and f"({teacher_id})" in content:
-                    # Found a class!
-                    # If we already have something there, append it
-                    existing = my_schedule[day].get(time_slot)
-                    new_entry = f"{content.split('—')[0].strip()} ({section})"
-                    
-                    if existing:
-                        my_schedule[day][time_slot] = f"{existing}\n{new_entry}"
-                    else:
-                        my_schedule[day][time_slot] = new_entry
-
-    # Convert dict to list
-    final_rows = [my_schedule[day] for day in days]
-    
-    return {"My Schedule": final_rows}
+
+def _load_subject_names(path):
+    from timetable import load_subjects_teachers
+
+    subjects, _ = load_subjects_teachers(str(path), str(TEACHERS_FILE))
+    return {code: info.get("name", "") for code, info in subjects.items()}
+
+
+def get_search_index(generation=None):
+    """Search index of a generation's CSV (the latest by default), with names from the current inputs."""
+    from timetable import TIME_SLOTS
+
+    name = generation or get_latest_generated_file()
+    if not name:
+        raise HTTPException(404, "No generated timetable")
+    csv_path = (GENERATED_DIR / f"{Path(name).stem}.csv").resolve()
+    if csv_path.parent != GENERATED_DIR.resolve():
+        raise HTTPException(400, "Invalid filename")
+    if not materialize(csv_path).exists():
+        raise HTTPException(404, "File not found")
+
+    subj_csv = SUBJECTS_TEACHERS_FILE if SUBJECTS_TEACHERS_FILE.exists() else BASE_DIR / "subjects.csv"
+    subject_names = timetable_index.cached("subject_names", subj_csv, _load_subject_names)
+    teacher_names = timetable_index.load_teachers(TEACHERS_FILE) if TEACHERS_FILE.exists() else {}
+    version = tuple(p.stat().st_mtime_ns if p.exists() else 0 for p in (subj_csv, TEACHERS_FILE))
+    return timetable_index.load_search_index(csv_path, TIME_SLOTS, subject_names, teacher_names, version)
+
+
+def current_slot():
+    """(day, slot label or None) for the local time right now."""
+    from datetime import datetime
+    from timetable import TIME_SLOTS
+
+    now = datetime.now()
+    day = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"][now.weekday()]
+    hhmm = now.strftime("%H:%M")
+    for label in TIME_SLOTS:
+        start, end = label.split()[0].split("-")
+        if start <= hhmm < end:
+            return day, label
+    return day, None
+
+
+@app.get("/search")
+async def search(q: str, field: Optional[str] = None, day: Optional[str] = None, slot: Optional[str] = None,
+                 now: bool = False, generation: Optional[str] = None, limit: int = 50):
+    """
+    Find sessions by subject name or code, teacher, room, batch or section (prefix and fuzzy matches),
+    e.g. /search?q=dbms lab&now=true. ?field=room,batch restricts the fields, ?day=/?slot= the time;
+    ?now=true means "right now". Served from an inverted index built once per generation.
+    """
+    fields = split_csv_param(field)
+    if fields and not set(fields) <= set(timetable_index.SEARCH_FIELDS):
+        raise HTTPException(400, f"field must be among {', '.join(timetable_index.SEARCH_FIELDS)}")
+    if now:
+        day, slot = current_slot()
+        if slot is None:
+            return {"query": q, "day": day, "slot": None, "total": 0, "hits": []}
+    index = await run_io(get_search_index, generation)
+    result = index.search(q, fields=fields, day=day, slot=slot, limit=max(1, min(limit, 500)))
+    return {"query": q, "day": day, "slot": slot, **result}
+
+
+@app.get("/timetable/teacher/{teacher_id}")
+async def get_teacher_timetable(teacher_id: str):
+    # Served from the cached per-generation index instead of re-parsing the JSON on every call.
+    # Output shape: { "My Schedule": [ { "Day": "MON", "09:00-10:00": "Class (Section)", ... } ] }
+    index = await run_io(get_latest_index)
+    return {"My Schedule": index.teacher_schedule(teacher_id, DAYS)}
+
+
+class TimetableBatchRequest(BaseModel):
+    teacher_ids: List[str] = []
+    sections: List[str] = []
+    fields: List[str] = []
+
+
+@app.post("/timetable/batch")
+async def get_timetables_batch(req: TimetableBatchRequest):
+    """
+    Many teacher schedules and/or sections in one call, all served from the same parsed generation.
+    Response: { "teachers": { id: [rows] }, "sections": { name: [rows] } }
+    """
+    index = await run_io(get_latest_index)
+    teachers = {tid: index.teacher_schedule(tid, DAYS) for tid in dict.fromkeys(req.teacher_ids)}
+    sections = index.project(req.sections, req.fields) if req.sections else {}
+    return {"teachers": teachers, "sections": sections}
+
+
+@app.get("/substitutes/{teacher_id}")
+async def get_substitutes(teacher_id: str, day: Optional[str] = None, date: Optional[str] = None, limit: int = 5):
+    """
+    Ranked free teachers for every slot the absent teacher has on `day` (MON..FRI) or `date` (YYYY-MM-DD).
+    A date is resolved through the term calendar: holidays and weekends have nothing to cover, and a
+    substitute day uses the schedule of the weekday it follows.
+    """
+    if date:
+        try:
+            info = (await run_io(term_calendar.load_term, TERM_FILE)).resolve(date)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if not info["follows"]:
+            return {"teacher_id": teacher_id, "day": None, "date": info["date"], "note": info["note"], "slots": []}
+        day = info["follows"]
+    day = (day or "").upper()
+    if day not in DAYS:
+        raise HTTPException(400, f"day must be one of {DAYS}")
+
+    slots = await run_io(rank_substitutes, teacher_id, day, limit)
+    return {"teacher_id": teacher_id, "day": day, "slots": slots}
+
+
+# ---------- term calendar ----------
+class TermRequest(BaseModel):
+    start: str
+    end: str
+    holidays: List[Dict] = []        # {"date"} or {"from", "to"}, plus an optional "name"
+    substitutes: List[Dict] = []     # {"date", "follows": "MON".."FRI"}, plus an optional "name"
+
+
+@app.get("/term")
+async def get_term():
+    term = await run_io(term_calendar.load_term, TERM_FILE)
+    return {**term.to_dict(), "default": not term.bounded,
+            "teaching_days": await run_io(lambda: sum(1 for _ in term.teaching_days()))}
+
+
+@app.put("/term")
+async def update_term(req: TermRequest, admin: dict = Depends(require_admin)):
+    """Replace term.json and re-render the latest generation's calendar feeds with the new holidays."""
+    try:
+        term = term_calendar.TermCalendar(req.start, req.end, req.holidays, req.substitutes)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    await run_io(term.save, TERM_FILE)
+    await run_io(rerender_calendars, term)
+    return term.to_dict()
+
+
+def rerender_calendars(term):
+    """Swap in freshly rendered feeds for the latest generation (e.g. after the term changed)."""
+    import calendar_feeds
+
+    latest = get_latest_generated_file()
+    if not latest:
+        return
+    stem = Path(latest).stem
+    csv_path = materialize((GENERATED_DIR / f"{stem}.csv").resolve())
+    if not csv_path.exists():
+        return
+    STAGING_DIR.mkdir(exist_ok=True)
+    CALENDARS_DIR.mkdir(exist_ok=True)
+    staged, old = STAGING_DIR / f"{stem}_calendars", STAGING_DIR / f"{stem}_calendars_old"
+    shutil.rmtree(staged, ignore_errors=True)
+    calendar_feeds.render_feeds(csv_path, staged, term=term)
+    with tenants.active().commit_lock:
+        shutil.rmtree(old, ignore_errors=True)
+        if (CALENDARS_DIR / stem).exists():
+            os.replace(CALENDARS_DIR / stem, old)
+        os.replace(staged, CALENDARS_DIR / stem)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+@app.get("/term/date/{day}")
+async def get_term_date(day: str, section: Optional[str] = None, teacher: Optional[str] = None):
+    """What runs on one date (YYYY-MM-DD), optionally for one section or teacher."""
+    return await run_io(term_sessions, day, day, section, teacher, None)
+
+
+@app.get("/term/sessions")
+async def get_term_sessions(start: str, end: str, section: Optional[str] = None, teacher: Optional[str] = None,
+                            limit: int = 500):
+    """
+    Every class between two dates, expanded lazily from the weekly timetable and cut off after
+    `limit` sessions; "next" is the date to continue from when the range didn't fit.
+    """
+    return await run_io(term_sessions, start, end, section, teacher, max(1, min(limit, 5000)))
+
+
+def term_sessions(start, end, section, teacher, limit):
+    term = term_calendar.load_term(TERM_FILE)
+    index = get_latest_index()
+    response = {"term": {"start": term.start.isoformat(), "end": term.end.isoformat()}, "sessions": [], "next": None}
+    found = response["sessions"]
+    try:
+        if start == end:
+            response["day"] = term.resolve(start)
+        for s in term.sessions(index, start, end, section=section, teacher=teacher):
+            # pages end on a date boundary, so a date's sessions are never split
+            if limit and len(found) >= limit and s["date"] != found[-1]["date"]:
+                response["next"] = s["date"]
+                break
+            found.append(s)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return response
+
+
+def rank_substitutes(teacher_id, day, limit):
+    index = get_latest_index()
+    teachers = timetable_index.load_teachers(TEACHERS_FILE) if TEACHERS_FILE.exists() else {}
+    catalogue = timetable_index.load_catalogue(SUBJECTS_TEACHERS_FILE) if SUBJECTS_TEACHERS_FILE.exists() else {}
+    # teachers that appear in the timetable but not in teachers.csv can still cover
+    teachers = {**index.teacher_names, **teachers}
+    return timetable_index.find_substitutes(index, teacher_id, day, teachers, catalogue, limit=limit,
+                                            unavailable=load_unavailable())
+
+
+def load_unavailable():
+    """{tid: {(day, slot)}} from teacher_availability.csv ({} without one), parsed once per file version."""
+    from timetable import AVAILABILITY_FILE, load_availability, unavailable_cells
+
+    availability_file = BASE_DIR / AVAILABILITY_FILE
+    if not availability_file.exists():
+        return {}
+    return timetable_index.cached("unavailable_cells", availability_file,
+                                  lambda p: unavailable_cells(load_availability(str(p))))
 
 
 class UpdateProfileRequest(BaseModel):
     name: str
     email: str
 
+def rewrite_csv(path, fieldnames, rows):
+    """Replace a CSV in one rename so concurrent readers (e.g. /login) never see it half-written."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
 @app.put("/users/{user_id}")
-def update_user(user_id: str, data: UpdateProfileRequest):
+def update_user(user_id: str, data: UpdateProfileRequest, user: dict = Depends(require_self_or_admin)):
+    with tenants.active().users_lock:
+        return _update_user(user_id, data)
+
+
+def _update_user(user_id, data):
     old_name = ""
     user_found = False
 
@@ -360,7 +1420,9 @@ def update_user(user_id: str, data: UpdateProfileRequest):
              old_name = admin_data["name"]
              admin_data["name"] = data.name
              admin_data["email"] = data.email
-             ADMIN_FILE.write_text(json.dumps(admin_data, indent=4), encoding="utf-8")
+             tmp_path = ADMIN_FILE.with_name(f".{ADMIN_FILE.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+             tmp_path.write_text(json.dumps(admin_data, indent=4), encoding="utf-8")
+             os.replace(tmp_path, ADMIN_FILE)
              user_found = True
         except Exception as e:
              raise HTTPException(500, f"Failed to update admin: {e}")
@@ -383,49 +1445,33 @@ def update_user(user_id: str, data: UpdateProfileRequest):
                     updated_rows.append(row)
             
             if user_found:
-                with open(teachers_file, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(updated_rows)
+                rewrite_csv(teachers_file, fieldnames, updated_rows)
             else:
                  raise HTTPException(404, "User not found")
         except Exception as e:
             raise HTTPException(500, f"Failed to update teacher: {e}")
 
-    # 2. Update Timetable JSONs
-    # We need to update both static timetable.json and the latest generated one
-    
-    def update_json_file(path):
-        if not path.exists(): return
+    # 2. Update the static timetable.json and the latest generation (JSON, CSV and the files built from them)
+    if old_name != data.name:
+        renamed = {user_id: (old_name, data.name)}
         try:
-            content = path.read_text(encoding="utf-8")
-            # Replace "— Old Name (ID)" with "— New Name (ID)"
-            old_str = f"— {old_name} ({user_id})"
-            new_str = f"— {data.name} ({user_id})"
-            
-            if old_str in content:
-                new_content = content.replace(old_str, new_str)
-                path.write_text(new_content, encoding="utf-8")
+            rename_in_json(BASE_DIR / "timetable.json", renamed)
+            rename_in_latest(renamed)
         except Exception as e:
-            print(f"Failed to update JSON {path}: {e}")
-
-    # Update static
-    update_json_file(BASE_DIR / "timetable.json")
-    
-    # Update latest generated
-    latest_file = get_latest_generated_file()
-    if latest_file:
-        target_json = latest_file
-        if target_json.endswith(".csv"):
-            target_json = target_json.replace(".csv", ".json")
-            
-        update_json_file(GENERATED_DIR / target_json)
+            log.warning("Failed to update timetables for %s: %s", user_id, e)
 
+    auth.sessions.update_user(user_id, tenant=tenants.active().name, name=data.name, email=data.email)
+    tenants.active().broker.publish("user", {"action": "updated", "id": user_id, "teachers": [user_id]})
     return {"status": "success", "user": {"id": user_id, "name": data.name, "email": data.email}}
 
 
 @app.delete("/users/{user_id}")
-def delete_user(user_id: str):
+def delete_user(user_id: str, admin: dict = Depends(require_admin)):
+    with tenants.active().users_lock:
+        return _delete_user(user_id)
+
+
+def _delete_user(user_id):
     if user_id == "ADMIN_001":
         raise HTTPException(400, "Cannot delete admin user")
         
@@ -448,15 +1494,14 @@ def delete_user(user_id: str):
                 
         if not user_found:
              raise HTTPException(404, "User not found")
-             
-        with open(teachers_file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(updated_rows)
+
+        rewrite_csv(teachers_file, fieldnames, updated_rows)
             
     except Exception as e:
         raise HTTPException(500, f"Failed to delete teacher: {e}")
-        
+
+    auth.sessions.revoke_user(user_id, tenant=tenants.active().name)
+    tenants.active().broker.publish("user", {"action": "deleted", "id": user_id, "teachers": [user_id]})
     return {"status": "success", "message": "User deleted"}
 
 
@@ -468,7 +1513,12 @@ class CreateUserRequest(BaseModel):
     password: str
 
 @app.post("/users")
-def create_user(data: CreateUserRequest):
+def create_user(data: CreateUserRequest, admin: dict = Depends(require_admin)):
+    with tenants.active().users_lock:
+        return _create_user(data)
+
+
+def _create_user(data):
     teachers_file = BASE_DIR / "teachers.csv"
     if not teachers_file.exists():
         # Create header if not exists
@@ -488,8 +1538,183 @@ def create_user(data: CreateUserRequest):
     try:
         with open(teachers_file, "a", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
-            writer.writerow([data.id, data.name, data.email, data.password])
+            # stored salted-hashed; /login accepts both hashed and legacy plain-text entries
+            writer.writerow([data.id, data.name, data.email, auth.hash_password(data.password)])
     except Exception as e:
         raise HTTPException(500, f"Failed to create user: {e}")
-        
+
+    tenants.active().broker.publish("user", {"action": "created", "id": data.id, "teachers": [data.id]})
     return {"status": "success", "user": data.dict()}
+
+
+# ---------- bulk import / export ----------
+def _admin_email():
+    try:
+        return json.loads(ADMIN_FILE.read_text(encoding="utf-8")).get("email") if ADMIN_FILE.exists() else None
+    except Exception:
+        return None
+
+
+def validate_upload(filename, binary_file):
+    ids, emails = user_import.existing_index(TEACHERS_FILE, _admin_email())
+    try:
+        return user_import.validate_rows(user_import.iter_rows(filename, binary_file), ids, emails)
+    except Exception as e:
+        raise HTTPException(400, f"Could not read {filename}: {e}")
+
+
+def hash_if_needed(password):
+    return password if auth.is_hashed(password) else auth.hash_password(password)
+
+
+def commit_import(rows):
+    """Append rows under the users lock, re-checking ids/emails in case they were taken meanwhile."""
+    with tenants.active().users_lock:
+        ids, emails = user_import.existing_index(TEACHERS_FILE, _admin_email())
+        _, conflicts = user_import.validate_rows(rows, ids, emails)
+        if conflicts:
+            return conflicts
+        user_import.append_users(TEACHERS_FILE, rows)
+    return []
+
+
+@app.post("/users/import")
+async def import_users(file: UploadFile = File(...), dry_run: bool = False, admin: dict = Depends(require_admin)):
+    """
+    Add many teachers from an uploaded CSV or XLSX (id, name, email, password).
+    Every row is checked in one pass; if any row is invalid nothing is written and the per-row
+    errors come back with a 422. ?dry_run=true only validates.
+    """
+    accepted, errors = await run_io(validate_upload, file.filename, file.file)
+    if errors:
+        raise HTTPException(422, {"imported": 0, "errors": errors})
+    if dry_run:
+        return {"status": "valid", "rows": len(accepted)}
+
+    # pbkdf2 releases the GIL, so the I/O pool hashes the batch in parallel
+    hashed = await asyncio.gather(*(run_io(hash_if_needed, row["password"]) for row in accepted))
+    rows = [{**row, "password": pw} for row, pw in zip(accepted, hashed)]
+    conflicts = await run_io(commit_import, rows)
+    if conflicts:
+        raise HTTPException(409, {"imported": 0, "errors": conflicts})
+
+    ids = [row["id"] for row in rows]
+    tenants.active().broker.publish("user", {"action": "imported", "ids": ids, "teachers": ids})
+    return {"status": "success", "imported": len(rows)}
+
+
+@app.get("/users/export")
+async def export_users(format: str = "csv", admin: dict = Depends(require_admin)):
+    """teachers.csv without passwords, as streamed CSV (default) or ?format=xlsx."""
+    if format == "xlsx":
+        from xlsx_writer import write_workbook
+
+        STAGING_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = STAGING_DIR / f"users_{os.getpid()}_{threading.get_ident()}_{time.time_ns()}.xlsx"
+        sheets = await run_io(user_import.export_sheets, TEACHERS_FILE)
+        await run_io(write_workbook, sheets, tmp_path)
+        return FileResponse(
+            tmp_path,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename="users.xlsx",
+            background=BackgroundTask(os.unlink, tmp_path),
+        )
+    if format != "csv":
+        raise HTTPException(400, "format must be csv or xlsx")
+    return StreamingResponse(
+        user_import.iter_export_csv(Path(TEACHERS_FILE)),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+    )
+
+
+# ---------- manual edits ----------
+class CellEdit(BaseModel):
+    op: str                                   # move | swap | pin | unpin
+    section: str
+    day: str
+    slot: str
+    to_day: Optional[str] = None
+    to_slot: Optional[str] = None
+
+
+class EditRequest(BaseModel):
+    edits: List[CellEdit]
+    base: Optional[str] = None                # generation the edits were made against
+    dry_run: bool = False
+
+
+@app.get("/edits/pins")
+async def get_pins():
+    return {"pins": await run_io(manual_edits.load_pins, PINS_FILE)}
+
+
+@app.post("/edits")
+async def edit_timetable(req: EditRequest, admin: dict = Depends(require_admin)):
+    """
+    Move, swap, pin or unpin theory periods of the latest generation by hand.
+    Every edit is checked against the section, teacher and room occupancy of the grid and against
+    teacher_availability.csv; if one doesn't fit nothing is applied and its conflicts come back with
+    a 409. Accepted moves/swaps are committed as a new generation and pinned, so the next /generate
+    keeps them. ?base= guards against editing a generation that has been replaced in the meantime.
+    """
+    return await run_io(apply_edits, [e.dict() for e in req.edits], req.base, req.dry_run)
+
+
+def apply_edits(edits, base, dry_run):
+    with tenants.active().edit_lock:
+        previous = get_latest_generated_file()
+        if not previous:
+            raise HTTPException(404, "No generated timetable to edit")
+        stem = Path(previous).stem
+        if base and Path(base).stem != stem:
+            raise HTTPException(409, {"message": f"{base} is no longer the latest generation", "latest": f"{stem}.json"})
+        csv_path, json_path = GENERATED_DIR / f"{stem}.csv", GENERATED_DIR / f"{stem}.json"
+        if not csv_path.exists() or not json_path.exists():
+            raise HTTPException(404, f"{stem} has no CSV/JSON pair to edit")
+
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames, rows = reader.fieldnames, list(reader)
+        data = json.loads(json_path.read_text(encoding="utf-8"), parse_constant=lambda _: None)
+        editor = manual_edits.Editor(rows, data, manual_edits.load_pins(PINS_FILE), load_unavailable())
+        try:
+            conflicts = editor.apply(edits)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if conflicts:
+            raise HTTPException(409, {"message": "Edit rejected", "conflicts": conflicts})
+        if dry_run:
+            return {"status": "valid", "sections": sorted(editor.changed)}
+
+        csv_name, json_name = previous, f"{stem}.json"
+        if editor.changed:
+            csv_name, json_name = commit_edited(editor, fieldnames)
+        manual_edits.save_pins(PINS_FILE, editor.pin_list())
+
+    if editor.changed:
+        announce_generation(previous, csv_name, json_name)
+    return {"status": "success", "filename": csv_name, "json_filename": json_name,
+            "sections": sorted(editor.changed), "pins": editor.pin_list()}
+
+
+def commit_edited(editor, fieldnames):
+    """Write the edited CSV/JSON (+ calendars, validation) to a workspace and commit it as a new generation."""
+    from timetable_runner import render_calendars
+
+    workspace = Path(tempfile.mkdtemp(prefix="edit_", dir=WORKSPACES_DIR))
+    try:
+        csv_path, json_path = workspace / "overall_schedule.csv", workspace / "timetable.json"
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(editor.sorted_rows())
+        json_path.write_text(json.dumps(editor.data, ensure_ascii=False), encoding="utf-8")
+        render_calendars(csv_path, workspace, TERM_FILE)
+        try:
+            report = _build_validation_report(csv_path)
+        except Exception as e:
+            report = {"ok": False, "error": f"Validation failed to run: {e}"}
+        return commit_generation(csv_path, json_path, report)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
@@ -0,0 +1,229 @@
+# manual_edits.py
+"""
+Hand edits (move / swap / pin / unpin) on a committed generation, and the pin overlay the scheduler keeps.
+
+The generation's overall_schedule CSV is indexed once into three occupancy maps:
+    section_at[(section, day, slot)]   teacher_at[(teacher id, day, slot)]   room_at[(room, day, slot)]
+each holding the CSV rows that occupy that cell (labs occupy both of their periods), so every check
+an edit needs is a few dict lookups however large the timetable is. Edits are applied in order and
+all-or-nothing to copies of the CSV rows and JSON; the caller commits the result as a new generation.
+
+Only theory/project periods can be moved or swapped: a lab is a block of batches, rooms and teachers
+that the scheduler places as a whole. A period is never moved to a slot its teacher is marked
+unavailable for in teacher_availability.csv.
+
+Accepted edits are recorded in pins.json next to the other scheduler inputs:
+    {"version": 1, "pins": [ {"section": "CSE-A", "day": "MON", "slot": "09:00-10:00", "code": "..."} ]}
+and the scheduler places pinned periods before anything else (TimeTable.apply_pins), so a regeneration
+keeps them.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+from timetable import BLOCKED, DAYS, TIME_SLOTS
+
+PINS_VERSION = 1
+THEORY = "Theory/Project"
+OPS = ("move", "swap", "pin", "unpin")
+SORT_KEY = ("Branch", "Section", "Day", "Time", "Batch")   # same order export_csvs writes
+
+
+# ---------- pins ----------
+def load_pins(path):
+    path = Path(path)
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8")).get("pins", [])
+
+
+def save_pins(path, pins):
+    """Write pins.json atomically (temp file + rename)."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps({"version": PINS_VERSION, "pins": pins}, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ---------- editor ----------
+def _section(row):
+    return f"{row.get('Branch', '')}-{row.get('Section', '')}"
+
+
+def _cells(row):
+    """(day, slot label) cells a CSV row occupies."""
+    if row.get("Time") not in TIME_SLOTS:
+        return []
+    start = TIME_SLOTS.index(row["Time"])
+    span = 2 if (row.get("Activity") or "").lower() == "lab" else 1
+    return [(row.get("Day"), TIME_SLOTS[i]) for i in range(start, min(start + span, len(TIME_SLOTS)))]
+
+
+class Editor:
+    def __init__(self, rows, data, pins=(), unavailable=None):
+        self.rows = rows
+        self.data = data
+        self.unavailable = unavailable or {}       # tid -> {(day, slot)}, see timetable.unavailable_cells
+        self.pins = {(p["section"], p["day"], p["slot"]): p for p in pins}
+        self.section_at, self.teacher_at, self.room_at = {}, {}, {}
+        self.changed = set()       # sections whose cells moved
+        for row in rows:
+            self._add(row)
+
+    # occupancy
+    def _keys(self, row):
+        section = _section(row)
+        for day, slot in _cells(row):
+            yield self.section_at, (section, day, slot)
+            if row.get("Teacher ID"):
+                yield self.teacher_at, (row["Teacher ID"], day, slot)
+            if row.get("Room"):
+                yield self.room_at, (row["Room"], day, slot)
+
+    def _add(self, row):
+        for index, key in self._keys(row):
+            index.setdefault(key, []).append(row)
+
+    def _remove(self, row):
+        for index, key in self._keys(row):
+            left = [r for r in index.get(key, []) if r is not row]
+            if left:
+                index[key] = left
+            else:
+                index.pop(key, None)
+
+    def conflicts(self, row, section, day, slot, ignore=()):
+        """What stops `row` from sitting at (day, slot); rows in `ignore` count as already moved away."""
+        skip = {id(r) for r in ignore}
+        found = []
+        if TIME_SLOTS.index(slot) in BLOCKED:
+            found.append({"kind": "blocked", "key": section, "day": day, "slot": slot})
+        if (day, slot) in self.unavailable.get(row.get("Teacher ID"), ()):
+            found.append({"kind": "unavailable", "key": row["Teacher ID"], "day": day, "slot": slot})
+        checks = [("section", self.section_at, (section, day, slot))]
+        if row.get("Teacher ID"):
+            checks.append(("teacher", self.teacher_at, (row["Teacher ID"], day, slot)))
+        if row.get("Room"):
+            checks.append(("room", self.room_at, (row["Room"], day, slot)))
+        for kind, index, key in checks:
+            for other in index.get(key, []):
+                if id(other) not in skip:
+                    found.append({"kind": kind, "key": key[0], "day": day, "slot": slot,
+                                  "with": {"section": _section(other), "code": other.get("Subject/Notes", ""),
+                                           "activity": other.get("Activity", "")}})
+        return found
+
+    # cells
+    def _check_cell(self, section, day, slot):
+        if section not in self.data:
+            raise ValueError(f"Unknown section {section}")
+        if day not in DAYS:
+            raise ValueError(f"Unknown day {day}")
+        if slot not in TIME_SLOTS:
+            raise ValueError(f"Unknown slot {slot}")
+
+    def theory_row(self, section, day, slot):
+        """The theory/project row at a cell, None if the cell is empty; labs are refused."""
+        self._check_cell(section, day, slot)
+        rows = self.section_at.get((section, day, slot), [])
+        if any(r.get("Activity") != THEORY for r in rows) or len(rows) > 1:
+            raise ValueError(f"{section} {day} {slot} is a lab period; labs can't be edited by hand")
+        return rows[0] if rows else None
+
+    def _json_row(self, section, day):
+        return next(r for r in self.data[section] if r.get("Day") == day)
+
+    def _place(self, row, day, slot):
+        row["Day"], row["Time"] = day, slot
+        self._add(row)
+
+    def _pin(self, row):
+        key = (_section(row), row["Day"], row["Time"])
+        self.pins[key] = {"section": key[0], "day": key[1], "slot": key[2], "code": row.get("Subject/Notes", "")}
+
+    # edits
+    def move(self, section, day, slot, to_day, to_slot):
+        if (day, slot) == (to_day, to_slot):
+            raise ValueError(f"Can't move {section} {day} {slot} onto itself")
+        row = self.theory_row(section, day, slot)
+        if row is None:
+            raise ValueError(f"Nothing is scheduled for {section} on {day} {slot}")
+        self._check_cell(section, to_day, to_slot)
+        found = self.conflicts(row, section, to_day, to_slot, ignore=[row])
+        if found:
+            return found
+        self._remove(row)
+        self.pins.pop((section, day, slot), None)
+        self._place(row, to_day, to_slot)
+        self._pin(row)
+        src, dst = self._json_row(section, day), self._json_row(section, to_day)
+        dst[to_slot], src[slot] = src.get(slot), None
+        self.changed.add(section)
+        return []
+
+    def swap(self, section, day, slot, to_day, to_slot):
+        if (day, slot) == (to_day, to_slot):
+            raise ValueError(f"Can't swap {section} {day} {slot} with itself")
+        a = self.theory_row(section, day, slot)
+        b = self.theory_row(section, to_day, to_slot)
+        if a is None or b is None:
+            if a is None and b is None:
+                raise ValueError(f"Both {day} {slot} and {to_day} {to_slot} are empty for {section}")
+            return self.move(section, day, slot, to_day, to_slot) if b is None else \
+                self.move(section, to_day, to_slot, day, slot)
+        found = self.conflicts(a, section, to_day, to_slot, ignore=[a, b]) + \
+            self.conflicts(b, section, day, slot, ignore=[a, b])
+        if found:
+            return found
+        self._remove(a)
+        self._remove(b)
+        self._place(a, to_day, to_slot)
+        self._place(b, day, slot)
+        self._pin(a)
+        self._pin(b)
+        src, dst = self._json_row(section, day), self._json_row(section, to_day)
+        src[slot], dst[to_slot] = dst.get(to_slot), src.get(slot)
+        self.changed.add(section)
+        return []
+
+    def pin(self, section, day, slot):
+        row = self.theory_row(section, day, slot)
+        if row is None:
+            raise ValueError(f"Nothing is scheduled for {section} on {day} {slot}")
+        self._pin(row)
+        return []
+
+    def unpin(self, section, day, slot):
+        self._check_cell(section, day, slot)
+        self.pins.pop((section, day, slot), None)
+        return []
+
+    def apply(self, edits):
+        """
+        Apply edit dicts ({"op", "section", "day", "slot", "to_day", "to_slot"}) in order.
+        Returns the conflicts of the first rejected edit (each tagged with its index), or [] if all fit.
+        Malformed edits raise ValueError.
+        """
+        for n, edit in enumerate(edits):
+            op = edit.get("op")
+            if op not in OPS:
+                raise ValueError(f"Edit {n}: unknown op {op!r} (expected one of {', '.join(OPS)})")
+            args = [edit.get("section"), edit.get("day"), edit.get("slot")]
+            if op in ("move", "swap"):
+                if not edit.get("to_day") or not edit.get("to_slot"):
+                    raise ValueError(f"Edit {n}: {op} needs to_day and to_slot")
+                args += [edit["to_day"], edit["to_slot"]]
+            try:
+                found = getattr(self, op)(*args)
+            except ValueError as e:
+                raise ValueError(f"Edit {n}: {e}")
+            if found:
+                return [{"edit": n, **c} for c in found]
+        return []
+
+    def sorted_rows(self):
+        return sorted(self.rows, key=lambda r: tuple(r.get(k, "") for k in SORT_KEY))
+
+    def pin_list(self):
+        return [self.pins[k] for k in sorted(self.pins)]
@@ -0,0 +1,208 @@
+# tenants.py
+"""
+Several institutions (tenants) served from one process.
+
+The default tenant is the backend folder itself, so a single-campus deployment keeps working
+unchanged. Every other tenant is a folder tenants/<name>/ (TIBL_TENANTS_DIR) holding that
+institution's own copy of everything the default tenant keeps next to main.py:
+
+    admin.json, teachers.csv                        user store
+    subjects.csv, subjects_with_teachers.csv,       scheduler inputs
+    pins.json, teacher_availability.csv, term.json
+    config.json                                     scheduler config (timetable.CONFIG_KEYS: branches,
+                                                    lab pools, batches, ...)
+    generated/, workspaces/                         generation catalog, per-job workspaces
+
+A tenant is added by creating its folder; it is picked up on its first request.
+
+Requests choose a tenant with a /t/<name>/ path prefix (stripped before routing, so every endpoint
+is available under it) or an X-Tenant header; TenantMiddleware activates it for the request. The
+tenant-specific paths in main.py are TenantPath objects that resolve against the active tenant, and
+per-tenant state (latest generation, history, locks, running jobs, SSE broker, input watcher) lives
+on the Tenant. The I/O and generation pools are shared; cached parsed files are scoped per tenant
+and bounded globally (see timetable_index.cached).
+"""
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import events
+import history
+import timetable_index
+
+DEFAULT_TENANT = "default"
+BASE_DIR = Path(__file__).resolve().parent
+TENANTS_DIR = Path(os.environ.get("TIBL_TENANTS_DIR", BASE_DIR / "tenants"))
+NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+PREFIX_RE = re.compile(r"^/t/([^/]+)(/.*)?$")
+
+
+class Tenant:
+    def __init__(self, name, base_dir):
+        self.name = name
+        self.base_dir = Path(base_dir)
+        self.generated_dir = self.base_dir / "generated"
+        self.workspaces_dir = self.base_dir / "workspaces"
+        self.generated_dir.mkdir(exist_ok=True)
+        self.workspaces_dir.mkdir(exist_ok=True)
+        self.history = history.History(self.generated_dir)
+        self.broker = events.broker if name == DEFAULT_TENANT else events.EventBroker()
+        self.latest_file = None      # set by commit_generation; the directory is only scanned when it's unknown
+        self.running_jobs = {}       # job id -> (workspace, start time)
+        self.commit_lock = threading.Lock()
+        self.users_lock = threading.Lock()     # serializes writes to teachers.csv
+        self.edit_lock = threading.Lock()      # one hand edit at a time
+        self.watcher = None
+        self.last_used = time.time()
+
+    def config(self):
+        """config.json of this tenant ({} when it has none), parsed once per file version."""
+        from timetable import CONFIG_FILE, load_config
+
+        path = self.base_dir / CONFIG_FILE
+        if not path.exists():
+            return {}
+        return timetable_index.cached("config", path, lambda p: load_config(str(p)))
+
+    def info(self):
+        return {"name": self.name, "latest": self.latest_file, "running_jobs": len(self.running_jobs),
+                "subscribers": self.broker.subscriber_count, "last_used": self.last_used}
+
+
+_tenants = {}
+_lock = threading.Lock()
+on_create = []           # fn(tenant), called once for each tenant when it is first loaded (see main.py)
+
+
+def get(name=DEFAULT_TENANT):
+    """The Tenant called `name`; KeyError if there is no such tenant."""
+    tenant = _tenants.get(name)
+    if tenant:
+        return tenant
+    if name == DEFAULT_TENANT:
+        base_dir = BASE_DIR
+    elif NAME_RE.match(name or "") and (TENANTS_DIR / name).is_dir():
+        base_dir = TENANTS_DIR / name
+    else:
+        raise KeyError(name)
+    with _lock:
+        created = name not in _tenants
+        if created:
+            _tenants[name] = Tenant(name, base_dir)
+        tenant = _tenants[name]
+    if created:
+        for hook in on_create:
+            run_as(tenant, hook, tenant)
+    return tenant
+
+
+def loaded():
+    return list(_tenants.values())
+
+
+def names():
+    found = sorted(p.name for p in TENANTS_DIR.iterdir() if p.is_dir() and NAME_RE.match(p.name)) \
+        if TENANTS_DIR.is_dir() else []
+    return [DEFAULT_TENANT] + [n for n in found if n != DEFAULT_TENANT]
+
+
+def all_tenants():
+    return [get(name) for name in names()]
+
+
+# ---------- the active tenant ----------
+current = contextvars.ContextVar("tibl_tenant", default=None)
+
+
+def active():
+    return current.get() or get(DEFAULT_TENANT)
+
+
+def activate(tenant):
+    """Make `tenant` active in the current context; returns tokens for deactivate()."""
+    tenant.last_used = time.time()
+    return current.set(tenant), timetable_index.cache_scope.set(tenant.name)
+
+
+def deactivate(tokens):
+    current.reset(tokens[0])
+    timetable_index.cache_scope.reset(tokens[1])
+
+
+def run_as(tenant, fn, *args, **kwargs):
+    """Call fn with `tenant` active (for threads that don't start from a request: watchers, startup)."""
+    def call():
+        activate(tenant)
+        return fn(*args, **kwargs)
+    return contextvars.copy_context().run(call)
+
+
+class TenantPath(os.PathLike):
+    """A path attribute of the active Tenant ("base_dir", ...) plus optional parts, resolved on every use."""
+
+    def __init__(self, attr, *parts):
+        self.attr = attr
+        self.parts = parts
+
+    def path(self):
+        return Path(getattr(active(), self.attr), *self.parts)
+
+    def __fspath__(self):
+        return str(self.path())
+
+    def __str__(self):
+        return str(self.path())
+
+    def __repr__(self):
+        return f"TenantPath({self.attr!r}, {', '.join(map(repr, self.parts))})"
+
+    def __truediv__(self, other):
+        return self.path() / other
+
+    def __eq__(self, other):
+        return self.path() == (other.path() if isinstance(other, TenantPath) else other)
+
+    def __hash__(self):
+        return hash((self.attr, self.parts))
+
+    def __getattr__(self, name):
+        return getattr(self.path(), name)
+
+
+# ---------- routing ----------
+class TenantMiddleware:
+    """ASGI middleware: pick the tenant from /t/<name>/... (stripping the prefix) or X-Tenant."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        name = None
+        m = PREFIX_RE.match(scope["path"])
+        if m:
+            name, path = m.group(1), m.group(2) or "/"
+            scope = {**scope, "path": path, "raw_path": path.encode()}
+        else:
+            headers = dict(scope.get("headers") or [])
+            name = headers.get(b"x-tenant", b"").decode() or None
+        try:
+            tenant = get(name or DEFAULT_TENANT)
+        except KeyError:
+            if scope["type"] != "http":
+                return
+            body = json.dumps({"detail": f"Unknown tenant {name}"}).encode()
+            await send({"type": "http.response.start", "status": 404,
+                        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        tokens = activate(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            deactivate(tokens)
@@ -0,0 +1,177 @@
+# term_calendar.py
+"""
+Date-aware layer over the weekly (DAYS x TIME_SLOTS) timetable.
+
+term.json (next to the other inputs; optional):
+    {"version": 1, "start": "2026-08-03", "end": "2026-11-27",
+     "holidays":    [{"date": "2026-10-02", "name": "..."}, {"from": "2026-10-19", "to": "2026-10-23", "name": "..."}],
+     "substitutes": [{"date": "2026-11-14", "follows": "FRI", "name": "..."}]}
+
+Every date in the term resolves to the weekday whose schedule runs on it: its own weekday, the
+weekday a substitute day follows, or nothing (weekend, holiday, outside the term; a holiday wins
+over a substitute). Without term.json (or TIBL_TERM_START / TIBL_TERM_END) there is no term to be
+outside of: every date follows its own weekday, and calendar_feeds.term_dates() only supplies the
+default range for the feeds and for queries that give no dates.
+
+Nothing is expanded up front: days() and sessions() are generators that walk the requested range a
+date at a time and look each one up in the per-week TimetableIndex, so a query for one week costs
+one week however long the term is.
+"""
+import json
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+from calendar_feeds import WEEKDAY, term_dates
+from timetable import DAYS
+import timetable_index
+
+TERM_FILE = "term.json"
+TERM_VERSION = 1
+WEEKDAY_NAMES = {i: d for d, i in WEEKDAY.items()}
+
+
+def _date(value, what):
+    try:
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{what}: invalid date {value!r}, expected YYYY-MM-DD")
+
+
+class TermCalendar:
+    def __init__(self, start=None, end=None, holidays=(), substitutes=()):
+        # a default term moves with the current week, so dates are only "outside term" for a real one
+        self.bounded = bool(start or end or os.environ.get("TIBL_TERM_START") or os.environ.get("TIBL_TERM_END"))
+        self.start, self.end = term_dates(start, end)
+        if self.end < self.start:
+            raise ValueError(f"Term ends ({self.end}) before it starts ({self.start})")
+        self.holidays = {}       # date -> name
+        for h in holidays:
+            first = _date(h.get("date") or h.get("from"), "holiday")
+            last = _date(h.get("to") or first, "holiday")
+            if last < first:
+                raise ValueError(f"Holiday {h.get('name', '')!r} ends before it starts")
+            d = first
+            while d <= last:
+                self.holidays[d] = h.get("name", "")
+                d += timedelta(days=1)
+        self.substitutes = {}    # date -> (weekday it follows, name)
+        for s in substitutes:
+            d = _date(s.get("date"), "substitute day")
+            follows = str(s.get("follows", "")).upper()[:3]
+            if follows not in DAYS:
+                raise ValueError(f"Substitute day {d}: follows must be one of {DAYS}")
+            self.substitutes[d] = (follows, s.get("name", ""))
+
+    @classmethod
+    def from_dict(cls, raw):
+        return cls(raw.get("start"), raw.get("end"), raw.get("holidays", []), raw.get("substitutes", []))
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        return cls.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+    def to_dict(self):
+        return {
+            "version": TERM_VERSION,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "holidays": [{"date": d.isoformat(), "name": n} for d, n in sorted(self.holidays.items())],
+            "substitutes": [{"date": d.isoformat(), "follows": f, "name": n} for d, (f, n) in sorted(self.substitutes.items())],
+        }
+
+    def save(self, path):
+        """Write term.json atomically (temp file + rename)."""
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+    # ---------- dates ----------
+    def resolve(self, d):
+        """{"date", "weekday", "follows", "note"}: follows is the DAYS weekday whose schedule runs on d, or None."""
+        d = _date(d, "date")
+        weekday = WEEKDAY_NAMES[d.weekday()]
+        info = {"date": d.isoformat(), "weekday": weekday, "follows": None, "note": None}
+        if self.bounded and not self.start <= d <= self.end:
+            info["note"] = "outside term"
+        elif d in self.holidays:
+            info["note"] = f"holiday: {self.holidays[d]}" if self.holidays[d] else "holiday"
+        elif d in self.substitutes:
+            follows, name = self.substitutes[d]
+            info["follows"] = follows
+            info["note"] = f"follows {follows}" + (f": {name}" if name else "")
+        elif weekday in DAYS:
+            info["follows"] = weekday
+        else:
+            info["note"] = "weekend"
+        return info
+
+    def days(self, start=None, end=None):
+        """Lazily resolve every date in [start, end] (clamped to the term if there is one)."""
+        d = _date(start, "start") if start else self.start
+        end = _date(end, "end") if end else self.end
+        if self.bounded:
+            d, end = max(d, self.start), min(end, self.end)
+        while d <= end:
+            yield self.resolve(d)
+            d += timedelta(days=1)
+
+    def teaching_days(self, start=None, end=None):
+        return (info for info in self.days(start, end) if info["follows"])
+
+    def moved_dates(self):
+        """{date: weekday followed} for dates whose schedule differs from their own weekday's (ICS RDATE/EXDATE)."""
+        moved = {}
+        for d in self.holidays:
+            if self.start <= d <= self.end and WEEKDAY_NAMES[d.weekday()] in DAYS:
+                moved[d] = None
+        for d, (follows, _) in self.substitutes.items():
+            if self.start <= d <= self.end and d not in self.holidays and follows != WEEKDAY_NAMES[d.weekday()]:
+                moved[d] = follows
+        return moved
+
+    # ---------- sessions ----------
+    def sessions(self, index, start=None, end=None, section=None, teacher=None):
+        """
+        Lazily yield one dict per class held between start and end, from the weekly TimetableIndex:
+        {"date", "weekday", "follows", "slot", "section", "code", "teacher_id", "teacher_name"}.
+        Filtered to one section and/or teacher; per-weekday lists are built on first use only.
+        """
+        by_day = {}
+
+        def weekly(day):
+            if day not in by_day:
+                rows = []
+                if teacher:
+                    rows = [{"slot": slot, "section": sec, "code": code, "teacher_id": teacher,
+                             "teacher_name": index.teacher_names.get(teacher, "")}
+                            for d, slot, sec, code in index.teacher_slots.get(teacher, []) if d == day and sec == (section or sec)]
+                for sec, grid in ({} if teacher else index.sections).items():
+                    if section and sec != section:
+                        continue
+                    for slot, content in grid.get(day, {}).items():
+                        # a lab's second period is empty in the JSON; the index knows which lab runs on
+                        content = content or index.continued.get((sec, day, slot))
+                        for code, tid, tname in timetable_index.parse_cell(content):
+                            rows.append({"slot": slot, "section": sec, "code": code, "teacher_id": tid, "teacher_name": tname})
+                order = {s: i for i, s in enumerate(index.slots)}
+                rows.sort(key=lambda r: (order.get(r["slot"], 0), r["section"]))
+                by_day[day] = rows
+            return by_day[day]
+
+        for info in self.teaching_days(start, end):
+            for row in weekly(info["follows"]):
+                yield {"date": info["date"], "weekday": info["weekday"], "follows": info["follows"], **row}
+
+
+def load_term(path):
+    """TermCalendar for term.json at `path`, parsed once per file version (default term if it's missing)."""
+    path = Path(path)
+    if not path.exists():
+        return TermCalendar()
+    return timetable_index.cached("term", path, TermCalendar.load)
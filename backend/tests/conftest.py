@@ -0,0 +1,53 @@
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+# the backend modules are flat files next to main.py
+sys.path.insert(0, str(BACKEND))
+# API tests run as throwaway tenants (see tenants.py), never against the backend folder's own data
+TENANTS_DIR = Path(tempfile.mkdtemp(prefix="tibl_tests_"))
+os.environ["TIBL_TENANTS_DIR"] = str(TENANTS_DIR)
+INPUTS = ("admin.json", "teachers.csv", "subjects.csv", "subjects_with_teachers.csv")
+
+
+@pytest.fixture
+def tenant():
+    """(TestClient, "/t/<name>") for a fresh tenant holding a copy of the sample inputs."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    folder = TENANTS_DIR / name
+    folder.mkdir()
+    for input_file in INPUTS:
+        shutil.copyfile(BACKEND / input_file, folder / input_file)
+    # no lifespan: it would load the default tenant, i.e. the backend folder
+    yield TestClient(main.app), f"/t/{name}"
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+@pytest.fixture
+def generation(tenant):
+    """(TestClient, "/t/<name>", "timetable_<ts>") after one full /generate of the sample inputs."""
+    client, prefix = tenant
+    result = client.post(f"{prefix}/generate", headers=login(client, prefix)).json()
+    assert result["status"] == "complete", result
+    yield client, prefix, result["json_filename"][:-5]
+
+
+def login(client, prefix, email="admin@tibl.ai", password="password123"):
+    """Authorization header for a user of the sample inputs (the admin by default)."""
+    response = client.post(f"{prefix}/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TENANTS_DIR, ignore_errors=True)
@@ -0,0 +1,24 @@
+SLOT = "09:00-10:00"
+
+
+def test_batch_matches_the_single_endpoints(generation):
+    client, prefix, stem = generation
+    full = client.get(f"{prefix}/json/{stem}.json").json()
+    body = {"teacher_ids": ["TCHR_003", "TCHR_004", "TCHR_003"], "sections": ["CSE-A", "NO-SUCH"], "fields": [SLOT]}
+    batch = client.post(f"{prefix}/timetable/batch", json=body).json()
+
+    assert list(batch["teachers"]) == ["TCHR_003", "TCHR_004"]
+    for tid, rows in batch["teachers"].items():
+        assert rows == client.get(f"{prefix}/timetable/teacher/{tid}").json()["My Schedule"]
+    assert any(len(row) > 1 for row in batch["teachers"]["TCHR_003"])
+    assert batch["sections"] == {"CSE-A": [{"Day": row["Day"], SLOT: row[SLOT]} for row in full["CSE-A"]]}
+
+
+def test_json_projection(generation):
+    client, prefix, stem = generation
+    full = client.get(f"{prefix}/json/{stem}.json").json()
+    projected = client.get(f"{prefix}/json/{stem}.json", params={"sections": "CSE-B,ISE-D", "fields": f"{SLOT},14:00-15:00"}).json()
+    assert list(projected) == ["CSE-B", "ISE-D"]
+    for name, rows in projected.items():
+        assert rows == [{k: v for k, v in row.items() if k in ("Day", SLOT, "14:00-15:00")} for row in full[name]]
+    assert client.get(f"{prefix}/json/{stem}.json", params={"sections": "CSE-B"}).json() == {"CSE-B": full["CSE-B"]}
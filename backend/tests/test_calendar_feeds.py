@@ -0,0 +1,32 @@
+import pytest
+
+import main
+from conftest import login
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc123"', True),
+    ('W/"abc123"', True),
+    ('"zzz", W/"abc123" , "yyy"', True),
+    ("*", True),
+    ('"abc1234"', False),          # a longer tag containing ours
+    ('"xabc123x"', False),
+    ("abc123", False),             # unquoted
+    ('"ab", "c123"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_matches(header, matches):
+    assert main.etag_matches(header, "abc123") is matches
+
+
+def test_feed_is_revalidated_with_its_etag(tenant):
+    client, prefix = tenant
+    assert client.post(f"{prefix}/generate", headers=login(client, prefix)).json()["status"] == "complete"
+    feed = client.get(f"{prefix}/calendar/teacher/TCHR_003.ics")
+    assert feed.status_code == 200 and feed.text.startswith("BEGIN:VCALENDAR")
+    etag = feed.headers["etag"]
+
+    assert client.get(f"{prefix}/calendar/teacher/TCHR_003.ics", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    longer = etag[:-1] + '0"'
+    assert client.get(f"{prefix}/calendar/teacher/TCHR_003.ics", headers={"If-None-Match": longer}).status_code == 200
@@ -0,0 +1,56 @@
+import gzip
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import columnar_export
+
+SCHEDULE = ("Day,Branch,Section,Batch,Time,Activity,Room,Subject/Notes,Teacher ID,Teacher Name\n"
+            "TUE,CSE,A,A1,15:00-16:00,Lab,CSE_Lab1,CSE_CN_LAB,TCHR_002,Amit Gupta\n"
+            "MON,CSE,B,B1 & B2,09:00-10:00,Theory/Project,B-Classroom,CSE_DBMS,TCHR_003,Karan Das\n"
+            "MON,CSE,A,A1 & A2,11:00-11:20,Break,,Short Break,,\n")
+
+
+def test_csv_round_trip_keeps_the_types(tmp_path):
+    csv_path = tmp_path / "timetable_1.csv"
+    csv_path.write_text(SCHEDULE, encoding="utf-8")
+    frame = columnar_export.schedule_frame(csv_path)
+    assert list(frame["Slot"]) == [7, 0, 2] and list(frame["Periods"]) == [2, 1, 1]
+    assert frame["Day"].cat.ordered and frame.sort_values("Day")["Day"].iloc[0] == "MON"
+
+    path = columnar_export.export_schedule(csv_path, tmp_path / "columnar", "timetable_1", fmt="csv.gz")
+    assert path.name == "timetable_1.csv.gz" and columnar_export.find_columnar(path.parent, "timetable_1") == path
+    back = columnar_export.read_columnar(path)
+    pd.testing.assert_frame_equal(back, frame)
+
+    schema = json.loads((path.parent / "timetable_1.schema.json").read_text(encoding="utf-8"))
+    assert schema["rows"] == 3 and schema["columns"]["Slot"] == "int8"
+    assert schema["categories"]["Teacher ID"] == ["", "TCHR_002", "TCHR_003"]
+
+
+def test_unknown_schema_version_is_rejected(tmp_path):
+    csv_path = tmp_path / "timetable_1.csv"
+    csv_path.write_text(SCHEDULE, encoding="utf-8")
+    path = columnar_export.export_schedule(csv_path, tmp_path, "timetable_1", fmt="csv.gz")
+    schema_path = tmp_path / "timetable_1.schema.json"
+    schema_path.write_text(json.dumps({**json.loads(schema_path.read_text()), "schema_version": 99}))
+    with pytest.raises(ValueError, match="schema version 99"):
+        columnar_export.read_columnar(path)
+    with pytest.raises(ValueError):
+        columnar_export.export_schedule(csv_path, tmp_path, "timetable_1", fmt="xls")
+
+
+def test_columnar_endpoint_matches_the_csv(generation):
+    client, prefix, stem = generation
+    schema = client.get(f"{prefix}/columnar/{stem}.json", params={"schema": True}).json()
+    assert schema["schema_version"] == columnar_export.SCHEMA_VERSION
+    response = client.get(f"{prefix}/columnar/{stem}.csv")
+    assert response.status_code == 200
+    if schema["format"] == "csv.gz":
+        rows = pd.read_csv(io.BytesIO(gzip.decompress(response.content)), dtype=str, keep_default_na=False)
+        csv_rows = pd.read_csv(io.StringIO(client.get(f"{prefix}/download/{stem}.csv").text), dtype=str,
+                               keep_default_na=False)
+        assert len(rows) == len(csv_rows) == schema["rows"]
+        assert list(rows["Subject"]) == list(csv_rows["Subject/Notes"])
@@ -0,0 +1,47 @@
+import compact_grid
+
+DATA = {
+    "CSE-A": [
+        {"Day": "MON", "09:00-10:00": "CSE_SE — Sourav Sharma (TCHR_001)", "10:00-11:00": None},
+        {"Day": "TUE", "09:00-10:00": "CSE_CN_LAB — Amit Gupta (TCHR_002)\nCSE_DBMS_LAB — (no teacher)",
+         "10:00-11:00": "Library"},
+    ],
+    "CSE-B": [
+        {"Day": "MON", "09:00-10:00": "CSE_SE — Sourav Sharma (TCHR_001)", "10:00-11:00": "A — B — C"},
+        {"Day": "TUE", "09:00-10:00": None, "10:00-11:00": None},
+    ],
+}
+ROOMS = {("CSE-A", "TUE", "09:00-10:00", "CSE_CN_LAB"): "CSE_Lab1"}
+
+
+def test_round_trip_is_exact(tmp_path):
+    path = compact_grid.write_grid(DATA, tmp_path / "timetable_1.ttg", ROOMS)
+    grid = compact_grid.load_grid(path)
+    assert grid.to_data() == DATA
+    assert grid.to_data(["CSE-B", "CSE-Z"]) == {"CSE-B": DATA["CSE-B"]}
+    # the repeated cell and teacher are stored once
+    assert grid.cell_id("CSE-A", "MON", "09:00-10:00") == grid.cell_id("CSE-B", "MON", "09:00-10:00")
+    assert grid.teachers.count("Sourav Sharma (TCHR_001)") == 1
+    assert grid.cell_id("CSE-B", "TUE", "10:00-11:00") == -1
+    assert grid.cell_rooms(grid.cell_id("CSE-A", "TUE", "09:00-10:00")) == ["CSE_Lab1"]
+
+
+def test_rooms_from_schedule_csv_cover_both_lab_periods(tmp_path):
+    csv_path = tmp_path / "timetable_1.csv"
+    csv_path.write_text(
+        "Day,Branch,Section,Batch,Time,Activity,Room,Subject/Notes\n"
+        "TUE,CSE,A,A1,09:00-10:00,Lab,CSE_Lab1,CSE_CN_LAB\n"
+        "MON,CSE,A,A1 & A2,09:00-10:00,Theory/Project,A-Classroom,CSE_SE\n", encoding="utf-8")
+    rooms = compact_grid.rooms_from_schedule_csv(csv_path)
+    assert rooms[("CSE-A", "TUE", "10:00-11:00", "CSE_CN_LAB")] == "CSE_Lab1"
+    assert rooms[("CSE-A", "MON", "09:00-10:00", "CSE_SE")] == "A-Classroom"
+    assert ("CSE-A", "MON", "10:00-11:00", "CSE_SE") not in rooms
+
+
+def test_grid_endpoint_expands_to_the_json(generation):
+    client, prefix, stem = generation
+    data = client.get(f"{prefix}/json/{stem}.json").json()
+    raw = client.get(f"{prefix}/grid/{stem}.json")
+    assert raw.status_code == 200 and raw.content[:4] == compact_grid.MAGIC
+    assert len(raw.content) < len(client.get(f"{prefix}/json/{stem}.json").content)
+    assert client.get(f"{prefix}/grid/{stem}.json", params={"expand": True}).json() == data
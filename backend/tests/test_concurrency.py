@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import httpx
+
+import main
+from conftest import login
+
+READ_P99_LIMIT = 0.25         # seconds; a read served from the cached index takes a few ms
+
+
+async def _read_latencies(client, prefix, generating):
+    latencies = []
+    while not generating.done():
+        started = time.perf_counter()
+        response = await client.get(f"{prefix}/timetable/teacher/TCHR_003")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def _measure(prefix, headers):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=300, headers=headers) as client:
+        first = await client.post(f"{prefix}/generate")
+        assert first.json()["status"] == "complete"
+        generating = asyncio.ensure_future(client.post(f"{prefix}/generate"))
+        latencies = await _read_latencies(client, prefix, generating)
+        assert (await generating).json()["status"] == "complete"
+    return latencies
+
+
+def test_reads_stay_fast_during_generation(tenant):
+    client, prefix = tenant
+    latencies = sorted(asyncio.run(_measure(prefix, login(client, prefix))))
+    assert len(latencies) >= 20
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{len(latencies)} reads during generation, p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {p99 * 1000:.1f} ms")
+    assert p99 < READ_P99_LIMIT
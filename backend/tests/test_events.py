@@ -0,0 +1,50 @@
+import asyncio
+
+import events
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_last_event_id_replays_only_missed_events():
+    async def run():
+        broker = events.EventBroker(replay_size=3)
+        ids = [broker.publish("user", {"id": n}) for n in range(4)]
+        assert ids == [1, 2, 3, 4]
+        fresh = broker.subscribe()
+        resumed = broker.subscribe(last_event_id=2)
+        evicted = broker.subscribe(last_event_id=0)     # event 1 fell out of the replay buffer
+        assert drain(fresh) == []
+        assert drain(resumed) == [(3, "user", {"id": 2}), (4, "user", {"id": 3})]
+        assert [e[0] for e in drain(evicted)] == [2, 3, 4]
+
+        broker.publish("generation", {"id": "timetable_1"})
+        await asyncio.sleep(0)
+        assert drain(fresh) == [(5, "generation", {"id": "timetable_1"})]
+    asyncio.run(run())
+
+
+def test_replay_is_capped_by_the_queue_size():
+    async def run():
+        broker = events.EventBroker(queue_size=2)
+        for n in range(5):
+            broker.publish("user", {"id": n})
+        assert [e[0] for e in drain(broker.subscribe(last_event_id=0))] == [1, 2]
+    asyncio.run(run())
+
+
+def test_stream_formats_events_and_unsubscribes():
+    async def run():
+        broker = events.EventBroker()
+        broker.publish("user", {"action": "deleted", "id": "TCHR_001"})
+        queue = broker.subscribe(last_event_id=0)
+        queue.put_nowait(None)
+        chunks = [chunk async for chunk in events.stream(queue, broker, heartbeat=1)]
+        assert chunks == ["retry: 3000\n\n",
+                          'id: 1\nevent: user\ndata: {"action": "deleted", "id": "TCHR_001"}\n\n']
+        assert broker.subscriber_count == 0
+    asyncio.run(run())
@@ -0,0 +1,75 @@
+import pytest
+
+import free_finder
+from timetable import TIME_SLOTS
+
+POOLS = {"CSE": ["CSE_Lab1", "CSE_Lab2"]}
+
+
+def _row(day, slot, section="CSE-A", teacher="", room="", lab=False):
+    branch, sec = section.split("-")
+    return {"Day": day, "Time": TIME_SLOTS[slot], "Branch": branch, "Section": sec, "Teacher ID": teacher,
+            "Room": room, "Activity": "Lab" if lab else "Theory/Project"}
+
+
+ROWS = [
+    # CSE-A is busy all Monday except the last period
+    *(_row("MON", s) for s in (0, 1, 3, 4, 6, 7)),
+    _row("TUE", 1, section="CSE-B", teacher="TCHR_001"),
+    _row("TUE", 3, section="CSE-B", room="CSE_Lab1", lab=True),
+    _row("TUE", 3, section="CSE-C", room="CSE_Lab2"),
+]
+
+
+def _starts(found):
+    return [(f["day"], f["slot"]) for f in found]
+
+
+def test_runs_never_cross_a_day_boundary():
+    index = free_finder.FreeIndex(ROWS, POOLS)
+    # MON 16:00 and TUE 09:00 are adjacent bits, but not consecutive periods
+    assert next(index.common_slots([("section", "CSE-A")], length=2)) == \
+        {"day": "TUE", "slot": "09:00-10:00", "slots": ["09:00-10:00", "10:00-11:00"], "rooms": []}
+    assert _starts(index.common_slots([("section", "CSE-A")], day="MON")) == [("MON", TIME_SLOTS[8])]
+    assert list(index.common_slots([("section", "CSE-A")], length=2, day="MON")) == []
+    # nor does a run cross a break or lunch
+    assert ("TUE", TIME_SLOTS[1]) not in _starts(index.common_slots([("section", "CSE-A")], length=2))
+
+
+def test_common_slots_for_several_resources_and_a_room_pool():
+    index = free_finder.FreeIndex(ROWS, POOLS)
+    resources = [("section", "CSE-A"), ("teacher", "TCHR_001")]
+    assert _starts(index.common_slots(resources, length=2, day="TUE")) == \
+        [("TUE", TIME_SLOTS[3]), ("TUE", TIME_SLOTS[6]), ("TUE", TIME_SLOTS[7])]
+    # the lab holds CSE_Lab1 for 11:20-13:20; CSE_Lab2 is taken at 11:20
+    with_room = list(index.common_slots(resources, length=2, day="TUE", pool="CSE"))
+    assert _starts(with_room) == [("TUE", TIME_SLOTS[6]), ("TUE", TIME_SLOTS[7])]
+    assert with_room[0]["rooms"] == ["CSE_Lab1", "CSE_Lab2"]
+    # unavailability widens a teacher's mask
+    unavailable = free_finder.unavailability_masks({"TCHR_001": {"unavailable": [("TUE", 6)]}})
+    assert _starts(index.common_slots(resources, length=2, day="TUE", unavailable=unavailable)) == \
+        [("TUE", TIME_SLOTS[3]), ("TUE", TIME_SLOTS[7])]
+    with pytest.raises(KeyError):
+        next(index.common_slots([("teacher", "TCHR_999")]))
+
+
+def test_free_at():
+    index = free_finder.FreeIndex(ROWS, POOLS)
+    assert index.free_at("room", "TUE", 4) == ["CSE_Lab2"]
+    assert index.free_at("room", "TUE", 2) == []             # short break
+    assert index.free_at("section", "MON", free_finder.slot_index("16:00")) == ["CSE-A", "CSE-B", "CSE-C"]
+    with pytest.raises(ValueError):
+        free_finder.slot_index("08:00")
+
+
+def test_free_slots_endpoint_agrees_with_free_resources(generation):
+    client, prefix, _ = generation
+    body = client.get(f"{prefix}/free/slots", params={"sections": "CSE-A", "pool": "CSE", "limit": 5}).json()
+    assert body["slots"] and body["first"] == body["slots"][0]
+    for found in body["slots"]:
+        rooms = client.get(f"{prefix}/free/resources", params={"day": found["day"], "slot": found["slot"], "pool": "CSE"})
+        assert found["rooms"] == rooms.json()["free"]
+        sections = client.get(f"{prefix}/free/resources", params={"day": found["day"], "slot": found["slot"], "kind": "section"})
+        assert "CSE-A" in sections.json()["free"]
+    assert client.get(f"{prefix}/free/slots", params={"sections": "NOPE-Z"}).status_code == 404
+    assert client.get(f"{prefix}/free/resources", params={"day": "MON", "slot": "09:00", "kind": "desk"}).status_code == 400
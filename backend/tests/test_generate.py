@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import login
+
+
+@pytest.mark.parametrize("params", [{"budget": 0}, {"budget": -5}, {"max_steps": 0}, {"max_steps": -1}])
+def test_non_positive_bounds_are_rejected(tenant, params):
+    client, prefix = tenant
+    response = client.post(f"{prefix}/generate", params=params, headers=login(client, prefix))
+    assert response.status_code == 400
+    assert client.get(f"{prefix}/generate/jobs").json() == {"jobs": []}
+
+
+def test_step_budget_stops_early_with_a_partial_result(tenant):
+    client, prefix = tenant
+    result = client.post(f"{prefix}/generate", params={"max_steps": 1}, headers=login(client, prefix)).json()
+    assert result["status"] == "partial" and result["reason"] == "steps"
+    assert client.get(f"{prefix}{result['partial_url']}").status_code == 200
+
+
+def test_resume_from_a_missing_checkpoint_is_a_404(tenant):
+    client, prefix = tenant
+    response = client.post(f"{prefix}/generate", params={"resume": "job_missing"}, headers=login(client, prefix))
+    assert response.status_code == 404
+    assert client.get(f"{prefix}/generate/partial/job_missing").status_code == 404
+
+
+def test_generation_errors_are_logged(tenant, monkeypatch, caplog):
+    import main
+
+    async def broken(*args):
+        raise RuntimeError("scheduler exploded")
+
+    monkeypatch.setattr(main, "run_cpu", broken)
+    client, prefix = tenant
+    with caplog.at_level("ERROR", logger="tibl"):
+        response = client.post(f"{prefix}/generate", headers=login(client, prefix))
+    assert response.status_code == 500
+    assert any(r.exc_info and str(r.exc_info[1]) == "scheduler exploded" for r in caplog.records)
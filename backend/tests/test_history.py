@@ -0,0 +1,55 @@
+import json
+import os
+import time
+
+import history
+
+SLOTS = ["09:00-10:00", "10:00-11:00", "11:20-12:20"]
+
+
+def write_generation(folder, ts, n):
+    """timetable_<ts>.csv/.json differing from generation n - 1 in one cell; returns their bytes."""
+    rows = [{"Day": day, **{slot: f"SUBJ_{(i + j + (n if (i, j) == (1, 2) else 0)) % 7}" for j, slot in enumerate(SLOTS)}}
+            for i, day in enumerate(["MON", "TUE", "WED", "THU", "FRI"])]
+    data = {"CSE-A": rows, "CSE-B": [dict(r) for r in rows]}
+    csv_text = "Day,Section,Subject\r\n" + "".join(f"{r['Day']},A,{r['09:00-10:00']}\r\n" for r in rows) + f"FRI,B,N{n}\r\n"
+    files = {f"timetable_{ts}.csv": csv_text.encode(), f"timetable_{ts}.json": json.dumps(data).encode()}
+    for name, content in files.items():
+        (folder / name).write_bytes(content)
+        os.utime(folder / name, (ts, ts))
+    return files
+
+
+def test_prune_keeps_newest_and_older_files_and_rebuilds_exactly(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "SNAPSHOT_EVERY", 3)
+    store = history.History(tmp_path)
+    old = write_generation(tmp_path, 1000, 0)             # in generated/ before the store existed
+    since = store.start()
+    stems, written = [], {**old}
+    for n in range(1, 7):
+        ts = since + n
+        written.update(write_generation(tmp_path, ts, n))
+        stems.append(f"timetable_{ts}")
+        store.backfill(skip={stems[-1]})                  # what maintain_history does after each commit
+
+    removed = store.prune(keep=2, protect={stems[-1]})
+    assert removed == stems[:4]
+    assert {p.name for p in tmp_path.glob("timetable_*")} == {*old, *(f"{s}.{e}" for s in stems[4:] for e in ("csv", "json"))}
+    assert store.stats()["deltas"] > 0
+
+    fresh = history.History(tmp_path)                     # rebuilds from disk, not from the in-memory cache
+    for stem in ["timetable_1000"] + stems[:4]:
+        for ext in ("csv", "json"):
+            name = f"{stem}.{ext}"
+            assert fresh.materialize(name)
+            assert (tmp_path / name).read_bytes() == written[name]
+            assert (tmp_path / name).stat().st_mtime == history._timestamp(stem)
+
+
+def test_prune_does_nothing_before_start(tmp_path):
+    store = history.History(tmp_path)
+    for n, ts in enumerate(range(int(time.time()) - 20, int(time.time()) - 5)):
+        write_generation(tmp_path, ts, n)
+    assert store.backfill() == 15
+    assert store.prune(keep=1) == []
+    assert len(list(tmp_path.glob("timetable_*"))) == 30
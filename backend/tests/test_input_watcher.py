@@ -0,0 +1,70 @@
+import shutil
+import threading
+
+import input_watcher
+from conftest import BACKEND
+
+FILES = ("teachers.csv", "subjects.csv", "subjects_with_teachers.csv")
+
+
+def _inputs(tmp_path):
+    for name in FILES:
+        shutil.copyfile(BACKEND / name, tmp_path / name)
+    return input_watcher.read_inputs(tmp_path)
+
+
+def _edit(path, old, new):
+    path.write_text(path.read_text(encoding="utf-8").replace(old, new, 1), encoding="utf-8")
+
+
+def test_renames_and_unassigned_teachers_are_cosmetic(tmp_path):
+    before = _inputs(tmp_path)
+    _edit(tmp_path / "teachers.csv", "Karan Das,", "Karan Dasgupta,")
+    with open(tmp_path / "teachers.csv", "a", encoding="utf-8") as f:
+        f.write("TCHR_900,New Teacher,new@tibl.ai,pw\n")
+    kind, details = input_watcher.classify(before, input_watcher.read_inputs(tmp_path))
+    assert kind == "cosmetic"
+    assert details["renamed"] == {"TCHR_003": ("Karan Das", "Karan Dasgupta")}
+    assert details["added"] == ["TCHR_900"] and details["reasons"] == []
+
+
+def test_subject_and_assignment_changes_are_structural(tmp_path):
+    before = _inputs(tmp_path)
+    assert input_watcher.classify(before, input_watcher.read_inputs(tmp_path))[0] == "none"
+    _edit(tmp_path / "subjects.csv", "Computer Networks,3", "Computer Networks,4")
+    (tmp_path / "teacher_availability.csv").write_text("teacher_id,day,slot\nTCHR_001,MON,09:00-10:00\n", encoding="utf-8")
+    kind, details = input_watcher.classify(before, input_watcher.read_inputs(tmp_path))
+    assert kind == "structural"
+    assert details["reasons"] == ["subjects.csv changed", "teacher_availability.csv changed"]
+
+
+def test_removing_an_assigned_teacher_is_structural(tmp_path):
+    before = _inputs(tmp_path)
+    tid = dict(before["assignments"][0])["teacher_id"]
+    lines = (tmp_path / "teachers.csv").read_text(encoding="utf-8").splitlines(keepends=True)
+    (tmp_path / "teachers.csv").write_text("".join(l for l in lines if not l.startswith(f"{tid},")), encoding="utf-8")
+    kind, details = input_watcher.classify(before, input_watcher.read_inputs(tmp_path))
+    assert kind == "structural" and details["removed"] == [tid]
+
+
+def test_watcher_debounces_a_burst_into_one_callback(tmp_path):
+    _inputs(tmp_path)
+    calls, done = [], threading.Event()
+
+    def on_change(kind):
+        def callback(details):
+            calls.append((kind, details))
+            done.set()
+        return callback
+
+    watcher = input_watcher.InputWatcher(tmp_path, on_change("cosmetic"), on_change("structural"), poll=0.01, debounce=0.2)
+    watcher.start()
+    try:
+        _edit(tmp_path / "teachers.csv", "Karan Das,", "Karan D,")
+        _edit(tmp_path / "teachers.csv", "Karan D,", "Karan Dasgupta,")
+        assert done.wait(5)
+    finally:
+        watcher.stop()
+    assert [kind for kind, _ in calls] == ["cosmetic"]
+    assert calls[0][1]["renamed"] == {"TCHR_003": ("Karan Das", "Karan Dasgupta")}
+    assert watcher.status["last_action"] == "metadata refresh" and not watcher.status["running"]
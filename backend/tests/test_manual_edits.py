@@ -0,0 +1,35 @@
+import pytest
+
+import manual_edits
+
+SLOT = "09:00-10:00"
+ROWS = [{"Day": "MON", "Branch": "CSE", "Section": "A", "Batch": "A1 & A2", "Time": SLOT,
+         "Activity": "Theory/Project", "Room": "A-Classroom", "Subject/Notes": "CSE_SE",
+         "Teacher Name": "Sourav Sharma", "Teacher ID": "TCHR_001"}]
+DATA = {"CSE-A": [{"Day": "MON", SLOT: "CSE_SE — Sourav Sharma (TCHR_001)", "10:00-11:00": None}]}
+
+
+@pytest.mark.parametrize("op", ["move", "swap"])
+def test_edit_onto_the_same_cell_is_rejected(op):
+    editor = manual_edits.Editor([dict(r) for r in ROWS], {"CSE-A": [dict(DATA["CSE-A"][0])]})
+    edit = {"op": op, "section": "CSE-A", "day": "MON", "slot": SLOT, "to_day": "MON", "to_slot": SLOT}
+    with pytest.raises(ValueError):
+        editor.apply([edit])
+    assert editor.data["CSE-A"][0][SLOT] == "CSE_SE — Sourav Sharma (TCHR_001)"
+    assert not editor.changed and not editor.pin_list()
+
+
+def test_move_to_a_free_cell():
+    editor = manual_edits.Editor([dict(r) for r in ROWS], {"CSE-A": [dict(DATA["CSE-A"][0])]})
+    edit = {"op": "move", "section": "CSE-A", "day": "MON", "slot": SLOT, "to_day": "MON", "to_slot": "10:00-11:00"}
+    assert editor.apply([edit]) == []
+    assert editor.data["CSE-A"][0][SLOT] is None
+    assert editor.data["CSE-A"][0]["10:00-11:00"].startswith("CSE_SE")
+
+
+def test_move_onto_an_unavailable_slot_is_a_conflict():
+    unavailable = {"TCHR_001": {("MON", "10:00-11:00")}}
+    editor = manual_edits.Editor([dict(r) for r in ROWS], {"CSE-A": [dict(DATA["CSE-A"][0])]}, unavailable=unavailable)
+    edit = {"op": "move", "section": "CSE-A", "day": "MON", "slot": SLOT, "to_day": "MON", "to_slot": "10:00-11:00"}
+    assert [c["kind"] for c in editor.apply([edit])] == ["unavailable"]
+    assert editor.data["CSE-A"][0][SLOT].startswith("CSE_SE") and not editor.changed
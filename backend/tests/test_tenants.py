@@ -0,0 +1,72 @@
+import asyncio
+import shutil
+import uuid
+
+import pytest
+
+import tenants
+from conftest import BACKEND, INPUTS, TENANTS_DIR, login
+
+
+@pytest.fixture
+def other_tenant():
+    """Name of a second tenant with the sample inputs, next to the `tenant` fixture's."""
+    name = f"other-{uuid.uuid4().hex[:8]}"
+    (TENANTS_DIR / name).mkdir()
+    for input_file in INPUTS:
+        shutil.copyfile(BACKEND / input_file, TENANTS_DIR / name / input_file)
+    yield name
+    shutil.rmtree(TENANTS_DIR / name, ignore_errors=True)
+
+
+def test_tenants_keep_their_own_data(tenant, other_tenant):
+    client, prefix = tenant
+    other = f"/t/{other_tenant}"
+    created = client.post(f"{prefix}/users", headers=login(client, prefix),
+                          json={"id": "TCHR_900", "name": "New Teacher", "email": "new@tibl.ai", "password": "pw"})
+    assert created.status_code == 200
+    assert "TCHR_900" in {u["id"] for u in client.get(f"{prefix}/users").json()}
+    assert "TCHR_900" not in {u["id"] for u in client.get(f"{other}/users").json()}
+
+    assert client.post(f"{prefix}/generate", headers=login(client, prefix)).json()["status"] == "complete"
+    assert client.get(f"{prefix}/latest").status_code == 200
+    assert client.get(f"{other}/latest").status_code == 404
+
+    async def replayed(name):
+        broker = tenants.get(name).broker
+        queue = broker.subscribe(last_event_id=0)
+        broker.unsubscribe(queue)
+        return [kind for _, kind, _ in (queue.get_nowait() for _ in range(queue.qsize()))]
+    assert asyncio.run(replayed(prefix.rsplit("/", 1)[1])) == ["user", "generation"]
+    assert asyncio.run(replayed(other_tenant)) == []
+
+
+def test_x_tenant_header_selects_the_tenant(tenant):
+    client, prefix = tenant
+    name = prefix.rsplit("/", 1)[1]
+    client.post(f"{prefix}/users", headers=login(client, prefix),
+                json={"id": "TCHR_901", "name": "Header Teacher", "email": "header@tibl.ai", "password": "pw"})
+    by_header = client.get("/users", headers={"X-Tenant": name}).json()
+    assert by_header == client.get(f"{prefix}/users").json()
+    assert "TCHR_901" in {u["id"] for u in by_header}
+
+
+@pytest.mark.parametrize("path, headers", [("/t/nope/users", {}), ("/users", {"X-Tenant": "nope"}),
+                                           ("/t/Upper/users", {}), ("/t/..%2F..%2Fetc/users", {})])
+def test_unknown_tenants_are_404(tenant, path, headers):
+    client, _ = tenant
+    response = client.get(path, headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"].startswith("Unknown tenant")
+
+
+def test_tenant_paths_follow_the_active_tenant(tenant, other_tenant):
+    import main
+
+    client, prefix = tenant
+    client.get(f"{prefix}/users")
+    first, second = tenants.get(prefix.rsplit("/", 1)[1]), tenants.get(other_tenant)
+    assert tenants.run_as(first, lambda: main.TEACHERS_FILE.path()) == first.base_dir / "teachers.csv"
+    assert tenants.run_as(second, lambda: main.GENERATED_DIR / "x.json") == second.generated_dir / "x.json"
+    with pytest.raises(KeyError):
+        tenants.get("missing")
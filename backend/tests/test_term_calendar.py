@@ -0,0 +1,39 @@
+import timetable_index
+from conftest import login
+from term_calendar import TermCalendar
+
+LAB = "CSE_CN_LAB — Amit Gupta (TCHR_002)"
+DATA = {"CSE-A": [{"Day": "MON", "15:00-16:00": LAB, "16:00-17:00": None}]}
+
+
+def test_without_a_term_every_date_follows_its_weekday(monkeypatch):
+    monkeypatch.delenv("TIBL_TERM_START", raising=False)
+    monkeypatch.delenv("TIBL_TERM_END", raising=False)
+    term = TermCalendar()
+    assert not term.bounded
+    assert term.resolve("2020-01-06")["follows"] == "MON"          # years before the default term
+    assert term.resolve("2099-06-05")["follows"] == "FRI"          # and long after it
+    assert term.resolve("2020-01-05")["note"] == "weekend"
+
+
+def test_a_configured_term_bounds_dates():
+    term = TermCalendar("2026-08-03", "2026-11-27")
+    assert term.resolve("2026-12-07") == {"date": "2026-12-07", "weekday": "MON", "follows": None,
+                                          "note": "outside term"}
+    assert [d["date"] for d in term.days("2026-11-26", "2026-12-02")] == ["2026-11-26", "2026-11-27"]
+
+
+def test_sessions_include_the_second_period_of_a_lab():
+    index = timetable_index.TimetableIndex(DATA, {("CSE-A", "MON", "15:00-16:00")})
+    term = TermCalendar("2026-08-03", "2026-11-27")
+    by_section = [(s["slot"], s["code"]) for s in term.sessions(index, "2026-08-03", "2026-08-03", section="CSE-A")]
+    by_teacher = [(s["slot"], s["code"]) for s in term.sessions(index, "2026-08-03", "2026-08-03", teacher="TCHR_002")]
+    expected = [("15:00-16:00", "CSE_CN_LAB"), ("16:00-17:00", "CSE_CN_LAB")]
+    assert by_section == expected and by_teacher == expected
+
+
+def test_substitutes_for_a_date_without_term_json(tenant):
+    client, prefix = tenant
+    client.post(f"{prefix}/generate", headers=login(client, prefix))
+    response = client.get(f"{prefix}/substitutes/TCHR_003", params={"date": "2020-01-07"}).json()
+    assert response["day"] == "TUE" and response["slots"]
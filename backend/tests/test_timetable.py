@@ -0,0 +1,75 @@
+import copy
+
+import timetable
+from timetable import BLOCKED, DAYS, TIME_SLOTS
+
+
+def _full_section():
+    tt = timetable.TimeTable({}, {})
+    tt.lab_subjects["CSE"] = [{"code": "CSE_NETWORKS_LAB", "teacher_id": "TCHR_007"},
+                              {"code": "CSE_DBMS_LAB", "teacher_id": "TCHR_006"}]
+    tt.init_section("CSE-A")
+    for day in DAYS:
+        for slot in range(len(TIME_SLOTS)):
+            if slot not in BLOCKED:
+                tt.mark("CSE-A", day, slot, f"CSE_THEORY_{slot}", f"TCHR_{slot:03d}")
+    return tt
+
+
+def test_lab_without_free_block_never_overwrites_theory():
+    tt = _full_section()
+    grid = copy.deepcopy(tt.section_tables["CSE-A"])
+    busy = {tid: set(slots) for tid, slots in tt.teacher_busy.items()}
+
+    tt.assign_labs("CSE", "CSE-A")
+
+    assert tt.section_tables["CSE-A"] == grid
+    assert {tid: set(slots) for tid, slots in tt.teacher_busy.items() if slots} == busy
+    left_out = [u for u in tt.unplaced if u["kind"] == "lab"]
+    assert left_out and all(u["reason"] == "no free block" for u in left_out)
+    assert {code for u in left_out for code in u["subjects"]} == {"CSE_NETWORKS_LAB", "CSE_DBMS_LAB"}
+
+
+def test_lab_is_left_out_rather_than_booked_onto_a_busy_teacher():
+    tt = timetable.TimeTable({}, {})
+    tt.lab_subjects["CSE"] = [{"code": "CSE_NETWORKS_LAB", "teacher_id": "TCHR_007"},
+                              {"code": "CSE_DBMS_LAB", "teacher_id": "TCHR_006"}]
+    tt.init_section("CSE-A")
+    tt.init_section("CSE-B")
+    # CSE-A is empty, but the networks lab teacher teaches CSE-B in every period
+    for day in DAYS:
+        for slot in range(len(TIME_SLOTS)):
+            if slot not in BLOCKED:
+                tt.mark("CSE-B", day, slot, "CSE_THEORY", "TCHR_007")
+    tt.done = [[sec, step] for sec in tt.section_tables for step in ("theory", "labs")]
+
+    tt.assign_labs("CSE", "CSE-A")
+
+    assert all(not cell[0] for row in tt.section_tables["CSE-A"].values() for cell in row.values())
+    assert {(u["reason"], tuple(u["batches"])) for u in tt.unplaced} == {("no free block", ("A1", "A2"))}
+    assert tt.status["complete"] is False and tt.status["reason"] == "unplaced"
+
+
+def test_unavailable_teachers_are_never_scheduled(tmp_path):
+    import csv
+    import shutil
+
+    from conftest import BACKEND
+
+    for name in ("subjects.csv", "subjects_with_teachers.csv", "teachers.csv"):
+        shutil.copyfile(BACKEND / name, tmp_path / name)
+    # TCHR_002 teaches CSE theory, TCHR_007 the CSE networks lab
+    (tmp_path / "teacher_availability.csv").write_text(
+        "teacher_id,unavailable\nTCHR_002,MON;WED 09:00-12:20\nTCHR_007,TUE;THU\n", encoding="utf-8")
+    tt = timetable.main(str(tmp_path), str(tmp_path / "out"), write_xlsx=False)
+    assigned = tt.assigned_teachers()
+
+    booked = set()
+    with open(tmp_path / "out" / "overall_schedule.csv", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            start = TIME_SLOTS.index(row["Time"])
+            for slot in range(start, start + (2 if row["Activity"] == "Lab" else 1)):
+                booked.add((assigned.get(row["Subject/Notes"]), row["Day"], slot))
+    assert {tid for tid, _, _ in booked} >= {"TCHR_002", "TCHR_007"}
+    for tid, day, slot in booked:
+        assert (day, slot) not in tt.availability.get(tid, {}).get("unavailable", set()), (tid, day, slot)
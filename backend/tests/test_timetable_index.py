@@ -0,0 +1,133 @@
+import json
+
+import timetable_index
+
+SLOTS = ["14:00-15:00", "15:00-16:00", "16:00-17:00"]
+
+
+def _row(day, **cells):
+    return {"Day": day, **{slot: cells.get(f"s{i}") for i, slot in enumerate(SLOTS)}}
+
+
+DATA = {
+    # lab taught by TCHR_002 at 15:00-17:00, listed at its first period only
+    "CSE-A": [_row("TUE", s0="CSE_SE — Sourav Sharma (TCHR_001)", s1="CSE_CN_LAB — Amit Gupta (TCHR_002)")],
+    # TCHR_003 runs a lab 14:00-16:00 in another section
+    "CSE-B": [_row("TUE", s0="CSE_DBMS_LAB — Karan Das (TCHR_003)")],
+}
+LABS = {("CSE-A", "TUE", "15:00-16:00"), ("CSE-B", "TUE", "14:00-15:00")}
+
+
+def test_lab_second_period_is_busy():
+    index = timetable_index.TimetableIndex(DATA, LABS)
+    assert index.is_busy("TCHR_002", "TUE", "16:00-17:00")
+    assert index.is_busy("TCHR_003", "TUE", "15:00-16:00")
+    assert index.daily_load[("TCHR_002", "TUE")] == 2
+    assert index.continued[("CSE-A", "TUE", "16:00-17:00")].startswith("CSE_CN_LAB")
+    # the JSON itself is untouched
+    assert index.sections["CSE-A"]["TUE"]["16:00-17:00"] is None
+
+
+def test_substitutes_cover_lab_second_period():
+    index = timetable_index.TimetableIndex(DATA, LABS)
+    teachers = {"TCHR_001": "Sourav Sharma", "TCHR_002": "Amit Gupta", "TCHR_003": "Karan Das"}
+    slots = timetable_index.find_substitutes(index, "TCHR_002", "TUE", teachers, {})
+    assert [s["slot"] for s in slots] == ["15:00-16:00", "16:00-17:00"]
+    # TCHR_003 is still in the second hour of their lab at 15:00
+    at_three = [c["id"] for c in slots[0]["candidates"]]
+    assert "TCHR_003" not in at_three and "TCHR_001" in at_three
+
+
+def test_load_index_reads_labs_from_csv(tmp_path):
+    json_path = tmp_path / "timetable_1.json"
+    json_path.write_text(json.dumps(DATA), encoding="utf-8")
+    (tmp_path / "timetable_1.csv").write_text(
+        "Day,Branch,Section,Batch,Time,Activity,Room,Subject/Notes\n"
+        "TUE,CSE,A,A1,15:00-16:00,Lab,CSE_Lab1,CSE_CN_LAB\n"
+        "TUE,CSE,A,A1 & A2,14:00-15:00,Theory/Project,A-Classroom,CSE_SE\n", encoding="utf-8")
+    index = timetable_index.load_index(json_path)
+    assert index.is_busy("TCHR_002", "TUE", "16:00-17:00")
+    assert not index.is_busy("TCHR_001", "TUE", "15:00-16:00")
+
+
+def test_unavailable_teachers_are_never_suggested():
+    index = timetable_index.TimetableIndex(DATA, LABS)
+    teachers = {"TCHR_001": "Sourav Sharma", "TCHR_002": "Amit Gupta", "TCHR_004": "Neha Rao"}
+    unavailable = {"TCHR_004": {("TUE", "16:00-17:00")}}
+    slots = timetable_index.find_substitutes(index, "TCHR_002", "TUE", teachers, {}, unavailable=unavailable)
+    assert "TCHR_004" in [c["id"] for c in slots[0]["candidates"]]
+    assert "TCHR_004" not in [c["id"] for c in slots[1]["candidates"]]
+
+
+def test_diff_reports_moves_additions_and_removals():
+    new = {
+        # CSE_SE moved from 14:00 to 16:00; the lab slot is unchanged
+        "CSE-A": [_row("TUE", s1="CSE_CN_LAB — Amit Gupta (TCHR_002)", s2="CSE_SE — Sourav Sharma (TCHR_001)")],
+        # the lab was replaced by another teacher's
+        "CSE-B": [_row("TUE", s0="CSE_DBMS_LAB — Neha Rao (TCHR_004)")],
+    }
+    result = timetable_index.diff(timetable_index.TimetableIndex(DATA, LABS), timetable_index.TimetableIndex(new, LABS))
+    assert result["summary"] == {"moved": 1, "added": 1, "removed": 1}
+    [moved] = result["sections"]["CSE-A"]["moved"]
+    assert (moved["code"], moved["from"], moved["to"]) == \
+        ("CSE_SE", {"day": "TUE", "slot": "14:00-15:00"}, {"day": "TUE", "slot": "16:00-17:00"})
+    assert result["teachers"]["TCHR_003"]["removed"][0]["code"] == "CSE_DBMS_LAB"
+    assert result["teachers"]["TCHR_004"]["added"][0]["slot"] == "14:00-15:00"
+    assert "TCHR_002" not in result["teachers"]
+
+
+def test_diff_endpoint_filters_by_teacher(tenant):
+    from conftest import TENANTS_DIR
+
+    client, prefix = tenant
+    generated = TENANTS_DIR / prefix.rsplit("/", 1)[1] / "generated"
+    generated.mkdir(exist_ok=True)
+    (generated / "timetable_1.json").write_text(json.dumps(DATA), encoding="utf-8")
+    (generated / "timetable_2.json").write_text(json.dumps({**DATA, "CSE-B": [_row("TUE")]}), encoding="utf-8")
+
+    response = client.get(f"{prefix}/diff/timetable_1.json/timetable_2.csv", params={"teacher": "TCHR_003"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["summary"] == {"moved": 0, "added": 0, "removed": 1}
+    assert [s["code"] for s in body["teacher"]["removed"]] == ["CSE_DBMS_LAB"]
+    assert "sections" not in body
+    assert client.get(f"{prefix}/diff/timetable_1.json/timetable_9.json").status_code == 404
+
+
+SCHEDULE = [
+    {"Day": "TUE", "Branch": "CSE", "Section": "A", "Batch": "A1", "Time": "15:00-16:00", "Activity": "Lab",
+     "Room": "CSE_Lab1", "Subject/Notes": "CSE_CN_LAB", "Teacher ID": "TCHR_002", "Teacher Name": "Amit Gupta"},
+    {"Day": "MON", "Branch": "CSE", "Section": "B", "Batch": "B1 & B2", "Time": "14:00-15:00", "Activity": "Theory/Project",
+     "Room": "B-Classroom", "Subject/Notes": "CSE_DBMS", "Teacher ID": "TCHR_003", "Teacher Name": "Karan Das"},
+    {"Day": "TUE", "Branch": "CSE", "Section": "A", "Batch": "A1 & A2", "Time": "14:00-15:00", "Activity": "Theory/Project",
+     "Room": "A-Classroom", "Subject/Notes": "CSE_SE", "Teacher ID": "TCHR_001", "Teacher Name": "Sourav Sharma"},
+]
+SUBJECT_NAMES = {"CSE_CN_LAB": "Computer Networks Lab", "CSE_DBMS": "Database Management Systems",
+                 "CSE_SE": "Software Engineering"}
+
+
+def test_search_matches_exact_prefix_and_fuzzy_terms():
+    index = timetable_index.SearchIndex(SCHEDULE, SLOTS, SUBJECT_NAMES, {"TCHR_001": "Shilpa"})
+
+    def found(query, **kwargs):
+        return [(h["code"], h["score"]) for h in index.search(query, **kwargs)["hits"]]
+
+    assert found("networks lab") == [("CSE_CN_LAB", 6)]
+    assert found("datab") == [("CSE_DBMS", 2)]                 # prefix
+    assert found("databse") == [("CSE_DBMS", 1)]               # fuzzy
+    assert found("cselab1", fields=["room"]) == [("CSE_CN_LAB", 3)]
+    assert found("cse") == [("CSE_DBMS", 3), ("CSE_SE", 3), ("CSE_CN_LAB", 3)]   # Monday first
+    # the current teacher name wins over the one in the CSV
+    assert found("shilpa") == [("CSE_SE", 3)] and found("sourav") == []
+    # a lab covers its second period too
+    assert found("networks", day="TUE", slot="16:00-17:00") == [("CSE_CN_LAB", 3)]
+    assert index.search("networks", day="MON") == {"total": 0, "hits": []}
+
+
+def test_search_endpoint_uses_the_latest_generation(generation):
+    client, prefix, stem = generation
+    body = client.get(f"{prefix}/search", params={"q": "karan", "field": "teacher"}).json()
+    assert body["total"] > 0 and {h["teacher_id"] for h in body["hits"]} == {"TCHR_003"}
+    limited = client.get(f"{prefix}/search", params={"q": "karan", "limit": 1, "generation": f"{stem}.json"}).json()
+    assert limited["total"] == body["total"] and len(limited["hits"]) == 1
+    assert client.get(f"{prefix}/search", params={"q": "x", "field": "colour"}).status_code == 400
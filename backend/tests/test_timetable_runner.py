@@ -0,0 +1,28 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND
+
+
+def test_sample_inputs_pass_validation(tmp_path):
+    import timetable_runner
+
+    csv_path, _, report = timetable_runner.generate_timetable(str(BACKEND), str(tmp_path / "out"))
+    assert report["ok"], report["summary"]
+    assert json.loads((tmp_path / "out" / "validation_report.json").read_text(encoding="utf-8"))["ok"]
+
+    # every lab row carries the lab subject's teacher, not whichever subject its code resembles
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        teachers = {(row["Subject/Notes"], row["Teacher ID"]) for row in csv.DictReader(f) if row["Activity"] == "Lab"}
+    assert ("CSE_COMPUTER_NETWORKS_LA_7", "TCHR_007") in teachers
+    assert not any(code == "CSE_COMPUTER_NETWORKS_LA_7" and tid != "TCHR_007" for code, tid in teachers)
+
+
+def test_importing_the_pipeline_writes_nothing(tmp_path):
+    env = {**os.environ, "PYTHONPATH": str(BACKEND)}
+    subprocess.run([sys.executable, "-c", "import timetable, timetable_runner, attach_teachers_to_timetable"],
+                   cwd=tmp_path, env=env, check=True)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,98 @@
+import pytest
+
+from conftest import login
+
+
+def test_users_list_has_no_passwords(tenant):
+    client, prefix = tenant
+    users = client.get(f"{prefix}/users").json()
+    assert {u["id"] for u in users} >= {"ADMIN_001", "TCHR_003"}
+    assert all("password" not in user for user in users)
+
+
+def test_rename_patches_the_latest_generation(tenant):
+    client, prefix = tenant
+    headers = login(client, prefix)
+    generation = client.post(f"{prefix}/generate", headers=headers).json()
+    assert generation["status"] == "complete"
+    stem = generation["filename"][:-4]
+
+    response = client.put(f"{prefix}/users/TCHR_003", json={"name": "Karan Dasgupta", "email": "karan@tibl.ai"},
+                          headers=headers)
+    assert response.status_code == 200
+
+    data = client.get(f"{prefix}/json/{stem}.json").text
+    assert "Karan Dasgupta (TCHR_003)" in data and "Karan Das (TCHR_003)" not in data
+    rows = client.get(f"{prefix}/preview/{stem}.csv").json()
+    names = {r["Teacher Name"] for r in rows if r["Teacher ID"] == "TCHR_003"}
+    assert names == {"Karan Dasgupta"}
+    feed = client.get(f"{prefix}/calendar/teacher/TCHR_003.ics").text
+    assert "Karan Dasgupta" in feed and "Karan Das (" not in feed
+    assert client.get(f"{prefix}/workload", params={"teacher": "TCHR_003"}).status_code == 200
+
+
+WRITES = [("post", "/generate", None), ("post", "/generate/jobs/job_x/cancel", None),
+          ("post", "/users", {"id": "TCHR_900", "name": "New Teacher", "email": "new@tibl.ai", "password": "pw"}),
+          ("put", "/users/TCHR_004", {"name": "Priya R", "email": "priya.reddy@tibl.ai"}),
+          ("delete", "/users/TCHR_004", None)]
+
+
+@pytest.mark.parametrize("method, path, body", WRITES)
+def test_writes_need_a_token(tenant, method, path, body):
+    client, prefix = tenant
+    response = client.request(method, f"{prefix}{path}", json=body)
+    assert response.status_code == 401
+    assert response.status_code == client.request(method, f"{prefix}{path}", json=body,
+                                                  headers={"Authorization": "Bearer forged"}).status_code
+
+
+@pytest.mark.parametrize("method, path, body", WRITES)
+def test_writes_are_admin_only(tenant, method, path, body):
+    client, prefix = tenant
+    teacher = login(client, prefix, "karan.das@tibl.ai")
+    assert client.request(method, f"{prefix}{path}", json=body, headers=teacher).status_code == 403
+    assert "TCHR_004" in {u["id"] for u in client.get(f"{prefix}/users").json()}
+
+
+def test_teachers_can_edit_their_own_profile(tenant):
+    client, prefix = tenant
+    teacher = login(client, prefix, "karan.das@tibl.ai")
+    response = client.put(f"{prefix}/users/TCHR_003", json={"name": "Karan Das", "email": "karan@tibl.ai"}, headers=teacher)
+    assert response.status_code == 200
+
+
+IMPORT_CSV = ("ID,Name,Email,Password\n"
+              "TCHR_900,New Teacher,new@tibl.ai,pw\n"
+              ",,,\n"
+              "TCHR_901,Second Teacher,second@tibl.ai,pw\n")
+
+
+def test_import_dry_run_validates_without_writing(tenant):
+    client, prefix = tenant
+    headers = login(client, prefix)
+    files = {"file": ("users.csv", IMPORT_CSV, "text/csv")}
+    response = client.post(f"{prefix}/users/import", params={"dry_run": True}, files=files, headers=headers)
+    assert response.json() == {"status": "valid", "rows": 2}
+    assert "TCHR_900" not in {u["id"] for u in client.get(f"{prefix}/users").json()}
+
+    response = client.post(f"{prefix}/users/import", files=files, headers=headers)
+    assert response.json() == {"status": "success", "imported": 2}
+    assert {"TCHR_900", "TCHR_901"} <= {u["id"] for u in client.get(f"{prefix}/users").json()}
+    assert client.post(f"{prefix}/login", json={"email": "new@tibl.ai", "password": "pw"}).status_code == 200
+
+
+def test_import_reports_every_bad_row(tenant):
+    client, prefix = tenant
+    upload = ("id,name,email,password\n"
+              "TCHR_003,Karan Again,karan.two@tibl.ai,pw\n"      # id taken
+              "TCHR_902,Dup,admin@tibl.ai,pw\n"                 # the admin's email
+              "TCHR_903,No Mail,not-an-email,pw\n"
+              "TCHR_904,First,same@tibl.ai,pw\n"
+              "TCHR_905,Second,SAME@tibl.ai,\n")                 # duplicate inside the file, no password
+    response = client.post(f"{prefix}/users/import", params={"dry_run": True},
+                           files={"file": ("users.csv", upload, "text/csv")}, headers=login(client, prefix))
+    assert response.status_code == 422
+    errors = {e["row"]: e["errors"] for e in response.json()["detail"]["errors"]}
+    assert errors == {2: ["duplicate id TCHR_003"], 3: ["duplicate email admin@tibl.ai"],
+                      4: ["invalid email not-an-email"], 6: ["missing password", "duplicate email SAME@tibl.ai"]}
+    assert "TCHR_904" not in {u["id"] for u in client.get(f"{prefix}/users").json()}
@@ -0,0 +1,60 @@
+import workload
+
+HEADER = "Day,Branch,Section,Batch,Time,Activity,Room,Subject/Notes,Teacher ID,Teacher Name\n"
+SCHEDULE = HEADER + (
+    "MON,CSE,A,A1 & A2,09:00-10:00,Theory/Project,A-Classroom,CSE_SE,TCHR_001,Shilpa\n"
+    "MON,CSE,B,B1 & B2,10:00-11:00,Theory/Project,B-Classroom,CSE_SE,TCHR_001,Shilpa\n"
+    "MON,CSE,A,A1 & A2,11:20-12:20,Theory/Project,A-Classroom,CSE_SE,TCHR_001,Shilpa\n"
+    # one lab for both batches: two periods for the teacher, not four
+    "MON,CSE,A,A1,15:00-16:00,Lab,CSE_Lab1,CSE_CN_LAB,TCHR_001,Shilpa\n"
+    "MON,CSE,A,A2,15:00-16:00,Lab,CSE_Lab2,CSE_CN_LAB,TCHR_001,Shilpa\n"
+    "TUE,ECE,A,A1 & A2,14:00-15:00,Theory/Project,A-Classroom,ECE_DSP,TCHR_001,Shilpa\n"
+    "WED,ECE,A,A1 & A2,09:00-10:00,Theory/Project,A-Classroom,ECE_DSP,TCHR_002,Amit Gupta\n"
+    "WED,ECE,A,A1 & A2,11:00-11:20,Break,,Short Break,,\n"
+)
+
+
+def test_teacher_metrics(tmp_path):
+    csv_path = tmp_path / "timetable_1.csv"
+    csv_path.write_text(SCHEDULE, encoding="utf-8")
+    summary = workload.build_workload(csv_path)
+    t1 = summary["teachers"]["TCHR_001"]
+    assert {k: t1[k] for k in ("weekly_periods", "theory_periods", "lab_periods", "teaching_hours", "lab_hours",
+                               "days_taught", "peak_day", "peak_periods", "sections", "subjects")} == \
+        {"weekly_periods": 6, "theory_periods": 4, "lab_periods": 2, "teaching_hours": 6.0, "lab_hours": 2.0,
+         "days_taught": 2, "peak_day": "MON", "peak_periods": 5, "sections": 3, "subjects": 3}
+    assert t1["daily"] == {"MON": 5, "TUE": 1, "WED": 0, "THU": 0, "FRI": 0}
+    # MON: 12:20 and 14:00 are free between classes; the short break is not a gap and ends a streak
+    assert (t1["idle_gaps"], t1["max_daily_gap"], t1["longest_streak"]) == (2, 2, 2)
+    assert t1["department"] == "CSE"
+    assert summary["branches"]["ECE"] == {"periods": 2, "theory_periods": 2, "lab_periods": 0, "teachers": 2,
+                                          "sections": 1, "teaching_hours": 2.0}
+
+
+def test_departments_come_from_the_assignments(tmp_path):
+    csv_path = tmp_path / "timetable_1.csv"
+    csv_path.write_text(SCHEDULE, encoding="utf-8")
+    assignments = tmp_path / "subjects_with_teachers.csv"
+    assignments.write_text("Branch,Subject Type,Subject Name,teacher_id\n"
+                           "ECE,Theory,Signals,TCHR_001\nECE,Theory,DSP,TCHR_001\nCSE,Theory,SE,TCHR_001\n",
+                           encoding="utf-8")
+    departments = workload.build_workload(csv_path, assignments)["departments"]
+    assert departments == {"ECE": {"teachers": 2, "weekly_periods": 7, "mean_weekly_periods": 3.5,
+                                   "max_weekly_periods": 6, "min_weekly_periods": 1, "idle_gaps": 2, "lab_hours": 2.0}}
+
+
+def test_empty_schedule(tmp_path):
+    csv_path = tmp_path / "timetable_1.csv"
+    csv_path.write_text(HEADER, encoding="utf-8")
+    assert workload.build_workload(csv_path)["teachers"] == {}
+
+
+def test_workload_endpoint_filters(generation):
+    client, prefix, stem = generation
+    summary = client.get(f"{prefix}/workload").json()
+    assert summary["generation"] == f"{stem}.csv"
+    tid, teacher = next(iter(summary["teachers"].items()))
+    assert client.get(f"{prefix}/workload", params={"teacher": tid}).json()["teacher"] == teacher
+    members = client.get(f"{prefix}/workload", params={"department": teacher["department"]}).json()["department"]["members"]
+    assert members[tid] == teacher
+    assert client.get(f"{prefix}/workload", params={"teacher": "TCHR_999"}).status_code == 404
@@ -0,0 +1,35 @@
+import io
+
+from openpyxl import load_workbook
+
+import xlsx_writer
+
+DATA = {
+    "CSE-A": [{"Day": "MON", "09:00-10:00": "CSE_SE — Sourav Sharma (TCHR_001)", "10:00-11:00": None},
+              {"Day": "TUE", "09:00-10:00": "A1 -> CSE_Lab1 (CSE_CN_LAB)\nA2 -> CSE_Lab2 (CSE_DBMS_LAB)", "10:00-11:00": "x" * 80}],
+    "A section with a very long sheet name": [{"Day": "MON", "09:00-10:00": None}],
+}
+
+
+def test_round_trip(tmp_path):
+    path = xlsx_writer.write_workbook(xlsx_writer.sheets_from_records(DATA), tmp_path / "out" / "tt.xlsx")
+    sheets = xlsx_writer.read_sheets(path)
+    assert list(sheets) == ["CSE-A", "A section with a very long sheet name"[:31]]
+    assert xlsx_writer.records_from_sheets({"CSE-A": sheets["CSE-A"]}) == {"CSE-A": DATA["CSE-A"]}
+
+    ws = load_workbook(path)["CSE-A"]
+    assert ws["A1"].font.bold and not ws["A2"].font.bold
+    assert ws["B3"].alignment.wrap_text
+    assert ws.column_dimensions["A"].width == xlsx_writer.MIN_WIDTH
+    assert ws.column_dimensions["B"].width == len("CSE_SE — Sourav Sharma (TCHR_001)") + 2
+    assert ws.column_dimensions["C"].width == xlsx_writer.MAX_WIDTH
+
+
+def test_generation_workbook_matches_its_json(generation):
+    client, prefix, stem = generation
+    data = client.get(f"{prefix}/json/{stem}.json").json()
+    response = client.get(f"{prefix}/xlsx/{stem}.json")
+    assert response.status_code == 200
+    wb = load_workbook(io.BytesIO(response.content), read_only=True)
+    sheets = {name: [list(r) for r in wb[name].iter_rows(values_only=True)] for name in wb.sheetnames}
+    assert xlsx_writer.records_from_sheets(sheets) == data
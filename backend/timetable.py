@@ -1,24 +1,26 @@
 #!/usr/bin/env python3
 # auto_scheduler_final_swap.py
-# Deterministic swap lab scheduler (ready-to-run).
+# Deterministic rotation lab scheduler (ready-to-run).
 # Ensures each batch attends every lab once per week.
-# For each lab-pair (A,B) we schedule two sessions:
-#  - Day1: A1->A, A2->B
-#  - Day2: A1->B, A2->A
+# k batches and m labs rotate Latin-square style over max(k, m) sessions, e.g. 2 batches / 2 labs:
+#  - Session 1: A1->A, A2->B
+#  - Session 2: A1->B, A2->A
 # Save next to subjects.csv (Branch,Subject Type,Subject Name[,code,credits,teacher_id])
 # Run: python auto_scheduler_final_swap.py
 
+import copy
+import csv
+import json
 import os
 import random
 import re
+import time
 from collections import defaultdict
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
+from xlsx_writer import write_workbook
 
 # ---------- CONFIG ----------
-OUT_DIR = "timetable_tools/output_v5"
-os.makedirs(OUT_DIR, exist_ok=True)
+OUT_DIR = "timetable_tools/output_v5"   # output folder of a command-line run only; main() callers pass their own
 
 DAYS = ["MON", "TUE", "WED", "THU", "FRI"]
 TIME_SLOTS = [
@@ -43,9 +45,110 @@ LAB_POOLS = {
 
 PREFERRED_LAB_DAYS = ["TUE", "THU"]  # preferred lab-days; script will use these first
 
+AVAILABILITY_FILE = "teacher_availability.csv"   # optional per-teacher constraints, see load_availability
+DEFAULT_BATCHES = 2                   # lab batches per section
+SECTION_BATCHES = {}                  # per-section override, e.g. {"CSE-A": 3}
+
+# soft teacher preferences (teacher_availability.csv): cost of each period that breaks one
+PREFERENCE_WEIGHTS = {"off_day": 1, "first_period": 2, "over_max": 3}
+
+# per-institution overrides of the constants above, read from config.json next to the inputs
+CONFIG_FILE = "config.json"
+CONFIG_KEYS = {
+    "branch_sections": "BRANCH_SECTIONS",
+    "lab_pools": "LAB_POOLS",
+    "preferred_lab_days": "PREFERRED_LAB_DAYS",
+    "default_batches": "DEFAULT_BATCHES",
+    "section_batches": "SECTION_BATCHES",
+}
+_CONFIG_DEFAULTS = {name: copy.deepcopy(globals()[name]) for name in CONFIG_KEYS.values()}
+
 random.seed(42)
 
 # ---------- HELPERS ----------
+def batches_for(section, config=None):
+    """Lab batches of a section: CSE-A -> ["A1", "A2", ...]. `config` (a config.json dict) overrides the globals."""
+    config = config or {}
+    sec_letter = section.split("-")[-1]
+    count = config.get("section_batches", SECTION_BATCHES).get(section, config.get("default_batches", DEFAULT_BATCHES))
+    return [f"{sec_letter}{i}" for i in range(1, count + 1)]
+
+def load_config(path):
+    """config.json -> {key: value} for the CONFIG_KEYS it sets ({} if there is no file); ValueError for unknown keys."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    unknown = set(config) - set(CONFIG_KEYS) - {"version"}
+    if unknown:
+        raise ValueError(f"{os.path.basename(path)}: unknown keys {sorted(unknown)} (expected {sorted(CONFIG_KEYS)})")
+    return {k: v for k, v in config.items() if k in CONFIG_KEYS}
+
+def configure(config=None):
+    """
+    Reset the institution constants (BRANCH_SECTIONS, LAB_POOLS, ...) to their defaults, then apply
+    `config`. main() calls this on every run: a pool worker runs jobs for different institutions.
+    """
+    for key, name in CONFIG_KEYS.items():
+        globals()[name] = copy.deepcopy((config or {}).get(key, _CONFIG_DEFAULTS[name]))
+
+def lab_rotation(n_batches, n_labs):
+    """
+    Latin-square rotation: rows[r][b] is the lab index batch b attends in round r, or None.
+    max(n_batches, n_labs) rounds; every batch meets every lab exactly once and no lab is
+    double-booked within a round.
+    """
+    n = max(n_batches, n_labs)
+    return [[(b + r) % n if (b + r) % n < n_labs else None for b in range(n_batches)] for r in range(n)]
+
+def lab_rooms(branch, needed):
+    """The branch's lab rooms, padded with numbered extras if fewer than `needed` can be in use at once."""
+    pool = list(LAB_POOLS.get(branch, []))
+    base = pool[0] if pool else f"{branch}_Lab"
+    return pool + [f"{base}_{i}" for i in range(1, needed - len(pool) + 1)]
+
+def slots_in_range(text):
+    """ "14:00-17:00" -> indices of every TIME_SLOTS period overlapping that range. """
+    start, _, end = str(text).strip().partition("-")
+    out = []
+    for i, label in enumerate(TIME_SLOTS):
+        s, e = label.split()[0].split("-")
+        if s < end.strip() and start.strip() < e:
+            out.append(i)
+    return out
+
+def load_availability(path):
+    """
+    teacher_availability.csv (teacher_id, unavailable, preferred_days, max_per_day, no_first_period) ->
+    {tid: {"unavailable": {(day, slot)}, "preferred_days": {day}, "max_per_day": int | None, "no_first_period": bool}}
+
+    unavailable is ';'-separated: "FRI" (whole day) or "MON 14:00-17:00" (every period overlapping the
+    range) and is a hard constraint; the other columns are soft preferences (see PREFERENCE_WEIGHTS).
+    """
+    availability = {}
+    if not path or not os.path.exists(path):
+        return availability
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            tid = row.get("teacher_id") or row.get("id")
+            if not tid:
+                continue
+            unavailable = set()
+            for item in filter(None, (x.strip() for x in row.get("unavailable", "").split(";"))):
+                day, _, rng = item.partition(" ")
+                day = day.upper()[:3]
+                if day in DAYS:
+                    unavailable.update((day, i) for i in (slots_in_range(rng) if rng.strip() else range(len(TIME_SLOTS))))
+            max_per_day = row.get("max_per_day", "")
+            availability[tid] = {
+                "unavailable": unavailable,
+                "preferred_days": {d.strip().upper()[:3] for d in row.get("preferred_days", "").split(";") if d.strip()},
+                "max_per_day": int(max_per_day) if max_per_day.isdigit() else None,
+                "no_first_period": row.get("no_first_period", "").lower() in ("1", "yes", "true", "y"),
+            }
+    return availability
+
 def slugify(s: str) -> str:
     s = str(s or "").strip().upper()
     s = re.sub(r"[^\w\s-]", "", s)
@@ -128,16 +231,65 @@ def load_subjects_teachers(subjects_path="subjects.csv", teachers_path="teachers
 
     return subject_map, teacher_map
 
+def unavailable_cells(availability):
+    """{tid: {(day, slot label)}}: the hard unavailability of a load_availability() result, by TIME_SLOTS label."""
+    return {tid: {(day, TIME_SLOTS[i]) for day, i in prefs["unavailable"]} for tid, prefs in availability.items()}
+
+# ---------- BUDGET ----------
+class Budget:
+    """
+    Limits for one scheduler run, checked cooperatively before every placement attempt:
+    an absolute wall-clock deadline (time.time()), a cap on attempts, and a cancel file whose
+    appearance stops the run (works across the generation process pool).
+    """
+    def __init__(self, deadline=None, max_steps=None, cancel_file=None):
+        self.deadline = deadline
+        self.max_steps = max_steps
+        self.cancel_file = cancel_file
+        self.started = time.time()
+        self.steps = 0
+        self.reason = None            # "deadline" | "steps" | "cancelled" once exhausted
+
+    def spend(self):
+        """Count one attempt; False once the run must stop."""
+        if self.reason is None:
+            self.steps += 1
+            if self.max_steps is not None and self.steps > self.max_steps:
+                self.reason = "steps"
+            elif self.deadline is not None and time.time() >= self.deadline:
+                self.reason = "deadline"
+            elif self.cancel_file and os.path.exists(self.cancel_file):
+                self.reason = "cancelled"
+        return self.reason is None
+
+
 # ---------- TIMETABLE CLASS ----------
 class TimeTable:
-    def __init__(self, subjects, teachers):
+    def __init__(self, subjects, teachers, lab_catalogue="subjects.csv", out_dir=None, budget=None, availability=None):
         self.subjects = subjects
         self.teachers = teachers
+        # explicit paths so concurrent runs (one workspace each) never share files
+        self.lab_catalogue = lab_catalogue
+        self.out_dir = out_dir
         self.section_tables = {}
         self.teacher_busy = defaultdict(set)
         # batch_lab_days[(section,batch)] = set(days where batch has lab) used for constraints
         self.batch_lab_days = defaultdict(set)
+        self.room_busy = defaultdict(set)     # room -> {(day, slot)}, shared by every section of the branch
+        self.lab_subjects = {}                # branch -> lab subject dicts
+        self._lab_catalogue_df = None
         self.allocations = []
+        self.budget = budget or Budget()
+        self.unplaced = []                    # what a budget stop (or an infeasible input) left out
+        self.done = []                        # [section, "theory" | "labs"] steps finished in full
+        # teacher availability: hard unavailability is pre-loaded into teacher_busy, so every is_free /
+        # lab_block_free check honours it; soft preferences are costed incrementally by occupy/release
+        self.availability = availability or {}
+        self.teacher_load = defaultdict(int)  # (tid, day) -> periods taught
+        self.violations = defaultdict(lambda: defaultdict(int))   # tid -> preference kind -> periods
+        self.penalty = 0
+        for tid, prefs in self.availability.items():
+            self.teacher_busy[tid].update(prefs["unavailable"])
 
     def init_section(self, section):
         grid = {d: {i: ("", None) for i in range(len(TIME_SLOTS))} for d in DAYS}
@@ -148,390 +300,371 @@ class TimeTable:
         if slot < 0 or slot >= len(TIME_SLOTS): return False
         cell = self.section_tables[section][day][slot]
         if cell and cell[0]: return False
+        prev = self.section_tables[section][day].get(slot - 1)
+        if prev and ("->" in str(prev[0]) or "UNASSIGNED-LAB" in str(prev[0])): return False  # 2nd period of a lab
         if teacher_id and (day, slot) in self.teacher_busy.get(teacher_id, set()): return False
         return True
 
     def mark(self, section, day, slot, subj_code, teacher_id):
         self.section_tables[section][day][slot] = (subj_code, teacher_id)
         if teacher_id:
-            self.teacher_busy[teacher_id].add((day, slot))
+            self.occupy(teacher_id, day, slot)
         self.allocations.append((day, section, slot, subj_code, teacher_id))
 
+    # ---------- teacher preferences ----------
+    def preference_terms(self, tid, day, slot, load=None):
+        """Preferences broken by `tid` teaching one more period at (day, slot) with `load` periods that day."""
+        prefs = self.availability.get(tid)
+        if not prefs:
+            return []
+        load = self.teacher_load[(tid, day)] if load is None else load
+        terms = []
+        if prefs["preferred_days"] and day not in prefs["preferred_days"]:
+            terms.append("off_day")
+        if prefs["no_first_period"] and slot == 0:
+            terms.append("first_period")
+        if prefs["max_per_day"] is not None and load >= prefs["max_per_day"]:
+            terms.append("over_max")
+        return terms
+
+    def placement_penalty(self, tid, day, slot, load=None):
+        return sum(PREFERENCE_WEIGHTS[t] for t in self.preference_terms(tid, day, slot, load))
+
+    def occupy(self, tid, day, slot):
+        """Book a teacher period, updating the penalty by just this period's cost."""
+        for term in self.preference_terms(tid, day, slot):
+            self.violations[tid][term] += 1
+            self.penalty += PREFERENCE_WEIGHTS[term]
+        self.teacher_load[(tid, day)] += 1
+        self.teacher_busy[tid].add((day, slot))
+
+    def release(self, tid, day, slot):
+        self.teacher_load[(tid, day)] -= 1
+        for term in self.preference_terms(tid, day, slot):
+            self.violations[tid][term] -= 1
+            self.penalty -= PREFERENCE_WEIGHTS[term]
+        self.teacher_busy[tid].discard((day, slot))
+
+    def best_slot(self, section, teacher, days):
+        """
+        (day, slot) for one theory period: the lowest preference cost among the free slots of `days`;
+        between equal costs the earliest day in `days`, then a random slot (the old behaviour).
+        """
+        options = [(self.placement_penalty(teacher, d, i) if teacher else 0, rank, i)
+                   for rank, d in enumerate(days) for i in range(len(TIME_SLOTS))
+                   if i not in BLOCKED and self.is_free(section, d, i, teacher)]
+        if not options:
+            return None
+        best = min(options)[:2]
+        return days[best[1]], random.choice([i for cost, rank, i in options if (cost, rank) == best])
+
+    def block_penalty(self, block, teachers):
+        day, start = block
+        return sum(self.placement_penalty(tid, day, start) + self.placement_penalty(tid, day, start + 1, self.teacher_load[(tid, day)] + 1)
+                   for tid in teachers)
+
+    def preference_report(self):
+        return {"penalty": self.penalty,
+                "teachers": {tid: {k: n for k, n in kinds.items() if n} for tid, kinds in sorted(self.violations.items())
+                             if any(kinds.values())}}
+
     def assign_theory_and_project(self, section):
         branch = section.split("-")[0]
         subj_codes = [code for code, info in self.subjects.items()
                       if info["type"].lower() in ("theory", "project") and info["branch"] == branch]
+        # periods already in the grid (pinned by hand) count towards a subject's credits
+        subject_used_days = defaultdict(set)
+        placed = defaultdict(int)
+        for d in DAYS:
+            for cell in self.section_tables[section][d].values():
+                if cell and cell[0] in subj_codes:
+                    placed[cell[0]] += 1
+                    subject_used_days[cell[0]].add(d)
         sessions = {}
         for code in subj_codes:
             credits = int(self.subjects[code].get("credits", 0) or 0)
-            sessions[code] = max(1, min(credits, 6))
+            sessions[code] = max(1, min(credits, 6)) - placed[code]
 
         per_day_load = {d: sum(1 for _ in self.section_tables[section][d].items() if _[1] and _[1][0]) for d in DAYS}
         codes = list(sessions.keys())
         random.shuffle(codes)
-        subject_used_days = defaultdict(set)
 
         for code in codes:
             teacher = self.subjects[code].get("teacher_id", "")
             count = sessions[code]
-            while count > 0:
-                candidate_days = sorted(DAYS, key=lambda d: per_day_load[d])
-                placed = False
-                for d in candidate_days:
-                    if d in subject_used_days[code]: continue
-                    free_slots = [i for i in range(len(TIME_SLOTS)) if i not in BLOCKED and self.is_free(section, d, i, teacher)]
-                    if not free_slots: continue
-                    slot = random.choice(free_slots)
-                    self.mark(section, d, slot, code, teacher)
-                    per_day_load[d] += 1
-                    subject_used_days[code].add(d)
-                    count -= 1
-                    placed = True
+            while count > 0 and self.budget.spend():
+                candidate_days = [d for d in sorted(DAYS, key=lambda d: per_day_load[d]) if d not in subject_used_days[code]]
+                # a new day for this subject if possible, else any day
+                choice = self.best_slot(section, teacher, candidate_days) or self.best_slot(section, teacher, DAYS)
+                if not choice:
                     break
-                if not placed:
-                    placed_any = False
-                    for d in DAYS:
-                        free_slots = [i for i in range(len(TIME_SLOTS)) if i not in BLOCKED and self.is_free(section, d, i, teacher)]
-                        if free_slots:
-                            slot = random.choice(free_slots)
-                            self.mark(section, d, slot, code, teacher)
-                            per_day_load[d] += 1
-                            subject_used_days[code].add(d)
-                            count -= 1
-                            placed_any = True
-                            break
-                    if not placed_any:
-                        break
+                d, slot = choice
+                self.mark(section, d, slot, code, teacher)
+                per_day_load[d] += 1
+                subject_used_days[code].add(d)
+                count -= 1
+            if count > 0:
+                self.unplaced.append({"section": section, "kind": "theory", "subject": code, "periods": count})
+
+    def apply_pins(self, pins):
+        """Place hand-pinned theory/project periods (see manual_edits) before anything else is scheduled."""
+        for pin in pins:
+            section, day, code = pin.get("section"), pin.get("day"), pin.get("code")
+            slot = TIME_SLOTS.index(pin["slot"]) if pin.get("slot") in TIME_SLOTS else -1
+            info = self.subjects.get(code)
+            if section not in self.section_tables or day not in DAYS or not info \
+                    or info["type"].lower() not in ("theory", "project") or info["branch"] != section.split("-")[0]:
+                print(f"[PIN] Skipping {pin}: no such section, day or theory subject")
+                continue
+            teacher = info.get("teacher_id", "")
+            if not self.is_free(section, day, slot, teacher):
+                print(f"[PIN] Skipping {pin}: slot or teacher no longer free")
+                continue
+            self.mark(section, day, slot, code, teacher)
 
     # ---------- assign labs so each batch attends each lab once per week ----------
-    def assign_labs(self, branch, section):
+    def load_lab_subjects(self, branch):
+        """Lab subjects of a branch from the lab catalogue (read once per run, not once per section)."""
+        if branch not in self.lab_subjects:
+            self.lab_subjects[branch] = self._read_lab_subjects(branch)
+        return self.lab_subjects[branch]
+
+    def _read_lab_subjects(self, branch):
         try:
-            df = pd.read_csv("subjects.csv", dtype=str).fillna("")
+            if self._lab_catalogue_df is None:
+                self._lab_catalogue_df = pd.read_csv(self.lab_catalogue, dtype=str).fillna("")
+            df = self._lab_catalogue_df
             lab_rows = df[(df.get("Branch", "").astype(str).str.strip().str.upper() == branch.strip().upper()) &
                           (df.get("Subject Type", df.get("type", "")).astype(str).str.strip().str.lower() == "lab")]
         except Exception:
-            lab_subjects = [s for s in self.subjects.values()
-                            if str(s.get("type", "")).strip().lower() == "lab" and s.get("branch") == branch]
-        else:
-            lab_subjects = []
-            for _, r in lab_rows.iterrows():
-                code = str(r.get("code", "")).strip()
-                name = str(r.get("Subject Name", r.get("name", ""))).strip()
-                tid = str(r.get("teacher_id", "")).strip()
-                chosen = None
-                if code and code in self.subjects:
-                    chosen = self.subjects[code]
-                else:
-                    for c, info in self.subjects.items():
-                        if info.get("branch", "").strip().upper() == branch.strip().upper() and info.get("name", "").strip().upper() == name.upper():
-                            chosen = info; break
-                if chosen:
-                    lab_subjects.append(chosen)
-                else:
-                    lab_subjects.append({"code": code or f"{branch}_LAB_{len(lab_subjects)+1}",
-                                         "branch": branch, "name": name, "type": "Lab", "teacher_id": tid, "credits": 1})
+            return [s for s in self.subjects.values()
+                    if str(s.get("type", "")).strip().lower() == "lab" and s.get("branch") == branch]
+        lab_subjects = []
+        for _, r in lab_rows.iterrows():
+            code = str(r.get("code", "")).strip()
+            name = str(r.get("Subject Name", r.get("name", ""))).strip()
+            tid = str(r.get("teacher_id", "")).strip()
+            chosen = None
+            if code and code in self.subjects:
+                chosen = self.subjects[code]
+            else:
+                for c, info in self.subjects.items():
+                    if info.get("branch", "").strip().upper() == branch.strip().upper() and info.get("name", "").strip().upper() == name.upper():
+                        chosen = info; break
+            if chosen:
+                lab_subjects.append(chosen)
+            else:
+                lab_subjects.append({"code": code or f"{branch}_LAB_{len(lab_subjects)+1}",
+                                     "branch": branch, "name": name, "type": "Lab", "teacher_id": tid, "credits": 1})
+        return lab_subjects
 
+    def assign_labs(self, branch, section):
+        """
+        Rotate every batch through every lab (see lab_rotation): one 2-period session per round.
+
+        All rounds of the section are placed together: the most constrained round first, each onto
+        the free (day, start) block whose day the section uses least for labs, checking the section
+        grid, the lab teachers (busy or unavailable) and the branch's lab rooms. A round with no free
+        block first gets theory periods moved out of the way; a round that still doesn't fit anywhere
+        is left out and recorded in self.unplaced, which makes the run incomplete (see status).
+        Nothing already placed is overwritten and no clash is ever booked.
+        """
+        lab_subjects = self.load_lab_subjects(branch)
         if not lab_subjects:
             return
 
-        # ensure lab rooms
-        lab_pool = LAB_POOLS.get(branch, []).copy()
-        if len(lab_pool) < max(2, len(lab_subjects) * 2):
-            base = lab_pool[0] if lab_pool else f"{branch}_Lab"
-            idx = 1
-            while len(lab_pool) < max(2, len(lab_subjects) * 2):
-                cand = f"{base}_{idx}"
-                if cand not in lab_pool:
-                    lab_pool.append(cand)
-                idx += 1
-
-        sec_letter = section.split("-")[-1]
-        batch1 = f"{sec_letter}1"
-        batch2 = f"{sec_letter}2"
+        batches = batches_for(section)
+        rooms = lab_rooms(branch, min(len(batches), len(lab_subjects)))
 
         # candidate lab days: preferred first, then the rest
         lab_days = [d for d in PREFERRED_LAB_DAYS if d in DAYS] + [d for d in DAYS if d not in PREFERRED_LAB_DAYS]
-
-        # clear prior lab text on lab_days
-        for d in lab_days:
-            for s in ELIGIBLE_LAB_STARTS:
-                if s + 1 >= len(TIME_SLOTS): continue
-                cell = self.section_tables[section][d][s]
-                if cell and isinstance(cell, tuple) and cell[0] and "->" in str(cell[0]):
-                    self.section_tables[section][d][s] = ("", None)
-                    self.section_tables[section][d][s+1] = ("", None)
-
-        # Pair up lab_subjects (two-by-two). For each pair we will schedule TWO sessions (swap) on two different days:
-        # Session DayA: batch1->labA, batch2->labB
-        # Session DayB: batch1->labB, batch2->labA
-        pairs = []
-        it = iter(lab_subjects)
-        while True:
-            try:
-                a = next(it)
-            except StopIteration:
+        blocks = [(d, s) for d in lab_days for s in ELIGIBLE_LAB_STARTS
+                  if s + 1 < len(TIME_SLOTS) and s not in BLOCKED and (s + 1) not in BLOCKED]
+
+        # clear prior lab text
+        for d, s in blocks:
+            cell = self.section_tables[section][d][s]
+            if cell and isinstance(cell, tuple) and cell[0] and "->" in str(cell[0]):
+                self.section_tables[section][d][s] = ("", None)
+                self.section_tables[section][d][s+1] = ("", None)
+
+        # each round: [(batch, lab index)] for the batches that have a lab in it
+        rounds = [[(batch, lab) for batch, lab in zip(batches, row) if lab is not None]
+                  for row in lab_rotation(len(batches), len(lab_subjects))]
+
+        def rank(block, teachers=()):
+            day, start = block
+            return (self.block_penalty(block, teachers), sum(1 for b in batches if day in self.batch_lab_days[(section, b)]),
+                    lab_days.index(day), start)
+
+        def free_blocks(mapping):
+            return [blk for blk in blocks if self.lab_block_free(section, blk, mapping, lab_subjects, rooms)]
+
+        pending = sorted(rounds, key=lambda m: len(free_blocks(m)))
+        for mapping in pending:
+            if not self.budget.spend():
+                self.unplaced.append({"section": section, "kind": "lab", "batches": [b for b, _ in mapping],
+                                      "subjects": [lab_subjects[lab].get("code") for _, lab in mapping]})
+                continue
+            teachers = self.lab_teachers(mapping, lab_subjects)
+            key = lambda blk: rank(blk, teachers)
+            options = free_blocks(mapping)
+            if not options:
+                options = next(([blk] for blk in sorted(blocks, key=key)
+                                if self.clear_lab_block(section, blk, mapping, lab_subjects, rooms)), [])
+            if options:
+                self.place_lab(section, min(options, key=key), mapping, lab_subjects, rooms)
+                continue
+
+            # no block is free for the section, the lab teachers and enough rooms: leave the round out
+            self.unplaced.append({"section": section, "kind": "lab", "batches": [b for b, _ in mapping],
+                                  "subjects": [lab_subjects[lab].get("code") for _, lab in mapping],
+                                  "reason": "no free block"})
+
+    def assigned_teachers(self):
+        """{subject code: teacher_id} as booked: a lab subject's teacher, or the teacher of each theory cell."""
+        assigned = {code: info.get("teacher_id", "") for code, info in self.subjects.items()}
+        for labs in self.lab_subjects.values():
+            assigned.update({lab["code"]: lab.get("teacher_id", "") for lab in labs if lab.get("code")})
+        for grid in self.section_tables.values():
+            for row in grid.values():
+                for code, tid in row.values():
+                    if code and tid and "->" not in str(code):
+                        assigned[code] = tid
+        return assigned
+
+    def lab_teachers(self, mapping, lab_subjects):
+        return {lab_subjects[lab].get("teacher_id", "") for _, lab in mapping} - {""}
+
+    def free_rooms(self, rooms, day, start):
+        return [r for r in rooms if (day, start) not in self.room_busy[r] and (day, start + 1) not in self.room_busy[r]]
+
+    def lab_block_free(self, section, block, mapping, lab_subjects, rooms):
+        day, start = block
+        for offs in (0, 1):
+            if not self.is_free(section, day, start + offs):
+                return False
+            if any((day, start + offs) in self.teacher_busy.get(tid, ()) for tid in self.lab_teachers(mapping, lab_subjects)):
+                return False
+        return len(self.free_rooms(rooms, day, start)) >= len(mapping)
+
+    def clear_lab_block(self, section, block, mapping, lab_subjects, rooms):
+        """Move theory periods out of `block` so the lab fits; the moves are undone if it still doesn't."""
+        day, start = block
+        moves = []
+        for slot in (start, start + 1):
+            code = self.section_tables[section][day][slot][0]
+            if not code:
+                continue
+            move = None if ("->" in str(code) or "UNASSIGNED" in str(code)) else self.move_theory(section, day, slot, avoid=block)
+            if not move:
                 break
-            try:
-                b = next(it)
-            except StopIteration:
-                b = None
-            pairs.append((a, b))
-
-        # We'll try to find two different days for each pair. Use lab_days round-robin.
-        day_cursor = 0
-        for i, (lab_a, lab_b) in enumerate(pairs):
-            # pick two distinct days for the pair, prefer days where neither batch yet has a lab
-            def find_day(start_index):
-                n = len(lab_days)
-                for offset in range(n):
-                    d = lab_days[(start_index + offset) % n]
-                    if d not in self.batch_lab_days[(section, batch1)] and d not in self.batch_lab_days[(section, batch2)]:
-                        return (start_index + offset) % n, d
-                # fallback: return smallest-count day
-                scores = []
-                for idx_d, d in enumerate(lab_days):
-                    cnt = (1 if d in self.batch_lab_days[(section, batch1)] else 0) + (1 if d in self.batch_lab_days[(section, batch2)] else 0)
-                    scores.append((cnt, idx_d, d))
-                scores.sort()
-                return scores[0][1], scores[0][2]
-
-            idx1, day1 = find_day(day_cursor)
-            idx2, day2 = find_day((idx1 + 1) % len(lab_days))
-            # ensure day2 != day1; if equal, pick next best
-            if day2 == day1:
-                for off in range(1, len(lab_days)):
-                    idx_try = (idx1 + off) % len(lab_days)
-                    d_try = lab_days[idx_try]
-                    if d_try != day1:
-                        idx2, day2 = idx_try, d_try
-                        break
-
-            day_cursor = (idx2 + 1) % len(lab_days)
-
-            # pick rooms for lab_a and lab_b (distinct)
-            used_rooms = set()
-            def pick_room(name_key):
-                # try substring match
-                substr = "".join(re.findall(r"[A-Za-z]+", (name_key or "") ) ).lower()[:6]
-                for r in lab_pool:
-                    if r in used_rooms: continue
-                    if substr and substr in r.lower():
-                        used_rooms.add(r); return r
-                for r in lab_pool:
-                    if r not in used_rooms:
-                        used_rooms.add(r); return r
-                # fallback synthetic
-                idx = 1
-                while True:
-                    cand = f"{branch}_Lab_{idx}"
-                    if cand not in used_rooms:
-                        used_rooms.add(cand); return cand
-                    idx += 1
-
-            room_a = pick_room(lab_a.get("name") if lab_a else "")
-            room_b = pick_room(lab_b.get("name") if lab_b else "")
-
-            # If lab_b is None (odd number), pick another distinct room for second session
-            if lab_b is None:
-                room_b = pick_room(lab_a.get("name"))
-
-            # Two sessions: day1 and day2 with swapped mapping
-            sessions = []
-            # session1 mapping (day1)
-            if lab_a and lab_b:
-                # day1: batch1->lab_a, batch2->lab_b
-                sessions.append((day1, [(batch1, room_a, lab_a.get("code")), (batch2, room_b, lab_b.get("code"))]))
-                # day2: batch1->lab_b, batch2->lab_a
-                sessions.append((day2, [(batch1, room_b, lab_b.get("code")), (batch2, room_a, lab_a.get("code"))]))
-            else:
-                # single lab present: schedule twice so both batches attend it once (in distinct rooms)
-                sessions.append((day1, [(batch1, room_a, lab_a.get("code"))]))
-                sessions.append((day2, [(batch2, room_b, lab_a.get("code"))]))
-
-            # Place each session (respectful placement -> relocation -> forced overwrite)
-            for day, mapping in sessions:
-                placed = False
-                # Try respectful placement: find start slot where all required slots are free
-                for start in ELIGIBLE_LAB_STARTS:
-                    if start + 1 >= len(TIME_SLOTS): continue
-                    if start in BLOCKED or (start+1) in BLOCKED: continue
-                    good = True
-                    for (batch, room, code) in mapping:
-                        # Ensure section has free slot (teacher conflicts for labs ignored here except if teacher set)
-                        teacher_ids = set()
-                        # if code present and teacher assigned, block teacher too
-                        if code and code in self.subjects:
-                            tid = self.subjects[code].get("teacher_id","")
-                        else:
-                            tid = None
-                        if not self.is_free(section, day, start, tid) or not self.is_free(section, day, start+1, tid):
-                            good = False; break
-                    if not good: continue
-                    # place mapping
-                    for (batch, room, code) in mapping:
-                        txt = f"{batch} -> {room} ({code})" if code else f"{batch} -> {room}"
-                        existing = self.section_tables[section][day][start][0]
-                        if existing and "->" in str(existing):
-                            self.section_tables[section][day][start] = (existing + "; " + txt, None)
-                        else:
-                            self.section_tables[section][day][start] = (txt, None)
-                        self.section_tables[section][day][start+1] = ("", None)
-                        # mark teacher busy if teacher exists
-                        if code and code in self.subjects:
-                            tid = self.subjects[code].get("teacher_id","")
-                            if tid:
-                                self.teacher_busy[tid].add((day, start)); self.teacher_busy[tid].add((day, start+1))
-                        # record batch day usage
-                        self.batch_lab_days[(section, batch)].add(day)
-                    placed = True
-                    break
-                if placed:
-                    continue
-
-                # Try relocation of conflicting theory classes / move blocking teachers
-                moved_any = False
-                for cand_start in ELIGIBLE_LAB_STARTS:
-                    if cand_start + 1 >= len(TIME_SLOTS): continue
-                    if cand_start in BLOCKED or (cand_start+1) in BLOCKED: continue
-                    target_days = [day] + [d for d in DAYS if d != day]
-                    success = False
-                    for cand_day in target_days:
-                        can_place = True
-                        for (batch, room, code) in mapping:
-                            # teacher check if code maps to teacher
-                            tid = self.subjects.get(code,{}).get("teacher_id","") if code else None
-                            if not self.is_free(section, cand_day, cand_start, tid) or not self.is_free(section, cand_day, cand_start+1, tid):
-                                can_place = False; break
-                        if not can_place: continue
-                        # place mappings
-                        for (batch, room, code) in mapping:
-                            txt = f"{batch} -> {room} ({code})" if code else f"{batch} -> {room}"
-                            existing = self.section_tables[section][cand_day][cand_start][0]
-                            if existing and "->" in str(existing):
-                                self.section_tables[section][cand_day][cand_start] = (existing + "; " + txt, None)
-                            else:
-                                self.section_tables[section][cand_day][cand_start] = (txt, None)
-                            self.section_tables[section][cand_day][cand_start+1] = ("", None)
-                            if code and code in self.subjects:
-                                tid = self.subjects[code].get("teacher_id","")
-                                if tid:
-                                    self.teacher_busy[tid].add((cand_day, cand_start)); self.teacher_busy[tid].add((cand_day, cand_start+1))
-                            self.batch_lab_days[(section, batch)].add(cand_day)
-                        success = True
-                        break
-                    if success:
-                        moved_any = True
-                        break
-
-                    # attempt to move blocking teachers' classes around (same logic as previous versions)
-                    blocking = set()
-                    for tid, slots in list(self.teacher_busy.items()):
-                        if (day, cand_start) in slots or (day, cand_start+1) in slots:
-                            blocking.add(tid)
-                    moved_flag = False
-                    for blocking_tid in blocking:
-                        conflict_slots = [(d,s) for (d,s) in list(self.teacher_busy.get(blocking_tid, set()))
-                                          if d == day and (s == cand_start or s == cand_start+1)]
-                        for conf_day, conf_slot in conflict_slots:
-                            for sec2, grid2 in self.section_tables.items():
-                                cell = grid2[conf_day][conf_slot]
-                                if cell and isinstance(cell, tuple) and cell[0] and cell[1] == blocking_tid:
-                                    subj_to_move = cell[0]
-                                    for alt_day in DAYS:
-                                        for alt_slot in range(len(TIME_SLOTS)):
-                                            if alt_slot in BLOCKED: continue
-                                            if self.is_free(sec2, alt_day, alt_slot, blocking_tid):
-                                                self.section_tables[sec2][alt_day][alt_slot] = (subj_to_move, blocking_tid)
-                                                self.section_tables[sec2][conf_day][conf_slot] = ("", None)
-                                                self.teacher_busy[blocking_tid].discard((conf_day, conf_slot))
-                                                self.teacher_busy[blocking_tid].add((alt_day, alt_slot))
-                                                moved_flag = True
-                                                break
-                                        if moved_flag: break
-                                if moved_flag: break
-                            if moved_flag:
-                                # after move attempt place mappings
-                                if all(self.is_free(section, day, cand_start+offs, "") for offs in (0,1)):
-                                    for (batch, room, code) in mapping:
-                                        txt = f"{batch} -> {room} ({code})" if code else f"{batch} -> {room}"
-                                        existing = self.section_tables[section][day][cand_start][0]
-                                        if existing and "->" in str(existing):
-                                            self.section_tables[section][day][cand_start] = (existing + "; " + txt, None)
-                                        else:
-                                            self.section_tables[section][day][cand_start] = (txt, None)
-                                        self.section_tables[section][day][cand_start+1] = ("", None)
-                                        if code and code in self.subjects:
-                                            tid = self.subjects[code].get("teacher_id","")
-                                            if tid:
-                                                self.teacher_busy[tid].add((day, cand_start)); self.teacher_busy[tid].add((day, cand_start+1))
-                                        self.batch_lab_days[(section, batch)].add(day)
-                                    moved_any = True
-                                    break
-                            if moved_any: break
-                        if moved_any: break
-                    if moved_any:
-                        break
-
-                if moved_any:
-                    placed = True
-                    continue
-
-                # 3) FORCE OVERWRITE (last resort) - try to move blocking teacher then overwrite
-                forced_done = False
-                for fstart in ELIGIBLE_LAB_STARTS:
-                    if fstart + 1 >= len(TIME_SLOTS): continue
-                    if fstart in BLOCKED or (fstart+1) in BLOCKED: continue
-                    cell = self.section_tables[section][day][fstart]
-                    if cell and isinstance(cell, tuple) and cell[1]:
-                        blocking_tid = cell[1]
-                        moved = False
-                        for alt_day in DAYS:
-                            for alt_slot in range(len(TIME_SLOTS)):
-                                if alt_slot in BLOCKED: continue
-                                if self.is_free(section, alt_day, alt_slot, blocking_tid):
-                                    subj_to_move = cell[0]
-                                    self.section_tables[section][alt_day][alt_slot] = (subj_to_move, blocking_tid)
-                                    self.section_tables[section][day][fstart] = ("", None)
-                                    self.teacher_busy[blocking_tid].discard((day, fstart))
-                                    self.teacher_busy[blocking_tid].add((alt_day, alt_slot))
-                                    moved = True
-                                    break
-                            if moved: break
-                    # write mapping overwriting any theory entries
-                    for (batch, room, code) in mapping:
-                        txt = f"{batch} -> {room} ({code})" if code else f"{batch} -> {room}"
-                        existing = self.section_tables[section][day][fstart][0]
-                        if existing and "->" in str(existing):
-                            self.section_tables[section][day][fstart] = (existing + "; " + txt, None)
-                        else:
-                            self.section_tables[section][day][fstart] = (txt, None)
-                        self.section_tables[section][day][fstart+1] = ("", None)
-                        self.batch_lab_days[(section, batch)].add(day)
-                    forced_done = True
-                    break
-                if forced_done:
-                    placed = True
-                    continue
-
-                # 4) last-resort unassigned markers (shouldn't happen)
-                for uday in DAYS:
-                    for ustart in ELIGIBLE_LAB_STARTS:
-                        if ustart + 1 >= len(TIME_SLOTS): continue
-                        if ustart in BLOCKED or (ustart+1) in BLOCKED: continue
-                        if not self.section_tables[section][uday][ustart][0] and not self.section_tables[section][uday][ustart+1][0]:
-                            for (batch, room, code) in mapping:
-                                self.section_tables[section][uday][ustart] = (f"**UNASSIGNED-LAB {code}({batch})**", None)
-                                self.section_tables[section][uday][uday] = ("", None)
-                                self.batch_lab_days[(section, batch)].add(uday)
-                            placed = True
-                            break
-                    if placed: break
-                if placed:
-                    continue
-
-        # end pairs loop
+            moves.append(move)
+        else:
+            if self.lab_block_free(section, block, mapping, lab_subjects, rooms):
+                return True
+        for src, dst in reversed(moves):
+            self.move_theory(section, dst[0], dst[1], to=src)
+        return False
+
+    def move_theory(self, section, day, slot, avoid=None, to=None):
+        """Move the period at (day, slot) to `to`, or to a slot free for section and teacher; returns (from, to)."""
+        code, tid = self.section_tables[section][day][slot]
+        if to is None:
+            grid = self.section_tables[section]
+            has_code = {d for d in DAYS if any(grid[d][s][0] == code for s in range(len(TIME_SLOTS)))}
+            skip = {(avoid[0], avoid[1]), (avoid[0], avoid[1] + 1)} if avoid else set()
+            to = next(((d, s) for d in sorted(DAYS, key=lambda d: d in has_code) for s in range(len(TIME_SLOTS))
+                       if (d, s) not in skip and self.is_free(section, d, s, tid)), None)
+            if to is None:
+                return None
+        self.section_tables[section][to[0]][to[1]] = (code, tid)
+        self.section_tables[section][day][slot] = ("", None)
+        if tid:
+            self.release(tid, day, slot)
+            self.occupy(tid, *to)
+        return (day, slot), to
+
+    def place_lab(self, section, block, mapping, lab_subjects, rooms):
+        day, start = block
+        free = self.free_rooms(rooms, day, start)
+        parts = []
+        for batch, lab in mapping:
+            # each lab keeps its "home" room when that is free
+            home = rooms[lab % len(rooms)]
+            room = home if home in free else (free[0] if free else home)
+            if room in free:
+                free.remove(room)
+            code = lab_subjects[lab].get("code")
+            parts.append(f"{batch} -> {room} ({code})" if code else f"{batch} -> {room}")
+            self.room_busy[room].update({(day, start), (day, start + 1)})
+            self.batch_lab_days[(section, batch)].add(day)
+        self.section_tables[section][day][start] = ("; ".join(parts), None)
+        self.section_tables[section][day][start+1] = ("", None)
+        for tid in self.lab_teachers(mapping, lab_subjects):
+            self.occupy(tid, day, start)
+            self.occupy(tid, day, start + 1)
+
+    # ---------- checkpoints ----------
+    def checkpoint(self, path):
+        """Write the grid and busy maps after the last finished step (atomically) so a run can resume."""
+        state = {
+            "version": 1,
+            "done": self.done,
+            "tables": {sec: {d: [list(grid[d][i]) for i in range(len(TIME_SLOTS))] for d in DAYS}
+                       for sec, grid in self.section_tables.items()},
+            "teacher_busy": {tid: sorted(busy) for tid, busy in self.teacher_busy.items() if busy},
+            "room_busy": {room: sorted(busy) for room, busy in self.room_busy.items() if busy},
+            "batch_lab_days": [[sec, batch, sorted(days)] for (sec, batch), days in self.batch_lab_days.items() if days],
+            "teacher_load": [[tid, day, n] for (tid, day), n in self.teacher_load.items() if n],
+            "violations": {tid: dict(kinds) for tid, kinds in self.violations.items()},
+            "penalty": self.penalty,
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def restore(self, path):
+        """Load a checkpoint written by checkpoint(); returns the finished steps to skip."""
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        for sec, days in state["tables"].items():
+            if sec in self.section_tables:
+                self.section_tables[sec] = {d: {i: tuple(cell) for i, cell in enumerate(cells)} for d, cells in days.items()}
+        self.teacher_busy = defaultdict(set, {tid: {tuple(x) for x in busy} for tid, busy in state["teacher_busy"].items()})
+        self.room_busy = defaultdict(set, {room: {tuple(x) for x in busy} for room, busy in state["room_busy"].items()})
+        self.batch_lab_days = defaultdict(set, {(sec, batch): set(days) for sec, batch, days in state["batch_lab_days"]})
+        self.done = [list(step) for step in state["done"]]
+        self.teacher_load = defaultdict(int, {(tid, day): n for tid, day, n in state.get("teacher_load", [])})
+        self.violations = defaultdict(lambda: defaultdict(int))
+        for tid, kinds in state.get("violations", {}).items():
+            self.violations[tid].update(kinds)
+        self.penalty = state.get("penalty", 0)
+        for tid, prefs in self.availability.items():
+            self.teacher_busy[tid].update(prefs["unavailable"])
+        return {tuple(step) for step in self.done}
+
+    @property
+    def status(self):
+        total = 2 * len(self.section_tables)
+        # a finished run can still be incomplete: periods or labs that fit nowhere are in unplaced
+        return {
+            "complete": self.budget.reason is None and len(self.done) == total and not self.unplaced,
+            "reason": self.budget.reason or ("unplaced" if self.unplaced else None),
+            "steps": self.budget.steps,
+            "elapsed": round(time.time() - self.budget.started, 3),
+            "done": len(self.done),
+            "total": total,
+            "unplaced": self.unplaced,
+            "preferences": self.preference_report(),
+        }
 
-    def export_csvs(self):
+    def export_csvs(self, write_xlsx=True):
+        out_dir = self.out_dir
+        if not out_dir:
+            raise ValueError("TimeTable has no out_dir to export to")
+        os.makedirs(out_dir, exist_ok=True)
         overall = []
         subj_counts = defaultdict(int)
 
@@ -570,7 +703,7 @@ class TimeTable:
                         tname = self.teachers.get(tid, "") if tid else ""
                         overall.append({
                             "Day": day, "Branch": branch, "Section": sec_letter,
-                            "Batch": f"{sec_letter}1 & {sec_letter}2",
+                            "Batch": " & ".join(batches_for(sec)),
                             "Time": TIME_SLOTS[idx],
                             "Activity": "Theory/Project",
                             "Room": f"{sec_letter}-Classroom",
@@ -579,26 +712,30 @@ class TimeTable:
                         if subj_code:
                             subj_counts[subj_code] += 1
 
-        df_overall = pd.DataFrame(overall)
+        # explicit columns so a run stopped before placing anything still writes a header
+        df_overall = pd.DataFrame(overall, columns=["Day", "Branch", "Section", "Batch", "Time", "Activity", "Room", "Subject/Notes"])
         if not df_overall.empty:
             df_overall = df_overall.sort_values(by=["Branch","Section","Day","Time","Batch"])
-        df_overall.to_csv(os.path.join(OUT_DIR, "overall_schedule.csv"), index=False, encoding="utf-8")
-        print(f"✅ Wrote overall CSV: {os.path.join(OUT_DIR, 'overall_schedule.csv')}")
+        df_overall.to_csv(os.path.join(out_dir, "overall_schedule.csv"), index=False, encoding="utf-8")
+        print(f"✅ Wrote overall CSV: {os.path.join(out_dir, 'overall_schedule.csv')}")
 
         alloc_rows = [{"Subject": k, "TotalPeriods": v} for k, v in subj_counts.items()]
-        pd.DataFrame(alloc_rows).to_csv(os.path.join(OUT_DIR, "allocation_summary.csv"), index=False)
-        print(f"✅ Wrote allocation summary: {os.path.join(OUT_DIR, 'allocation_summary.csv')}")
-
-        wb = Workbook()
-        if wb.active: wb.remove(wb.active)
+        pd.DataFrame(alloc_rows).to_csv(os.path.join(out_dir, "allocation_summary.csv"), index=False)
+        print(f"✅ Wrote allocation summary: {os.path.join(out_dir, 'allocation_summary.csv')}")
+
+        self.sheets = self.build_sheets()
+        if write_xlsx:
+            excel_path = write_workbook(self.sheets, os.path.join(out_dir, "All_Timetables_v5.xlsx"))
+            print(f"✅ Wrote Excel timetables: {excel_path}")
+        return self.sheets
+
+    def build_sheets(self):
+        """One sheet per section: header row + one row per day (same cell text the XLSX used to get)."""
+        sheets = {}
+        header = ["Day"] + TIME_SLOTS
         for sec, grid in self.section_tables.items():
-            ws = wb.create_sheet(sec)
-            header = ["Day"] + TIME_SLOTS
-            ws.append(header)
-            for col in range(1, len(header) + 1):
-                c = ws.cell(row=1, column=col)
-                c.font = Font(bold=True)
-            for row_idx, day in enumerate(DAYS, start=2):
+            rows = [header]
+            for day in DAYS:
                 row = [day]
                 for idx in range(len(TIME_SLOTS)):
                     if idx in BLOCKED:
@@ -615,56 +752,78 @@ class TimeTable:
                             pretty.append(f"{left.strip()} -> {right.strip()}")
                         row.append("\n".join(pretty))
                     else:
-                        if isinstance(cell, tuple):
-                            subj_code, tid = cell
-                            tname = self.teachers.get(tid, "") if tid else ""
-                            txt = subj_code
-                        else:
-                            txt = str(val)
+                        txt = cell[0] if isinstance(cell, tuple) else str(val)
                         row.append(txt)
-                ws.append(row)
-            for col_idx in range(1, len(header) + 1):
-                col_letter = ws.cell(row=1, column=col_idx).column_letter
-                ws.column_dimensions[col_letter].width = 20 if col_idx > 1 else 12
-                for r in range(1, len(DAYS) + 2):
-                    c = ws.cell(row=r, column=col_idx)
-                    c.alignment = Alignment(wrap_text=True, vertical="top")
-        excel_path = os.path.join(OUT_DIR, "All_Timetables_v5.xlsx")
-        wb.save(excel_path)
-        print(f"✅ Wrote Excel timetables: {excel_path}")
+                rows.append(row)
+            sheets[sec] = rows
+        return sheets
 
 # ---------- MAIN ----------
-def main():
+def main(input_dir, out_dir, write_xlsx=True, budget=None, resume=None):
+    """
+    Run the scheduler and return the TimeTable (per-section sheets in tt.sheets; XLSX only when write_xlsx).
+    Inputs are read from input_dir and outputs written to out_dir, so each job can use its own workspace.
+
+    The run is anytime: with a Budget it stops placing once the budget is spent and exports the
+    best-so-far grid, with what is missing in tt.status["unplaced"]. After every finished section
+    step the state is saved to out_dir/checkpoint.json; `resume` (a checkpoint path) continues from one.
+    """
     # Prefer subjects_with_teachers.csv if it exists, as it contains teacher constraints
-    if os.path.exists("subjects_with_teachers.csv"):
-        subj_csv = "subjects_with_teachers.csv"
+    if os.path.exists(os.path.join(input_dir, "subjects_with_teachers.csv")):
+        subj_csv = os.path.join(input_dir, "subjects_with_teachers.csv")
         print(f"[INFO] Using {subj_csv} for scheduling (includes teacher constraints).")
     else:
-        subj_csv = "subjects.csv"
+        subj_csv = os.path.join(input_dir, "subjects.csv")
         print(f"[INFO] Using {subj_csv} for scheduling (no teacher constraints).")
 
-    teacher_csv = "teachers.csv"
+    teacher_csv = os.path.join(input_dir, "teachers.csv")
 
     if not os.path.exists(subj_csv):
         raise FileNotFoundError(f"Required file not found: {subj_csv}")
 
+    configure(load_config(os.path.join(input_dir, CONFIG_FILE)))
     subject_map, teacher_map = load_subjects_teachers(subj_csv, teacher_csv)
-    tt = TimeTable(subject_map, teacher_map)
+    availability = load_availability(os.path.join(input_dir, AVAILABILITY_FILE))
+    tt = TimeTable(subject_map, teacher_map, lab_catalogue=os.path.join(input_dir, "subjects.csv"),
+                   out_dir=out_dir, budget=budget, availability=availability)
 
     for branch, secs in BRANCH_SECTIONS.items():
         for s in secs:
             sec_code = f"{branch}-{s}"
             tt.init_section(sec_code)
 
+    done = set()
+    pins_path = os.path.join(input_dir, "pins.json")
+    if resume:
+        done = tt.restore(resume)
+        print(f"[SCHEDULE] Resuming after {len(done)} finished steps")
+    elif os.path.exists(pins_path):
+        with open(pins_path, encoding="utf-8") as f:
+            tt.apply_pins(json.load(f).get("pins", []))
+
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint_path = os.path.join(out_dir, "checkpoint.json")
     for branch, secs in BRANCH_SECTIONS.items():
         for s in secs:
             sec_code = f"{branch}-{s}"
             print(f"[SCHEDULE] Processing {sec_code}")
-            tt.assign_theory_and_project(sec_code)
-            tt.assign_labs(branch, sec_code)
-
-    tt.export_csvs()
-    print("All scheduling complete.")
+            for step, assign in (("theory", tt.assign_theory_and_project), ("labs", lambda sec: tt.assign_labs(branch, sec))):
+                if (sec_code, step) in done:
+                    continue
+                assign(sec_code)
+                if tt.budget.reason is None:
+                    tt.done.append([sec_code, step])
+                    tt.checkpoint(checkpoint_path)
+
+    tt.export_csvs(write_xlsx=write_xlsx)
+    if tt.budget.reason:
+        print(f"⚠️ Scheduling stopped ({tt.budget.reason}) after {tt.budget.steps} steps; "
+              f"{len(tt.unplaced)} items unplaced")
+    elif tt.unplaced:
+        print(f"⚠️ Scheduling finished with {len(tt.unplaced)} items that fit nowhere")
+    else:
+        print("All scheduling complete.")
+    return tt
 
 if __name__ == "__main__":
-    main()
+    main(".", OUT_DIR)
@@ -0,0 +1,549 @@
+# timetable_index.py
+"""
+In-memory index over a generated timetable JSON.
+
+The JSON written by the pipeline looks like:
+    { "CSE-A": [ { "Day": "MON", "09:00-10:00": "CODE — Teacher Name (TCHR_001)", ... }, ... ], ... }
+
+Parsing it on every request is what made the teacher/substitute lookups slow, so we parse each
+file once and keep a per-slot index around until the file changes on disk.
+"""
+import bisect
+import contextvars
+import csv
+import difflib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+
+TEACHER_ID_RE = re.compile(r"\(([^()]+)\)")
+STOP_TOKENS = {"and", "the", "of", "lab", "laboratory", "laboratories", "i", "ii", "iii", "iv", "v", "vi", "la"}
+
+
+# ---------- cell parsing ----------
+def parse_cell(text):
+    """
+    Split a cell into (code, teacher_id, teacher_name) entries, one per line.
+    Handles "CODE — Name (ID)", "CODE — ID" and "CODE — (no teacher)".
+    """
+    if not text or not isinstance(text, str):
+        return []
+    entries = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        code, _, rest = line.partition("—")
+        code, rest = code.strip(), rest.strip()
+        tid, tname = "", ""
+        m = TEACHER_ID_RE.search(rest)
+        if m and m.group(1) != "no teacher":
+            tid = m.group(1).strip()
+            tname = rest[:m.start()].strip()
+        elif rest and not m and " " not in rest:
+            tid = rest
+        entries.append((code, tid, tname))
+    return entries
+
+
+# ---------- index ----------
+class TimetableIndex:
+    """
+    Precomputed views over one generation:
+      - sections[section][day][slot]  -> raw cell text (exact JSON value)
+      - busy[(day, slot)]             -> set of teacher ids teaching in that slot
+      - teacher_slots[tid]            -> list of (day, slot, section, code)
+      - teacher_cells[tid]            -> list of (section, day, slot, raw cell) for every "(tid)" in a cell
+      - daily_load[(tid, day)]        -> number of periods taught that day
+      - continued[(section, day, slot)] -> lab cell text running on from the slot before
+
+    The JSON lists a lab at its first period only; `labs` - the (section, day, slot) lab starts,
+    see lab_starts() - makes busy / teacher_slots / daily_load cover its second period too.
+    """
+
+    def __init__(self, data, labs=()):
+        self.data = data
+        self.labs = set(labs)
+        self.continued = {}
+        self.days = []
+        self.slots = []
+        self.sections = {}
+        self.busy = defaultdict(set)
+        self.teacher_slots = defaultdict(list)
+        self.teacher_cells = defaultdict(list)
+        self.teacher_names = {}
+        self.daily_load = defaultdict(int)
+        self._build()
+
+    def _build(self):
+        for section, rows in self.data.items():
+            grid = {}
+            for row in rows or []:
+                day = row.get("Day")
+                if not day:
+                    continue
+                if day not in self.days:
+                    self.days.append(day)
+                cells = {}
+                slots = [k for k in row if k != "Day"]
+                for i, slot in enumerate(slots):
+                    content = row[slot]
+                    if slot not in self.slots:
+                        self.slots.append(slot)
+                    cells[slot] = content
+                    if not content or not isinstance(content, str):
+                        continue
+                    for key in set(TEACHER_ID_RE.findall(content)):
+                        self.teacher_cells[key].append((section, day, slot, content))
+                    occupied = [slot]
+                    if (section, day, slot) in self.labs and i + 1 < len(slots):
+                        occupied.append(slots[i + 1])
+                        self.continued[(section, day, slots[i + 1])] = content
+                    seen = set()
+                    for code, tid, tname in parse_cell(content):
+                        if not tid or tid in seen:
+                            continue
+                        seen.add(tid)
+                        if tname:
+                            self.teacher_names.setdefault(tid, tname)
+                        for at in occupied:
+                            self.busy[(day, at)].add(tid)
+                            self.teacher_slots[tid].append((day, at, section, code))
+                            self.daily_load[(tid, day)] += 1
+                grid[day] = cells
+            self.sections[section] = grid
+
+    def teacher_schedule(self, teacher_id, days):
+        """Rebuild the "My Schedule" rows for a teacher without rescanning the whole file."""
+        my_schedule = {day: {"Day": day} for day in days}
+        for section, day, slot, content in self.teacher_cells.get(teacher_id, []):
+            if day not in my_schedule:
+                continue
+            existing = my_schedule[day].get(slot)
+            new_entry = f"{content.split('—')[0].strip()} ({section})"
+            my_schedule[day][slot] = f"{existing}\n{new_entry}" if existing else new_entry
+        return [my_schedule[day] for day in days]
+
+    def is_busy(self, teacher_id, day, slot):
+        return teacher_id in self.busy.get((day, slot), ())
+
+    def project(self, sections=None, fields=None):
+        """
+        Subset of the parsed JSON: only `sections` (all if None) and, per row, only `fields`
+        (plus "Day", which always stays so rows remain identifiable).
+        """
+        names = [s for s in sections if s in self.data] if sections else list(self.data)
+        if not fields:
+            return {name: self.data[name] for name in names}
+        keep = {"Day", *fields}
+        return {name: [{k: v for k, v in row.items() if k in keep} for row in self.data[name]] for name in names}
+
+
+def changed_keys(old, new):
+    """(sections, teacher ids) whose cells differ between two indexes; everything in `new` if old is None."""
+    if old is None:
+        return sorted(new.sections), sorted(new.teacher_slots)
+    sections = sorted(s for s in set(old.sections) | set(new.sections)
+                      if old.sections.get(s) != new.sections.get(s))
+    teachers = sorted(t for t in set(old.teacher_cells) | set(new.teacher_cells)
+                      if sorted(old.teacher_cells.get(t, ())) != sorted(new.teacher_cells.get(t, ())))
+    return sections, teachers
+
+
+# ---------- diff between generations ----------
+def _ordered_union(a, b):
+    return list(dict.fromkeys([*a, *b]))
+
+
+def _session(section, day, slot, entry):
+    code, tid, tname = entry
+    return {"section": section, "day": day, "slot": slot, "code": code, "teacher_id": tid, "teacher_name": tname}
+
+
+def diff(old, new):
+    """
+    Cell-level changes from `old` to `new`: sessions that moved, were added or were removed.
+
+    Sections, then day rows, are compared as a whole first and skipped when equal, so the work is
+    proportional to what changed. A removed and an added session with the same section, subject
+    and teacher are reported as one move.
+    """
+    removed, added = [], []
+    for section in _ordered_union(old.sections, new.sections):
+        old_grid, new_grid = old.sections.get(section, {}), new.sections.get(section, {})
+        if old_grid == new_grid:
+            continue
+        for day in _ordered_union(old_grid, new_grid):
+            old_row, new_row = old_grid.get(day, {}), new_grid.get(day, {})
+            if old_row == new_row:
+                continue
+            for slot in _ordered_union(old_row, new_row):
+                before, after = old_row.get(slot), new_row.get(slot)
+                if before == after:
+                    continue
+                before, after = parse_cell(before), parse_cell(after)
+                removed.extend(_session(section, day, slot, e) for e in before if e not in after)
+                added.extend(_session(section, day, slot, e) for e in after if e not in before)
+
+    pending = defaultdict(list)
+    for s in removed:
+        pending[(s["section"], s["code"], s["teacher_id"])].append(s)
+    moved, still_added = [], []
+    for s in added:
+        candidates = pending.get((s["section"], s["code"], s["teacher_id"]))
+        if candidates:
+            src = candidates.pop(0)
+            moved.append({**src, "from": {"day": src["day"], "slot": src["slot"]}, "to": {"day": s["day"], "slot": s["slot"]}})
+        else:
+            still_added.append(s)
+    still_removed = [s for group in pending.values() for s in group]
+    for m in moved:
+        del m["day"], m["slot"]
+
+    changes = {"moved": moved, "added": still_added, "removed": still_removed}
+    by_section = defaultdict(lambda: {"moved": [], "added": [], "removed": []})
+    by_teacher = defaultdict(lambda: {"moved": [], "added": [], "removed": []})
+    for kind, items in changes.items():
+        for s in items:
+            by_section[s["section"]][kind].append(s)
+            if s["teacher_id"]:
+                by_teacher[s["teacher_id"]][kind].append(s)
+    return {
+        "summary": {kind: len(items) for kind, items in changes.items()},
+        "sections": dict(by_section),
+        "teachers": dict(by_teacher),
+    }
+
+
+MAX_CACHED_DIFFS = 32
+_diff_cache = OrderedDict()
+
+
+def load_diff(old_path, new_path):
+    """diff() of two generation files, cached per pair (and invalidated if either file changes)."""
+    stamps = []
+    for path in (Path(old_path), Path(new_path)):
+        st = path.stat()
+        stamps.append((str(path), st.st_mtime_ns, st.st_size))
+    key = tuple(stamps)
+    with _cache_lock:
+        if key in _diff_cache:
+            _diff_cache.move_to_end(key)
+            return _diff_cache[key]
+    result = diff(load_index(old_path), load_index(new_path))
+    with _cache_lock:
+        _diff_cache[key] = result
+        while len(_diff_cache) > MAX_CACHED_DIFFS:
+            _diff_cache.popitem(last=False)
+    return result
+
+
+# ---------- mtime-keyed cache ----------
+# Entries are grouped by scope (the tenant, see tenants.py). A scope keeps at most MAX_CACHED parsed
+# files, and all scopes together stay under CACHE_BUDGET bytes, estimated as SIZE_FACTOR x the source
+# file's size. Over budget, the least recently active other scope is dropped whole - idle tenants make
+# room for busy ones - and only then the active scope's own oldest entries.
+MAX_CACHED = 16          # parsed files kept per scope (older generations are evicted first)
+CACHE_BUDGET = int(float(os.environ.get("TIBL_CACHE_BUDGET_MB", 256)) * 2 ** 20)
+SIZE_FACTOR = 8          # parsed Python objects vs. the file they came from, roughly
+
+cache_scope = contextvars.ContextVar("tibl_cache_scope", default="")
+_cache = {}              # scope -> OrderedDict (kind, path) -> (stamp, value, size)
+_scope_bytes = OrderedDict()   # scope -> estimated bytes, least recently used first
+_cache_lock = threading.Lock()
+
+
+def cached(kind, path, builder):
+    """Return builder(path), rebuilt only when the file's mtime or size changes."""
+    path = Path(path)
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = (kind, str(path))
+    scope = cache_scope.get()
+    entries = _cache.get(scope)
+    hit = entries.get(key) if entries is not None else None
+    if hit and hit[0] == stamp:
+        with _cache_lock:
+            if scope in _scope_bytes and key in entries:
+                entries.move_to_end(key)
+                _scope_bytes.move_to_end(scope)
+        return hit[1]
+    value = builder(path)
+    size = max(st.st_size, 1) * SIZE_FACTOR
+    with _cache_lock:
+        entries = _cache.setdefault(scope, OrderedDict())
+        old = entries.pop(key, None)
+        entries[key] = (stamp, value, size)
+        _scope_bytes[scope] = _scope_bytes.get(scope, 0) + size - (old[2] if old else 0)
+        _scope_bytes.move_to_end(scope)
+        while len(entries) > MAX_CACHED:
+            _drop(scope, next(iter(entries)))
+        _enforce_budget(scope)
+    return value
+
+
+def _drop(scope, key):
+    _, _, size = _cache[scope].pop(key)
+    _scope_bytes[scope] -= size
+
+
+def _enforce_budget(active):
+    while sum(_scope_bytes.values()) > CACHE_BUDGET:
+        idle = next((s for s in _scope_bytes if s != active), None)
+        if idle is not None:
+            evict_scope(idle, locked=True)
+        elif len(_cache[active]) > 1:
+            _drop(active, next(iter(_cache[active])))
+        else:
+            break
+
+
+def evict_scope(scope, locked=False):
+    """Forget everything cached for one scope."""
+    if not locked:
+        with _cache_lock:
+            return evict_scope(scope, locked=True)
+    _cache.pop(scope, None)
+    _scope_bytes.pop(scope, None)
+
+
+def cache_stats():
+    with _cache_lock:
+        return {"budget_bytes": CACHE_BUDGET, "used_bytes": sum(_scope_bytes.values()),
+                "scopes": {s: {"entries": len(_cache.get(s, ())), "bytes": b} for s, b in _scope_bytes.items()}}
+
+
+def lab_starts(csv_path):
+    """(section, day, slot) of every lab start in an overall_schedule.csv; empty if the file is missing."""
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        return set()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return {(f"{r.get('Branch', '')}-{r.get('Section', '')}", r.get("Day", ""), r.get("Time", ""))
+                for r in csv.DictReader(f) if (r.get("Activity") or "").lower() == "lab"}
+
+
+def _load_index(path):
+    # labs come from the generation's CSV next to the JSON (a pruned CSV must be materialized first)
+    return TimetableIndex(json.loads(path.read_text(encoding="utf-8"), parse_constant=lambda _: None),
+                          lab_starts(path.with_suffix(".csv")))
+
+
+def load_index(path):
+    return cached("index", path, _load_index)
+
+
+def _load_teachers(path):
+    teachers = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            tid = (row.get("id") or "").strip()
+            if tid:
+                teachers[tid] = (row.get("name") or "").strip()
+    return teachers
+
+
+def load_teachers(path):
+    """id -> name from teachers.csv."""
+    return cached("teachers", path, _load_teachers)
+
+
+def tokenize(text):
+    s = re.sub(r"[^\w]", " ", str(text or "")).lower()
+    return {t for t in s.split() if len(t) > 1 and t not in STOP_TOKENS and not t.isdigit()}
+
+
+def _load_catalogue(path):
+    catalogue = defaultdict(list)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            tid = (row.get("teacher_id") or "").strip()
+            name = (row.get("Subject Name") or "").strip()
+            if tid and name:
+                catalogue[tid].append(((row.get("Branch") or "").strip().upper(), name, tokenize(name)))
+    return dict(catalogue)
+
+
+def load_catalogue(path):
+    """teacher_id -> [(branch, subject name, tokens)] from subjects_with_teachers.csv."""
+    return cached("catalogue", path, _load_catalogue)
+
+
+# ---------- substitutes ----------
+def subject_affinity(absent_subjects, candidate_subjects):
+    """Best token overlap between what the absent teacher and the candidate teach, +0.5 for a shared branch."""
+    best = 0.0
+    for a_branch, _, a_tok in absent_subjects:
+        for c_branch, _, c_tok in candidate_subjects:
+            score = len(a_tok & c_tok) / len(a_tok | c_tok) if a_tok and c_tok else 0.0
+            if a_branch and a_branch == c_branch:
+                score += 0.5
+            best = max(best, score)
+    return round(best, 3)
+
+
+def find_substitutes(index, teacher_id, day, teachers, catalogue, limit=5, unavailable=None):
+    """
+    For every slot the absent teacher teaches on `day`, list free teachers ranked by
+    subject affinity (desc) then that day's load (asc). Teachers marked unavailable for the
+    slot ({tid: {(day, slot)}}, see timetable.unavailable_cells) are never suggested.
+    """
+    unavailable = unavailable or {}
+    absent_subjects = catalogue.get(teacher_id, [])
+    candidates = [tid for tid in teachers if tid != teacher_id]
+    affinity = {tid: subject_affinity(absent_subjects, catalogue.get(tid, [])) for tid in candidates}
+
+    slot_order = {s: i for i, s in enumerate(index.slots)}
+    affected = sorted((e for e in index.teacher_slots.get(teacher_id, []) if e[0] == day),
+                      key=lambda e: (slot_order.get(e[1], 0), e[2]))
+
+    results = []
+    for _, slot, section, code in affected:
+        busy = index.busy.get((day, slot), set())
+        free = [tid for tid in candidates if tid not in busy and (day, slot) not in unavailable.get(tid, ())]
+        free.sort(key=lambda tid: (-affinity[tid], index.daily_load.get((tid, day), 0), tid))
+        results.append({
+            "day": day,
+            "slot": slot,
+            "section": section,
+            "subject": code,
+            "candidates": [{
+                "id": tid,
+                "name": teachers.get(tid) or index.teacher_names.get(tid, ""),
+                "affinity": affinity[tid],
+                "load": index.daily_load.get((tid, day), 0),
+            } for tid in free[:limit]],
+        })
+    return results
+
+
+# ---------- search ----------
+SEARCH_FIELDS = ("subject", "teacher", "room", "batch", "section")
+SEARCH_TERM_RE = re.compile(r"[a-z0-9]+")
+FUZZY_MIN_RATIO = 0.75
+DAY_ORDER = {d: i for i, d in enumerate(["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"])}
+
+
+def search_terms(text):
+    """Lower-cased alphanumeric runs of `text`, plus the whole value with separators dropped ("CSE_Lab1" -> cselab1)."""
+    parts = SEARCH_TERM_RE.findall(str(text or "").lower())
+    return set(parts) | ({"".join(parts)} if len(parts) > 1 else set())
+
+
+def _trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Inverted index over one generation's schedule CSV, for "where is X" lookups.
+
+      hits[i]                  -> one session: section, day, slots (labs cover two), batch, room,
+                                  activity, code, subject name, teacher id/name
+      postings[field][term]    -> set of hit ids, for field in SEARCH_FIELDS
+      terms[field]             -> sorted terms (prefix lookups by bisection)
+      trigrams[field][gram]    -> terms containing the trigram (candidates for fuzzy matches)
+
+    Query words are ANDed; each word matches a term exactly, as a prefix (2+ characters) or, failing
+    both, fuzzily (difflib ratio >= FUZZY_MIN_RATIO among terms sharing a trigram).
+    """
+
+    def __init__(self, rows, slots, subject_names=None, teacher_names=None):
+        subject_names = subject_names or {}
+        teacher_names = teacher_names or {}
+        self.slot_order = {s: i for i, s in enumerate(slots)}
+        self.hits = []
+        self.postings = {f: defaultdict(set) for f in SEARCH_FIELDS}
+        for row in rows:
+            slot = row.get("Time", "")
+            span = [slot]
+            if (row.get("Activity") or "").lower() == "lab" and slot in slots and slots.index(slot) + 1 < len(slots):
+                span.append(slots[slots.index(slot) + 1])
+            code, tid = row.get("Subject/Notes", ""), row.get("Teacher ID", "")
+            hit = {
+                "section": f"{row.get('Branch', '')}-{row.get('Section', '')}",
+                "day": row.get("Day", ""),
+                "slot": slot,
+                "slots": span,
+                "batch": row.get("Batch", ""),
+                "room": row.get("Room", ""),
+                "activity": row.get("Activity", ""),
+                "code": code,
+                "subject": subject_names.get(code, ""),
+                "teacher_id": tid,
+                "teacher_name": teacher_names.get(tid) or row.get("Teacher Name", ""),
+            }
+            n = len(self.hits)
+            self.hits.append(hit)
+            for field, values in (("subject", (code, hit["subject"])), ("teacher", (tid, hit["teacher_name"])),
+                                  ("room", (hit["room"],)), ("batch", (hit["batch"],)), ("section", (hit["section"],))):
+                for value in values:
+                    for term in search_terms(value):
+                        self.postings[field][term].add(n)
+        self.terms = {f: sorted(p) for f, p in self.postings.items()}
+        self.trigrams = {f: defaultdict(set) for f in SEARCH_FIELDS}
+        for field, terms in self.terms.items():
+            for term in terms:
+                for gram in _trigrams(term):
+                    self.trigrams[field][gram].add(term)
+
+    def _match_word(self, word, fields):
+        """{hit id: score} for one query word: exact 3, prefix 2, fuzzy 1 (best per hit)."""
+        scores = {}
+
+        def add(ids, score):
+            for i in ids:
+                if scores.get(i, 0) < score:
+                    scores[i] = score
+
+        for field in fields:
+            postings, terms = self.postings[field], self.terms[field]
+            add(postings.get(word, ()), 3)
+            if len(word) >= 2:
+                start = bisect.bisect_left(terms, word)
+                for term in terms[start:]:
+                    if not term.startswith(word):
+                        break
+                    if term != word:
+                        add(postings[term], 2)
+        if scores or len(word) < 3:
+            return scores
+        for field in fields:
+            candidates = set().union(*(self.trigrams[field].get(g, ()) for g in _trigrams(word)))
+            for term in candidates:
+                if difflib.SequenceMatcher(None, word, term).ratio() >= FUZZY_MIN_RATIO:
+                    add(self.postings[field][term], 1)
+        return scores
+
+    def search(self, query, fields=None, day=None, slot=None, limit=50):
+        """Hits matching every word of `query` (optionally only at `day` / `slot`), best matches first."""
+        fields = [f for f in (fields or SEARCH_FIELDS) if f in SEARCH_FIELDS]
+        words = SEARCH_TERM_RE.findall(str(query or "").lower())
+        if not words:
+            return {"total": 0, "hits": []}
+        total = None
+        for word in words:
+            scores = self._match_word(word, fields)
+            if total is None:
+                total = scores
+            else:
+                total = {i: s + scores[i] for i, s in total.items() if i in scores}
+            if not total:
+                break
+        matches = [i for i in total if (not day or self.hits[i]["day"] == day) and (not slot or slot in self.hits[i]["slots"])]
+        matches.sort(key=lambda i: (-total[i], DAY_ORDER.get(self.hits[i]["day"], 99),
+                                    self.slot_order.get(self.hits[i]["slot"], 99), self.hits[i]["section"]))
+        return {"total": len(matches), "hits": [{**self.hits[i], "score": total[i]} for i in matches[:limit]]}
+
+
+def load_search_index(csv_path, slots, subject_names=None, teacher_names=None, names_version=None):
+    """SearchIndex for a generation CSV, rebuilt when the CSV changes or `names_version` does."""
+    def build(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            return SearchIndex(list(csv.DictReader(f)), slots, subject_names, teacher_names)
+
+    return cached(("search", names_version), csv_path, build)
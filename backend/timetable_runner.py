@@ -2,19 +2,52 @@
 import os
 import time
 import json
+import shutil
 from pathlib import Path
 
-OUTPUT_DIR = Path("timetable_tools/output_v5")
+INPUT_FILES = ["subjects.csv", "subjects_with_teachers.csv", "teachers.csv", "pins.json", "teacher_availability.csv",
+               "term.json", "config.json"]
 
-def generate_timetable():
+
+def prepare_workspace(workspace, input_dir):
+    """
+    Create <workspace>/inputs (a snapshot of the scheduler inputs) and <workspace>/output.
+    Snapshotting means a /users edit during a run can't change the inputs half-way through.
+    """
+    workspace = Path(workspace)
+    inputs = workspace / "inputs"
+    output = workspace / "output"
+    inputs.mkdir(parents=True, exist_ok=True)
+    output.mkdir(parents=True, exist_ok=True)
+    for name in INPUT_FILES:
+        src = Path(input_dir) / name
+        if src.exists():
+            shutil.copy2(src, inputs / name)
+    return inputs, output
+
+
+def generate_timetable(input_dir, output_dir, deadline=None, max_steps=None, cancel_file=None, resume=None):
     """
     Runs:
-      1. timetable.py (scheduler) -> produces overall_schedule.csv and All_Timetables_v5.xlsx
-      2. attach_teachers_to_timetable.py -> produces All_Timetables_with_Teachers_fixed_v2.xlsx
-      3. json_converter.excel_to_json(...) -> produces a JSON file
+      1. timetable.py (scheduler) -> produces overall_schedule.csv, the per-section sheets and checkpoint.json
+      2. attach_teachers_to_timetable.annotate_sheets(...) -> "CODE — Teacher (ID)" cells
+      3. json_converter.sheets_to_json(...) -> produces a JSON file
+      4. timetable_validator.validate(...) on the annotated CSV -> validation_report.json (quality gate:
+         a failing report is returned with ok=False and the caller doesn't commit the run)
+      5. calendar_feeds.render_feeds(...) -> calendars/ (ICS per teacher, section and room)
+      6. columnar_export.export_schedule(...) -> schedule.parquet / schedule.csv.gz (typed analytics copy)
+      7. workload.build_workload(...) -> workload.json (per-teacher load, branch/department rollups)
+
+    No XLSX is written here; workbooks are built on demand by the API (see main.get_generation_xlsx).
+    Every input is read from input_dir and every output written to output_dir, so concurrent jobs
+    given separate workspaces (see prepare_workspace) never touch each other's files.
+
+    deadline (time.time()), max_steps and cancel_file bound the scheduler (see timetable.Budget);
+    resume is a checkpoint.json to continue from. When the budget runs out the rest of the pipeline
+    still runs on the best-so-far grid and report["scheduler"]["complete"] is False.
 
     Returns:
-        (str(csv_path), str(json_path))
+        (str(csv_path), str(json_path), report_dict)
     """
     # Dynamic imports at runtime so FastAPI can start even if heavy deps are missing
     try:
@@ -28,85 +61,149 @@ def generate_timetable():
         raise RuntimeError(f"Failed to import attach_teachers_to_timetable.py: {e}")
 
     try:
-        # excel_to_json(excel_path, json_out_path)
-        from json_converter import excel_to_json
+        from json_converter import sheets_to_json
     except Exception as e:
         raise RuntimeError(f"Failed to import json_converter.py: {e}")
 
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
     # Ensure output dir exists
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
 
     # -------------------------
     # STEP 1: Run scheduler
     # -------------------------
     try:
-        # timetable_module should expose a main() function that writes files into OUTPUT_DIR
-        timetable_module.main()
+        # main() writes the CSVs into output_dir and returns the TimeTable (sheets in tt.sheets)
+        budget = timetable_module.Budget(deadline=deadline, max_steps=max_steps, cancel_file=cancel_file)
+        tt = timetable_module.main(str(input_dir), str(output_dir), write_xlsx=False, budget=budget, resume=resume)
     except Exception as e:
         raise RuntimeError(f"Error running scheduler (timetable.py): {e}")
 
-    overall_csv = OUTPUT_DIR / "overall_schedule.csv"
-    all_xlsx = OUTPUT_DIR / "All_Timetables_v5.xlsx"
+    overall_csv = output_dir / "overall_schedule.csv"
 
     if not overall_csv.exists():
         raise FileNotFoundError(f"Missing expected CSV at: {overall_csv}")
 
-    if not all_xlsx.exists():
-        raise FileNotFoundError(f"Missing expected XLSX at: {all_xlsx}")
-
     # -------------------------
     # STEP 2: Attach teachers
     # -------------------------
-    subjects_csv = "subjects_with_teachers.csv"
-    teachers_csv = "teachers.csv"
-    output_xlsx = OUTPUT_DIR / "All_Timetables_with_Teachers_fixed_v2.xlsx"
-    missing_csv = "missing_mappings.csv"
+    subjects_csv = input_dir / "subjects_with_teachers.csv"
+    teachers_csv = input_dir / "teachers.csv"
+    missing_csv = output_dir / "missing_mappings.csv"
 
     try:
-        actual_xlsx_path = attach_module.process(
-            str(all_xlsx),
-            subjects_csv,
-            teachers_csv,
-            str(output_xlsx),
-            missing_csv
-        )
+        annotated, _ = attach_module.annotate_sheets(
+            tt.sheets, str(subjects_csv), str(teachers_csv), str(missing_csv), schedule_csv=str(overall_csv),
+            assigned=tt.assigned_teachers())
     except Exception as e:
         raise RuntimeError(f"Error running attach_teachers_to_timetable.py: {e}")
 
-    if not Path(actual_xlsx_path).exists():
-        raise FileNotFoundError(f"Attach-teachers output XLSX missing: {actual_xlsx_path}")
-
     # -------------------------
     # STEP 3: Convert to JSON
     # -------------------------
+    # Cells are plain strings/None here, so the output is valid JSON without the old NaN sanitizing pass.
     ts = int(time.time())
-    json_out_path = OUTPUT_DIR / f"timetable_{ts}.json"
+    json_out_path = output_dir / f"timetable_{ts}.json"
 
     try:
-        excel_to_json(str(actual_xlsx_path), str(json_out_path))
+        sheets_to_json(annotated, str(json_out_path))
     except Exception as e:
-        raise RuntimeError(f"Error running excel_to_json: {e}")
+        raise RuntimeError(f"Error running sheets_to_json: {e}")
 
     if not json_out_path.exists():
         raise FileNotFoundError(f"JSON file was not produced: {json_out_path}")
 
     # -------------------------
-    # SANITIZE JSON (convert NaN/Inf -> null)
+    # STEP 4: Validate
     # -------------------------
-    # Some converters may write bare NaN/Infinity tokens which are invalid JSON.
-    # We'll load with parse_constant to turn those into None, then re-dump to ensure valid JSON.
-    try:
-        raw_text = json_out_path.read_text(encoding="utf-8")
-        # parse_constant handles NaN/Infinity tokens by mapping them to None
-        parsed = json.loads(raw_text, parse_constant=lambda _: None)
-        # rewrite sanitized JSON (pretty, compact)
-        json_out_path.write_text(json.dumps(parsed, ensure_ascii=False), encoding="utf-8")
-    except Exception as e:
-        # If sanitization fails, raise an error so frontend doesn't get invalid JSON
-        raise RuntimeError(f"Failed to sanitize JSON output: {e}")
+    report = run_validation(tt, overall_csv, output_dir)
+    report["scheduler"] = tt.status
+
+    # -------------------------
+    # STEP 5: Calendar feeds
+    # -------------------------
+    render_calendars(overall_csv, output_dir, input_dir / "term.json")
+
+    # -------------------------
+    # STEP 6: Columnar export
+    # -------------------------
+    export_columnar(overall_csv, output_dir)
+
+    # -------------------------
+    # STEP 7: Workload summary
+    # -------------------------
+    write_workload(overall_csv, output_dir, subjects_csv)
 
     # Final CSV sanity check
     if not overall_csv.exists():
         raise FileNotFoundError(f"Final CSV missing after pipeline: {overall_csv}")
 
-    return str(overall_csv), str(json_out_path)
+    return str(overall_csv), str(json_out_path), report
+
+
+def render_calendars(csv_path, output_dir, term_file=None):
+    """
+    Render output_dir/calendars from the annotated CSV, using the term (holidays, substitute days) in
+    term_file if there is one; a failure only means no feeds for this run.
+    """
+    try:
+        import calendar_feeds
+        from term_calendar import load_term
+
+        term = load_term(term_file) if term_file else None
+        manifest = calendar_feeds.render_feeds(csv_path, Path(output_dir) / "calendars", term=term)
+        print(f"✅ Calendar feeds: {sum(len(manifest[k]) for k in calendar_feeds.KINDS)} files")
+    except Exception as e:
+        print(f"⚠️ Calendar feeds not rendered: {e}")
+
+
+def export_columnar(csv_path, output_dir):
+    """Write output_dir/schedule.<parquet|csv.gz> (+ schema.json); a failure only means no columnar copy."""
+    try:
+        import columnar_export
+
+        path = columnar_export.export_schedule(csv_path, output_dir, "schedule")
+        print(f"✅ Columnar export: {path.name}")
+    except Exception as e:
+        print(f"⚠️ Columnar export not written: {e}")
+
+
+def write_workload(csv_path, output_dir, departments_csv=None):
+    """Write output_dir/workload.json; a failure only means the summary is built later, on demand."""
+    try:
+        import workload
+
+        summary = workload.build_workload(csv_path, departments_csv)
+        (Path(output_dir) / "workload.json").write_text(json.dumps(summary, ensure_ascii=False), encoding="utf-8")
+        print(f"✅ Workload summary: {len(summary['teachers'])} teachers")
+    except Exception as e:
+        print(f"⚠️ Workload summary not written: {e}")
+
+
+def run_validation(tt, csv_path, output_dir):
+    """
+    Validate the annotated overall_schedule.csv - the file that is committed and served, with the teacher
+    IDs attach_teachers put in it - and write output_dir/validation_report.json; failures are reported,
+    not raised. Periods in BLOCKED slots never reach the CSV, so that check also runs on the in-memory grid.
+    """
+    try:
+        import timetable_validator
+
+        report = timetable_validator.validate(
+            timetable_validator.frame_from_schedule_csv(csv_path), tt.subjects, sections=list(tt.section_tables),
+            availability=tt.availability)
+        in_memory = timetable_validator.frame_from_timetable(tt)
+        blocked = report["blocked_slots"] + timetable_validator.check_blocked(in_memory)
+        report["blocked_slots"] = list({json.dumps(r, sort_keys=True): r for r in blocked}.values())
+        report["summary"]["blocked_slots"] = len(report["blocked_slots"])
+        report["ok"] = not any(report["summary"].values())
+    except Exception as e:
+        report = {"ok": False, "error": f"Validation failed to run: {e}"}
+
+    (Path(output_dir) / "validation_report.json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if report.get("ok"):
+        print("✅ Validation passed")
+    else:
+        print(f"⚠️ Validation issues: {report.get('summary') or report.get('error')}")
+    return report
@@ -0,0 +1,188 @@
+# timetable_validator.py
+"""
+Post-generation quality gate.
+
+Everything is flattened into one long DataFrame (one row per section/batch/day/slot occupancy, labs
+expanded to both of their periods) and each check is a single groupby/merge over it:
+
+  - teacher_clashes      a teacher in two different classes in the same (day, slot)
+  - room_clashes         a room used by two different section/batches in the same (day, slot)
+  - section_clashes      a section with a whole-class period and a lab in the same (day, slot)
+  - blocked_slots        anything placed in a BLOCKED slot (break / lunch) or past the day
+  - session_mismatches   theory/project periods per section vs. what the credits ask for
+  - missing_labs         (section, batch, lab) combinations that never got a session
+  - unassigned_labs      "**UNASSIGNED-LAB ...**" markers left by assign_labs
+  - unavailable_teachers a teacher booked in a period teacher_availability.csv marks unavailable
+                         (only when an availability map is passed)
+"""
+import time
+
+import pandas as pd
+
+from timetable import BLOCKED, DAYS, TIME_SLOTS, batches_for
+
+COLUMNS = ["Day", "Section", "Batch", "Slot", "Activity", "Room", "Subject", "Teacher"]
+WHOLE_CLASS = "ALL"
+
+
+# ---------- building the long frame ----------
+def _lab_parts(val):
+    """ "A1 -> CSE_Lab1 (CODE); A2 -> CSE_Lab2 (CODE2)" -> [(batch, room, code)] """
+    parts = []
+    for part in str(val).split(";"):
+        left, right = (part.split("->", 1) + [""])[:2]
+        right = right.strip()
+        code = right.split("(")[-1].split(")")[0].strip() if "(" in right and ")" in right else ""
+        parts.append((left.strip(), right.split("(")[0].strip(), code))
+    return parts
+
+
+def frame_from_timetable(tt):
+    """Long frame straight from TimeTable.section_tables (sees blocked slots the exports skip)."""
+    rows = []
+    for sec, grid in tt.section_tables.items():
+        sec_letter = sec.split("-")[-1]
+        for day in DAYS:
+            for idx, cell in grid[day].items():
+                if not cell or not cell[0]:
+                    continue
+                val = cell[0] if isinstance(cell, tuple) else cell
+                if isinstance(val, str) and "->" in val:
+                    for batch, room, code in _lab_parts(val):
+                        tid = tt.subjects.get(code, {}).get("teacher_id", "") if code else ""
+                        for offs in (0, 1):
+                            rows.append((day, sec, batch, idx + offs, "Lab", room, code, tid))
+                else:
+                    tid = cell[1] if isinstance(cell, tuple) else ""
+                    rows.append((day, sec, WHOLE_CLASS, idx, "Theory/Project", f"{sec_letter}-Classroom", str(val), tid or ""))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def frame_from_schedule_csv(csv_path):
+    """Long frame from a stored overall_schedule.csv (labs are listed once, at their start period)."""
+    df = pd.read_csv(csv_path, dtype=str).fillna("")
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    slot_of = {t: i for i, t in enumerate(TIME_SLOTS)}
+    is_lab = df["Activity"].str.lower().eq("lab")
+    out = pd.DataFrame({
+        "Day": df["Day"],
+        "Section": df["Branch"] + "-" + df["Section"],
+        "Batch": df["Batch"].where(is_lab, WHOLE_CLASS),
+        "Slot": df["Time"].map(slot_of).fillna(-1).astype(int),
+        "Activity": df["Activity"],
+        "Room": df["Room"],
+        "Subject": df["Subject/Notes"],
+        "Teacher": df["Teacher ID"] if "Teacher ID" in df.columns else "",
+    })
+    second = out[is_lab].copy()
+    second["Slot"] = second["Slot"] + 1
+    return pd.concat([out, second], ignore_index=True)
+
+
+# ---------- checks ----------
+SLOT_LABELS = dict(enumerate(TIME_SLOTS))
+
+
+def _records(df):
+    return df.to_dict(orient="records")
+
+
+def _with_time(df):
+    return df.assign(Time=df["Slot"].map(SLOT_LABELS).fillna(df["Slot"].astype(str)))
+
+
+def _clashes(df, resource, key_cols):
+    occ = df.loc[df[resource] != "", [resource, "Day", "Slot"]]
+    occ = occ.assign(_key=df[key_cols[0]] + "/" + df[key_cols[1]]).drop_duplicates()
+    counts = occ.groupby([resource, "Day", "Slot"])["_key"].transform("size")
+    bad = occ[counts > 1]
+    if bad.empty:
+        return []
+    g = bad.groupby([resource, "Day", "Slot"])["_key"].agg(sorted).rename("classes").reset_index()
+    return _records(_with_time(g)[[resource, "Day", "Time", "classes"]])
+
+
+def check_section_clashes(df):
+    flags = df[["Section", "Day", "Slot"]].assign(whole=df["Batch"] == WHOLE_CLASS, lab=df["Batch"] != WHOLE_CLASS)
+    g = flags.groupby(["Section", "Day", "Slot"])[["whole", "lab"]].any()
+    bad = g[g["whole"] & g["lab"]].reset_index()
+    return _records(_with_time(bad)[["Section", "Day", "Time"]])
+
+
+def check_blocked(df):
+    bad = df[df["Slot"].isin(BLOCKED) | (df["Slot"] < 0) | (df["Slot"] >= len(TIME_SLOTS))]
+    return _records(_with_time(bad)[["Section", "Batch", "Day", "Time", "Subject"]].drop_duplicates())
+
+
+def expected_sessions(subjects, sections):
+    """(Section, Subject, expected) for theory/project subjects, mirroring assign_theory_and_project."""
+    rows = []
+    for sec in sections:
+        branch = sec.split("-")[0]
+        for code, info in subjects.items():
+            if info["type"].lower() in ("theory", "project") and info["branch"] == branch:
+                credits = int(info.get("credits", 0) or 0)
+                rows.append((sec, code, max(1, min(credits, 6))))
+    return pd.DataFrame(rows, columns=["Section", "Subject", "expected"])
+
+
+def check_sessions(df, subjects, sections):
+    theory = df[(df["Batch"] == WHOLE_CLASS) & ~df["Subject"].str.contains("UNASSIGNED", regex=False)]
+    actual = theory.groupby(["Section", "Subject"]).size().rename("actual").reset_index()
+    merged = expected_sessions(subjects, sections).merge(actual, on=["Section", "Subject"], how="outer")
+    merged = merged.fillna({"expected": 0, "actual": 0}).astype({"expected": int, "actual": int})
+    return _records(merged[merged["expected"] != merged["actual"]])
+
+
+def check_labs(df, subjects, sections, batches_for):
+    rows = []
+    for sec in sections:
+        branch = sec.split("-")[0]
+        labs = [code for code, info in subjects.items()
+                if info["type"].lower() == "lab" and info["branch"] == branch]
+        for batch in batches_for(sec):
+            rows.extend((sec, batch, code) for code in labs)
+    expected = pd.DataFrame(rows, columns=["Section", "Batch", "Subject"])
+    held = df[df["Activity"].str.lower() == "lab"][["Section", "Batch", "Subject"]].drop_duplicates()
+    merged = expected.merge(held, how="left", indicator=True)
+    return _records(merged[merged["_merge"] == "left_only"][["Section", "Batch", "Subject"]])
+
+
+def check_unassigned(df):
+    bad = df[df["Subject"].str.contains("UNASSIGNED", regex=False)]
+    return _records(_with_time(bad)[["Section", "Day", "Time", "Subject"]].drop_duplicates())
+
+
+def check_unavailable(df, availability):
+    blocked = [(tid, day, slot) for tid, prefs in availability.items() for day, slot in prefs["unavailable"]]
+    if not blocked:
+        return []
+    bad = df.merge(pd.DataFrame(blocked, columns=["Teacher", "Day", "Slot"]), on=["Teacher", "Day", "Slot"])
+    return _records(_with_time(bad)[["Teacher", "Section", "Day", "Time", "Subject"]].drop_duplicates())
+
+
+def validate(df, subjects, sections=None, batches_for=batches_for, availability=None):
+    """Run every check over the long frame and return a JSON-serialisable report."""
+    started = time.perf_counter()
+    df = df.astype({"Slot": int})
+    for col in ("Day", "Section", "Batch", "Activity", "Room", "Subject", "Teacher"):
+        df[col] = df[col].fillna("").astype(str)
+    sections = sorted(sections or df["Section"].unique())
+
+    report = {
+        "teacher_clashes": _clashes(df, "Teacher", ["Section", "Subject"]),
+        "room_clashes": _clashes(df, "Room", ["Section", "Batch"]),
+        "section_clashes": check_section_clashes(df),
+        "blocked_slots": check_blocked(df),
+        "session_mismatches": check_sessions(df, subjects, sections),
+        "missing_labs": check_labs(df, subjects, sections, batches_for),
+        "unassigned_labs": check_unassigned(df),
+    }
+    if availability:
+        report["unavailable_teachers"] = check_unavailable(df, availability)
+    summary = {k: len(v) for k, v in report.items()}
+    report["summary"] = summary
+    report["ok"] = not any(summary.values())
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
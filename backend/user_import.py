@@ -0,0 +1,143 @@
+# user_import.py
+"""
+Bulk teacher import / export for teachers.csv.
+
+An uploaded CSV or XLSX (columns id, name, email, password; header names are case-insensitive)
+is read row by row and every row is checked once against an id/email index of the existing users
+and of the rows before it. The batch is applied all-or-nothing: the new rows are appended to a
+copy of teachers.csv which then replaces the original in a single rename.
+"""
+import csv
+import io
+import os
+import re
+import threading
+from pathlib import Path
+
+REQUIRED = ["id", "name", "email", "password"]
+EXPORT_FIELDS = ["id", "name", "email"]
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+# ---------- reading uploads ----------
+def _normalize(header):
+    return [str(h or "").strip().lower() for h in header]
+
+
+def iter_csv_rows(binary_file):
+    reader = csv.reader(io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline=""))
+    header = _normalize(next(reader, []))
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def iter_xlsx_rows(binary_file):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(binary_file, read_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = _normalize(next(rows, []))
+        for values in rows:
+            yield dict(zip(header, ("" if v is None else str(v) for v in values)))
+    finally:
+        wb.close()
+
+
+def iter_rows(filename, binary_file):
+    """Rows of an uploaded file as dicts keyed by lower-cased header; format chosen by extension."""
+    if str(filename or "").lower().endswith((".xlsx", ".xlsm")):
+        return iter_xlsx_rows(binary_file)
+    return iter_csv_rows(binary_file)
+
+
+# ---------- validation ----------
+def existing_index(teachers_file, admin_email=None):
+    """(ids, lower-cased emails) already taken."""
+    ids, emails = set(), set()
+    if admin_email:
+        emails.add(admin_email.strip().lower())
+    if Path(teachers_file).exists():
+        with open(teachers_file, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                ids.add((row.get("id") or "").strip())
+                emails.add((row.get("email") or "").strip().lower())
+    ids.discard("")
+    emails.discard("")
+    return ids, emails
+
+
+def validate_rows(rows, ids, emails):
+    """
+    Single pass over `rows`; `ids`/`emails` are the taken values and grow as rows are accepted,
+    so duplicates inside the file are caught too. Returns (accepted rows, per-row errors).
+    Row numbers count the header as row 1, like a spreadsheet.
+    """
+    accepted, errors = [], []
+    for n, raw in enumerate(rows, start=2):
+        row = {k: str(raw.get(k) or "").strip() for k in REQUIRED}
+        if not any(row.values()):
+            continue
+        problems = [f"missing {k}" for k in REQUIRED if not row[k]]
+        email = row["email"].lower()
+        if row["id"] and row["id"] in ids:
+            problems.append(f"duplicate id {row['id']}")
+        if row["email"] and not EMAIL_RE.match(row["email"]):
+            problems.append(f"invalid email {row['email']}")
+        elif email and email in emails:
+            problems.append(f"duplicate email {row['email']}")
+        if problems:
+            errors.append({"row": n, "id": row["id"], "errors": problems})
+            continue
+        ids.add(row["id"])
+        emails.add(email)
+        accepted.append(row)
+    return accepted, errors
+
+
+# ---------- applying ----------
+def append_users(teachers_file, rows):
+    """Append rows (id, name, email, password) to teachers.csv atomically."""
+    teachers_file = Path(teachers_file)
+    tmp = teachers_file.with_name(f".{teachers_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    existing = teachers_file.read_bytes() if teachers_file.exists() else b"id,name,email,password\n"
+    if existing and not existing.endswith(b"\n"):
+        existing += b"\n"
+    with open(tmp, "wb") as f:
+        f.write(existing)
+    with open(tmp, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        for row in rows:
+            writer.writerow([row["id"], row["name"], row["email"], row["password"]])
+    os.replace(tmp, teachers_file)
+
+
+# ---------- export ----------
+def iter_export_csv(teachers_file):
+    """teachers.csv without passwords, as CSV text chunks (one per row)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+
+    def flush():
+        text = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return text
+
+    writer.writerow(EXPORT_FIELDS)
+    yield flush()
+    if not Path(teachers_file).exists():
+        return
+    with open(teachers_file, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            writer.writerow([row.get(k, "") for k in EXPORT_FIELDS])
+            yield flush()
+
+
+def export_sheets(teachers_file):
+    """{"Users": [header, rows...]} for xlsx_writer.write_workbook."""
+    rows = [EXPORT_FIELDS]
+    if Path(teachers_file).exists():
+        with open(teachers_file, newline="", encoding="utf-8") as f:
+            rows += [[row.get(k, "") for k in EXPORT_FIELDS] for row in csv.DictReader(f)]
+    return {"Users": rows}
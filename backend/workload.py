@@ -0,0 +1,177 @@
+# workload.py
+"""
+Per-teacher workload and utilisation metrics for one generation.
+
+Built from overall_schedule.csv (with the Teacher ID column added by attach_teachers_to_timetable)
+in one vectorized pass: the rows are expanded to one (teacher, day, slot) occupancy per period -
+labs cover two - and every metric is a groupby over that frame:
+
+    weekly_periods    distinct periods taught in the week
+    theory_periods, lab_periods
+    teaching_hours, lab_hours   from the slot lengths in TIME_SLOTS
+    daily             {day: periods};  peak_day / peak_periods / days_taught
+    idle_gaps         teachable periods between a teacher's first and last class of a day, summed
+                      over the week (max_daily_gap for the worst day)
+    longest_streak    most back-to-back periods; a break or lunch (BLOCKED slot) ends a streak
+    sections, subjects
+
+plus rollups precomputed for dashboards:
+    branches     periods delivered to each branch's sections (theory / lab / teachers / sections)
+    departments  teachers grouped by department (from subjects_with_teachers.csv, else the branch
+                 they teach most): head count, total / mean / max / min weekly load, idle gaps, lab hours
+
+The summary is written next to each generation at generation time (workload.json) and built on demand
+for older generations.
+"""
+import csv
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from timetable import BLOCKED, DAYS, TIME_SLOTS
+
+WORKLOAD_VERSION = 1
+
+
+def _slot_minutes(label):
+    start, end = label.split()[0].split("-")
+    (h1, m1), (h2, m2) = (map(int, start.split(":")), map(int, end.split(":")))
+    return (h2 * 60 + m2) - (h1 * 60 + m1)
+
+
+SLOT_MINUTES = [_slot_minutes(t) for t in TIME_SLOTS]
+# position of each slot among the teachable ones, so a break or lunch inside a day isn't an idle gap
+TEACHABLE = [i for i in range(len(TIME_SLOTS)) if i not in BLOCKED]
+
+
+def load_departments(path):
+    """{teacher id: branch} from subjects_with_teachers.csv (the branch a teacher has most subjects in)."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    counts = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            tid, branch = row.get("teacher_id", ""), row.get("branch", "")
+            if tid and branch:
+                counts.setdefault(tid, {}).setdefault(branch, 0)
+                counts[tid][branch] += 1
+    return {tid: max(sorted(c), key=c.get) for tid, c in counts.items()}
+
+
+# ---------- occupancy frame ----------
+def occupancy(csv_path):
+    """One row per (teacher, day, slot) period taught: Teacher, Day, Slot, Branch, Section, Subject, Lab."""
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    if df.empty or "Teacher ID" not in df.columns:
+        return pd.DataFrame(columns=["Teacher", "Day", "Slot", "Branch", "Section", "Subject", "Lab"])
+    slot_of = {t: i for i, t in enumerate(TIME_SLOTS)}
+    base = pd.DataFrame({
+        "Teacher": df["Teacher ID"],
+        "Day": df["Day"],
+        "Slot": df["Time"].map(slot_of),
+        "Branch": df["Branch"],
+        "Section": df["Branch"] + "-" + df["Section"],
+        "Subject": df["Subject/Notes"],
+        "Lab": df["Activity"].str.lower().eq("lab"),
+    })
+    base = base[(base["Teacher"] != "") & base["Slot"].notna() & base["Day"].isin(DAYS)]
+    second = base[base["Lab"]].assign(Slot=lambda x: x["Slot"] + 1)     # labs are listed at their first period
+    occ = pd.concat([base, second], ignore_index=True)
+    occ = occ[occ["Slot"] < len(TIME_SLOTS)].astype({"Slot": int})
+    # a lab taught to two batches at once is still one period for the teacher
+    return occ.drop_duplicates(["Teacher", "Day", "Slot"]).reset_index(drop=True)
+
+
+# ---------- metrics ----------
+def summarize(occ, departments=None):
+    """The workload summary dict (see module docstring) for an occupancy frame."""
+    started = time.perf_counter()
+    departments = departments or {}
+    if occ.empty:
+        return {"version": WORKLOAD_VERSION, "teachers": {}, "branches": {}, "departments": {},
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    occ = occ.assign(
+        Minutes=occ["Slot"].map(dict(enumerate(SLOT_MINUTES))),
+        Pos=occ["Slot"].map({s: i for i, s in enumerate(TEACHABLE)}),
+    )
+    by_teacher = occ.groupby("Teacher")
+    per_teacher = pd.DataFrame({
+        "weekly_periods": by_teacher.size(),
+        "lab_periods": by_teacher["Lab"].sum(),
+        "teaching_hours": by_teacher["Minutes"].sum() / 60,
+        "lab_hours": occ[occ["Lab"]].groupby("Teacher")["Minutes"].sum() / 60,
+        "sections": by_teacher["Section"].nunique(),
+        "subjects": by_teacher["Subject"].nunique(),
+    }).fillna({"lab_hours": 0})
+    per_teacher["theory_periods"] = per_teacher["weekly_periods"] - per_teacher["lab_periods"]
+
+    # per (teacher, day): load and idle gap = teachable periods in [first, last] not taught
+    daily = occ.groupby(["Teacher", "Day"]).agg(periods=("Pos", "size"), first=("Pos", "min"), last=("Pos", "max"))
+    daily["gap"] = (daily["last"] - daily["first"] + 1 - daily["periods"]).clip(lower=0)
+    by_day = daily.groupby("Teacher")
+    per_teacher["days_taught"] = by_day.size()
+    per_teacher["peak_periods"] = by_day["periods"].max()
+    per_teacher["peak_day"] = daily["periods"].groupby("Teacher").idxmax().map(lambda key: key[1])
+    per_teacher["idle_gaps"] = by_day["gap"].sum()
+    per_teacher["max_daily_gap"] = by_day["gap"].max()
+
+    # streaks: adjacent slots on the same day share a run id (a BLOCKED slot between them breaks it)
+    occ = occ.sort_values(["Teacher", "Day", "Slot"])
+    new_run = (occ["Teacher"] != occ["Teacher"].shift()) | (occ["Day"] != occ["Day"].shift()) | \
+              (occ["Slot"] != occ["Slot"].shift() + 1)
+    runs = occ.groupby([occ["Teacher"], new_run.cumsum()]).size()
+    per_teacher["longest_streak"] = runs.groupby(level=0).max()
+
+    daily_table = daily["periods"].unstack(fill_value=0).reindex(columns=DAYS, fill_value=0)
+    main_branch = (occ.groupby(["Teacher", "Branch"]).size().rename("n").reset_index()
+                   .sort_values(["Teacher", "n", "Branch"], ascending=[True, False, True])
+                   .drop_duplicates("Teacher").set_index("Teacher")["Branch"])
+    per_teacher["department"] = [departments.get(tid) or main_branch[tid] for tid in per_teacher.index]
+
+    ints = ["weekly_periods", "theory_periods", "lab_periods", "days_taught", "peak_periods", "idle_gaps",
+            "max_daily_gap", "longest_streak", "sections", "subjects"]
+    per_teacher = per_teacher.astype({c: int for c in ints}).round({"teaching_hours": 2, "lab_hours": 2})
+    daily_rows = daily_table.astype(int).to_dict("index")
+    columns = ["department", "weekly_periods", "theory_periods", "lab_periods", "teaching_hours", "lab_hours",
+               "days_taught", "peak_day", "peak_periods", "idle_gaps", "max_daily_gap", "longest_streak",
+               "sections", "subjects"]
+    teachers = {tid: {**row, "daily": daily_rows[tid]} for tid, row in per_teacher[columns].to_dict("index").items()}
+
+    by_branch = occ.groupby("Branch")
+    branch_table = pd.DataFrame({
+        "periods": by_branch.size(),
+        "lab_periods": by_branch["Lab"].sum(),
+        "teachers": by_branch["Teacher"].nunique(),
+        "sections": by_branch["Section"].nunique(),
+        "teaching_hours": by_branch["Minutes"].sum() / 60,
+    })
+    branches = {b: {"periods": int(r["periods"]), "theory_periods": int(r["periods"] - r["lab_periods"]),
+                    "lab_periods": int(r["lab_periods"]), "teachers": int(r["teachers"]), "sections": int(r["sections"]),
+                    "teaching_hours": round(float(r["teaching_hours"]), 2)}
+                for b, r in branch_table.iterrows()}
+
+    by_dept = per_teacher.groupby("department")
+    dept_table = by_dept.agg(teachers=("weekly_periods", "size"), total=("weekly_periods", "sum"),
+                             mean=("weekly_periods", "mean"), max=("weekly_periods", "max"), min=("weekly_periods", "min"),
+                             idle_gaps=("idle_gaps", "sum"), lab_hours=("lab_hours", "sum"))
+    departments_out = {d: {"teachers": int(r["teachers"]), "weekly_periods": int(r["total"]),
+                           "mean_weekly_periods": round(float(r["mean"]), 2), "max_weekly_periods": int(r["max"]),
+                           "min_weekly_periods": int(r["min"]), "idle_gaps": int(r["idle_gaps"]),
+                           "lab_hours": round(float(r["lab_hours"]), 2)}
+                       for d, r in dept_table.iterrows()}
+
+    return {
+        "version": WORKLOAD_VERSION,
+        "teachers": teachers,
+        "branches": branches,
+        "departments": departments_out,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def build_workload(csv_path, departments_csv=None):
+    return summarize(occupancy(csv_path), load_departments(departments_csv) if departments_csv else None)
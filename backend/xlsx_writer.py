@@ -0,0 +1,116 @@
+# xlsx_writer.py
+"""
+Streaming workbook writer shared by the scheduler, the teacher-attach step and the API.
+
+Uses openpyxl's write-only mode with two named styles registered once per workbook, instead of
+building every sheet in memory and attaching a fresh Alignment/Font to each cell.
+
+sheets: { sheet_name: [header_row, row, row, ...] }   (first row is rendered bold)
+"""
+import os
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle
+from openpyxl.utils import get_column_letter
+
+HEADER_STYLE = "tt_header"
+CELL_STYLE = "tt_cell"
+MIN_WIDTH = 12
+MAX_WIDTH = 50
+
+
+def _register_styles(wb):
+    wrap = Alignment(wrap_text=True, vertical="top")
+    wb.add_named_style(NamedStyle(name=HEADER_STYLE, font=Font(bold=True), alignment=wrap))
+    wb.add_named_style(NamedStyle(name=CELL_STYLE, alignment=wrap))
+
+
+def _text_width(value):
+    if value is None or value == "":
+        return 0
+    return max(len(line) for line in str(value).split("\n"))
+
+
+def write_workbook(sheets, path):
+    """
+    Write `sheets` to `path` and return the path.
+
+    Write-only sheets need their column widths before the first row goes out, so each sheet's cells
+    are created and measured in a single pass, then flushed; only one sheet is held at a time.
+    """
+    folder = os.path.dirname(str(path)) or "."
+    os.makedirs(folder, exist_ok=True)
+
+    wb = Workbook(write_only=True)
+    _register_styles(wb)
+
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(str(name)[:31])
+        widths = []
+        out_rows = []
+        for r_idx, row in enumerate(rows):
+            style = HEADER_STYLE if r_idx == 0 else CELL_STYLE
+            out = []
+            for c_idx, value in enumerate(row):
+                cell = WriteOnlyCell(ws, value=None if value == "" else value)
+                cell.style = style
+                out.append(cell)
+                if c_idx >= len(widths):
+                    widths.append(0)
+                widths[c_idx] = max(widths[c_idx], _text_width(value))
+            out_rows.append(out)
+
+        for c_idx, w in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(c_idx)].width = min(max(MIN_WIDTH, w + 2), MAX_WIDTH)
+        for out in out_rows:
+            ws.append(out)
+
+    wb.save(str(path))
+    return str(path)
+
+
+def read_sheets(xlsx_path):
+    """Inverse of write_workbook for existing files: { sheet: [row tuples] } via read-only mode."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(str(xlsx_path), read_only=True)
+    try:
+        return {name: [list(r) for r in wb[name].iter_rows(values_only=True)] for name in wb.sheetnames}
+    finally:
+        wb.close()
+
+
+def sheets_from_records(data):
+    """Turn the API JSON shape ({section: [ {"Day": ..., slot: value} ]}) back into sheet rows."""
+    sheets = {}
+    for section, records in data.items():
+        header = []
+        for rec in records or []:
+            for key in rec:
+                if key not in header:
+                    header.append(key)
+        rows = [header] + [[rec.get(k) for k in header] for rec in records or []]
+        sheets[section] = rows
+    return sheets
+
+
+def records_from_sheets(sheets):
+    """Sheet rows -> API JSON shape; empty cells become null, matching the old read_excel round-trip."""
+    data = {}
+    for name, rows in sheets.items():
+        if not rows:
+            data[name] = []
+            continue
+        header = [str(h) for h in rows[0]]
+        records = []
+        for row in rows[1:]:
+            if all(v is None or v == "" for v in row):
+                continue
+            rec = {}
+            for i, key in enumerate(header):
+                v = row[i] if i < len(row) else None
+                rec[key] = None if v == "" else v
+            records.append(rec)
+        data[name] = records
+    return data
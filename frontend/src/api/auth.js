@@ -0,0 +1,7 @@
+// Authorization header for the write endpoints: the session token /login returned,
+// kept with the rest of the user in localStorage (see App.jsx).
+export function authHeaders() {
+  const saved = localStorage.getItem("tibl_user");
+  const token = saved ? JSON.parse(saved).token : null;
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
@@ -1,6 +1,9 @@
+import { authHeaders } from "./auth";
+
 export async function generateTimetable() {
   const resp = await fetch("http://127.0.0.1:8000/generate", {
     method: "POST",
+    headers: authHeaders(),
   });
 
   if (!resp.ok) {
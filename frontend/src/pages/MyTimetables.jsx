@@ -9,9 +9,8 @@ import TimetableTable from "../components/TimetableTable";
  * - Timetable panel will fill the remaining viewport below the page header.
  * - Tabs collapse to a select on small screens.
  *
- * The Download XLSX button fetches the XLSX at this server-side path:
- * /mnt/data/timetable_tools/output_v5/All_Timetables_with_Teachers_fixed_v2.xlsx
- * (your environment/tooling will transform the path into a proper URL before serving it).
+ * The Download XLSX button fetches the latest generation's workbook from
+ * /download/dev-xlsx (built on the server on first request, then cached).
  */
 
 export default function MyTimetables({ user }) {
@@ -77,11 +76,62 @@ export default function MyTimetables({ user }) {
     }
   }, [targetTeacherId]);
 
+  // Live updates: the backend pushes an event when a generation commits or a user changes,
+  // listing the affected sections/teachers, so only those are refetched.
+  useEffect(() => {
+    const source = new EventSource("http://127.0.0.1:8000/events");
+
+    const refreshSections = async (jsonName, sections) => {
+      if (!sections) {
+        await fetchJsonByUrl(`http://127.0.0.1:8000/json/${jsonName}`);
+        return;
+      }
+      if (!sections.length) return;
+      const resp = await fetch(`http://127.0.0.1:8000/json/${jsonName}?sections=${encodeURIComponent(sections.join(","))}`);
+      if (!resp.ok) return;
+      const changed = await resp.json();
+      setSectionsData((prev) => {
+        const next = { ...(prev || {}) };
+        sections.forEach((s) => {
+          if (changed[s]) next[s] = changed[s];
+          else delete next[s];
+        });
+        return next;
+      });
+    };
+
+    const onChange = (evt) => {
+      const payload = JSON.parse(evt.data);
+      if (targetTeacherId) {
+        if (!payload.teachers || payload.teachers.includes(targetTeacherId)) {
+          fetchTeacherTimetable(targetTeacherId);
+        }
+      } else if (evt.type === "generation") {
+        refreshSections(payload.json, payload.sections).catch((err) => console.error(err));
+      }
+    };
+
+    source.addEventListener("generation", onChange);
+    source.addEventListener("user", onChange);
+    return () => source.close();
+  }, [targetTeacherId]);
+
   const handleGenerate = async () => {
     try {
       setLoading(true);
       setError(null);
       const result = await generateTimetable();
+      if (result.status === "partial") {
+        const missing = (result.scheduler?.unplaced || []).length;
+        if (result.reason === "unplaced") {
+          throw new Error(`${missing} items fit nowhere in the timetable. The current timetable was kept.`);
+        }
+        throw new Error(`Generation stopped early (${result.reason}); ${missing} items could not be placed. The current timetable was kept.`);
+      }
+      if (result.status === "failed") {
+        const issues = Object.entries(result.validation?.summary || {}).filter(([, n]) => n).map(([k, n]) => `${n} ${k.replace(/_/g, " ")}`);
+        throw new Error(`Generated timetable failed validation (${issues.join(", ") || result.validation?.error}). The current timetable was kept.`);
+      }
       const jsonUrl = result.json_url && result.json_url.startsWith("http")
         ? result.json_url
         : `http://127.0.0.1:8000${result.json_url}`;
@@ -114,18 +164,13 @@ export default function MyTimetables({ user }) {
     }
   };
 
-  // Download XLSX from server-local path (your tool will convert this path to an HTTP URL)
-  // <-- this is the local path you uploaded; transform to URL in your runtime if needed
-  const LOCAL_XLSX_PATH = "/mnt/data/timetable_tools/output_v5/All_Timetables_with_Teachers_fixed_v2.xlsx";
+  // Download the latest generation as XLSX (the backend builds it lazily and caches it)
+  const XLSX_URL = "http://127.0.0.1:8000/download/dev-xlsx";
   const handleDownloadXlsx = async () => {
     try {
       setLoading(true);
       const suggestedFilename = "All_Timetables_with_Teachers_fixed_v2.xlsx";
-
-      // If your tool converts LOCAL_XLSX_PATH to an HTTP URL automatically, downloadFile will work.
-      // Alternatively, you can use the dev endpoint: http://127.0.0.1:8000/download/dev-xlsx
-      await downloadFile(LOCAL_XLSX_PATH, suggestedFilename);
-      alert("Download initiated (if path is served by backend).");
+      await downloadFile(XLSX_URL, suggestedFilename);
     } catch (err) {
       console.error(err);
       alert("Failed to download XLSX: " + (err.message || err));
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { authHeaders } from '../api/auth';
 
 export default function Profile({ user }) {
     const [isEditing, setIsEditing] = useState(false);
@@ -26,6 +27,7 @@ export default function Profile({ user }) {
                 method: 'PUT',
                 headers: {
                     'Content-Type': 'application/json',
+                    ...authHeaders(),
                 },
                 body: JSON.stringify(formData),
             });
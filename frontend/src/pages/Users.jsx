@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
 import TimetableTable from '../components/TimetableTable'
+import { authHeaders } from '../api/auth'
 
 function UserCard({ id, name, role, email, createdAt, onViewTimetable, onDelete }) {
     return (
@@ -115,7 +116,8 @@ export default function Users({ user }) {
 
         try {
             const resp = await fetch(`http://localhost:8000/users/${userToDelete}`, {
-                method: 'DELETE'
+                method: 'DELETE',
+                headers: authHeaders()
             });
             if (resp.ok) {
                 setUsers(users.filter(u => u.id !== userToDelete));
@@ -135,7 +137,7 @@ export default function Users({ user }) {
         try {
             const resp = await fetch('http://localhost:8000/users', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', ...authHeaders() },
                 body: JSON.stringify(newUser)
             });
             if (resp.ok) {